@@ -4,35 +4,100 @@ Docs-Agent API Server
 FastAPI-based REST API for cloud deployment
 """
 
+import asyncio
+import base64
+import binascii
+import functools
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Iterator, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Query, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 
 from docs_agent import DocsAgent
+from docs_agent.jobs import JobQueue
+from docs_agent.metrics import span
+from docs_agent.models import SearchResult
+from docs_agent.snapshot import import_snapshot
 
 # Configuration
 INDEX_DIR = Path(os.getenv("INDEX_DIR", "./index"))
 API_KEY = os.getenv("DOCS_API_KEY", "")  # Set this in production!
 PORT = int(os.getenv("PORT", 8000))
+EMBEDDING_PROVIDER = os.getenv("DOCS_EMBEDDING_PROVIDER", "openrouter")
+# Threads serving blocking index reads (search, lookup, stats, listings)
+SEARCH_WORKERS = int(os.getenv("DOCS_SEARCH_WORKERS", 8))
+# Queries accepted by one /search/batch request
+MAX_BATCH_QUERIES = 100
+# Page size bounds for /documents; NDJSON streams in pages of the maximum
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Repeated /search and /lookup queries are answered from memory until the
+# next ingest; persisting keeps the cache warm across restarts
+QUERY_CACHE_SIZE = int(os.getenv("DOCS_QUERY_CACHE_SIZE", 1024))
+QUERY_CACHE_TTL = float(os.getenv("DOCS_QUERY_CACHE_TTL", 300))
+QUERY_CACHE_PERSIST = os.getenv("DOCS_QUERY_CACHE_PERSIST", "1") == "1"
+# Sections longer than this many tokens are searched as overlapping chunks
+# (0 disables chunking)
+CHUNK_TOKENS = int(os.getenv("DOCS_CHUNK_TOKENS", 512))
+CHUNK_OVERLAP = int(os.getenv("DOCS_CHUNK_OVERLAP", 64))
+# Snapshot (path or URL, see `docs_cli.py snapshot export`) loaded when the
+# index directory is empty, so new containers start with a full index
+SNAPSHOT = os.getenv("DOCS_SNAPSHOT")
+# Searches slower than this many milliseconds go to logs/slow_queries.jsonl
+# in the index directory, with their plan and stage timings (unset: no log)
+SLOW_QUERY_MS = os.getenv("DOCS_SLOW_QUERY_MS")
+# Content type of the Prometheus text exposition format
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 # Initialize DocsAgent on startup
 docs_agent = None
+search_pool = None
+job_queue = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize on startup, cleanup on shutdown"""
-    global docs_agent
+    global docs_agent, search_pool, job_queue
     print("🚀 Initializing Docs-Agent...")
-    docs_agent = DocsAgent(INDEX_DIR, embedding_provider="openrouter")
+    if SNAPSHOT and not (INDEX_DIR / "metadata.db").exists():
+        print(f"📦 Importing index snapshot from {SNAPSHOT}...")
+        await asyncio.to_thread(import_snapshot, SNAPSHOT, INDEX_DIR)
+    docs_agent = DocsAgent(
+        INDEX_DIR,
+        embedding_provider=EMBEDDING_PROVIDER,
+        query_cache_size=QUERY_CACHE_SIZE,
+        query_cache_ttl=QUERY_CACHE_TTL,
+        persist_query_cache=QUERY_CACHE_PERSIST,
+        chunk_tokens=CHUNK_TOKENS or None,
+        chunk_overlap=CHUNK_OVERLAP,
+        slow_query_threshold=float(SLOW_QUERY_MS) / 1000 if SLOW_QUERY_MS else None,
+    )
+    search_pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+    job_queue = JobQueue(docs_agent)
     print("✅ Docs-Agent ready!")
     yield
     print("👋 Shutting down Docs-Agent...")
+    job_queue.close(timeout=5)
+    search_pool.shutdown(wait=True)
+    docs_agent.close()
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking DocsAgent call on the search pool
+    
+    Keeps the event loop free to accept and answer other requests; at most
+    SEARCH_WORKERS calls run at once, the rest wait their turn.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_pool, functools.partial(fn, *args, **kwargs))
 
 
 # FastAPI app
@@ -65,6 +130,13 @@ class SearchRequest(BaseModel):
     top_k: int = 5
     method: str = "hybrid"
 
+class SearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    top_k: int = Field(5, ge=1, le=50)
+    method: str = "hybrid"
+    fields: Optional[List[str]] = None
+    expand: bool = False
+
 class LookupRequest(BaseModel):
     query: str
 
@@ -77,6 +149,78 @@ async def verify_api_key(x_api_key: Optional[str] = Header(None)):
     return True
 
 
+def parse_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Validate a `fields` projection of search results
+    
+    Accepts names or comma-separated lists of names; None keeps every field.
+    """
+    if fields is None:
+        return None
+    names = [name.strip() for value in fields for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SearchResult.FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)} (valid: {', '.join(SearchResult.FIELDS)})",
+        )
+    return list(dict.fromkeys(names))
+
+
+def encode_cursor(position: Optional[Tuple[str, str]]) -> Optional[str]:
+    """Opaque /documents cursor for a listing position"""
+    if position is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    if cursor is None:
+        return None
+    try:
+        date_fetched, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(date_fetched, str) or not isinstance(doc_id, str):
+            raise ValueError(cursor)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return date_fetched, doc_id
+
+
+FIELDS_DESCRIPTION = f"Result fields to return, comma-separated: {', '.join(SearchResult.FIELDS)}"
+EXPAND_DESCRIPTION = "Return the whole section a matching chunk was cut from"
+
+
+def _search_response(
+    q: str, top_k: int, method: str, expand: bool, fields: Optional[List[str]]
+) -> dict:
+    # One trace for the search and its serialization (see docs_agent.metrics)
+    with docs_agent.metrics.trace("search", q):
+        results = docs_agent.search(q, top_k, method, expand)
+        with span("serialize"):
+            return {
+                "query": q,
+                "total_results": len(results),
+                "results": [r.to_dict(fields) for r in results]
+            }
+
+
+def _search_batch_response(request: SearchBatchRequest, fields: Optional[List[str]]) -> dict:
+    with docs_agent.metrics.trace("search_batch", request.queries):
+        batches = docs_agent.search_many(request.queries, request.top_k, request.method, request.expand)
+        with span("serialize"):
+            return {
+                "total_queries": len(batches),
+                "results": [
+                    {
+                        "query": query,
+                        "total_results": len(results),
+                        "results": [r.to_dict(fields) for r in results],
+                    }
+                    for query, results in zip(request.queries, batches)
+                ],
+            }
+
+
 # Health check
 @app.get("/")
 async def root():
@@ -88,9 +232,12 @@ async def root():
         "endpoints": {
             "docs": "/docs",
             "search": "/search",
+            "search_batch": "/search/batch (POST)",
             "lookup": "/lookup",
             "stats": "/stats",
+            "metrics": "/metrics",
             "ingest": "/ingest (POST)",
+            "jobs": "/jobs/{job_id}",
         }
     }
 
@@ -98,7 +245,7 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    stats = docs_agent.get_stats()
+    stats = await run_blocking(docs_agent.get_stats)
     return {
         "status": "healthy",
         "total_documents": stats.total_documents,
@@ -111,20 +258,34 @@ async def health():
 async def search(
     q: str = Query(..., description="Search query"),
     top_k: int = Query(5, ge=1, le=50, description="Number of results"),
-    method: str = Query("hybrid", description="Search method: keyword, semantic, or hybrid"),
+    method: str = Query("hybrid", description="Search method: keyword, fts, semantic, or hybrid"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: bool = Query(False, description=EXPAND_DESCRIPTION),
 ):
     """
     Search the documentation index
     
     Returns top_k most relevant document sections
     """
+    fields = parse_fields(fields)
     try:
-        results = docs_agent.search(q, top_k, method)
-        return {
-            "query": q,
-            "total_results": len(results),
-            "results": [r.to_dict() for r in results]
-        }
+        return await run_blocking(_search_response, q, top_k, method, expand, fields)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/search/batch")
+async def search_batch(request: SearchBatchRequest):
+    """
+    Search many queries in one request
+    
+    The queries are evaluated together in one pass over the index, so N
+    queries cost far less than N /search calls. Results are per query, in
+    request order.
+    """
+    fields = parse_fields(request.fields)
+    try:
+        return await run_blocking(_search_batch_response, request, fields)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -132,92 +293,114 @@ async def search(
 @app.get("/lookup")
 async def lookup(
     q: str = Query(..., description="Lookup query"),
+    fields: Optional[List[str]] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: bool = Query(False, description=EXPAND_DESCRIPTION),
 ):
     """
     Quick lookup - Returns best matching documentation
     
     Optimized for AI integration
     """
+    fields = parse_fields(fields)
     try:
-        result = docs_agent.lookup(q)
+        result = await run_blocking(docs_agent.lookup, q, fields, expand)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/ingest")
+@app.post("/ingest", status_code=202)
 async def ingest(
     request: IngestRequest,
     authenticated: bool = Depends(verify_api_key)
 ):
     """
-    Ingest new documentation sources
+    Queue new documentation sources for ingestion
     
+    Returns a job id at once; poll /jobs/{job_id} for progress.
     Requires API key authentication
     """
-    try:
-        docs = docs_agent.ingest_sources(
-            request.sources, 
-            show_progress=request.show_progress
-        )
-        return {
-            "status": "success",
-            "ingested": len(docs),
-            "documents": [
-                {
-                    "id": doc.id,
-                    "title": doc.title,
-                    "source": doc.source_url,
-                    "sections": len(doc.sections),
-                }
-                for doc in docs
-            ]
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    job = job_queue.submit(request.sources, show_progress=request.show_progress)
+    return {
+        "status": job.status.value,
+        "job_id": job.id,
+        "sources": len(job.sources),
+        "status_url": f"/jobs/{job.id}",
+    }
+
+
+@app.get("/jobs")
+async def list_jobs(authenticated: bool = Depends(verify_api_key)):
+    """Recent ingestion jobs, newest first"""
+    return {"jobs": job_queue.all_jobs()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, authenticated: bool = Depends(verify_api_key)):
+    """Status and progress of one ingestion job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 
 @app.get("/stats")
 async def stats():
     """Get index statistics"""
     try:
-        stats = docs_agent.get_stats()
+        stats = await run_blocking(docs_agent.get_stats)
         return stats.to_dict()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics
+    
+    Latency histograms of searches and of each search stage (cache, term
+    expansion, postings fetch, scoring, FTS, embedding, vector search,
+    fusion, row fetch, excerpts, serialization), ingestion stage timings,
+    and cache and index counters. Quantiles: histogram_quantile() over
+    the _bucket series.
+    """
+    try:
+        body = await run_blocking(docs_agent.render_metrics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return PlainTextResponse(body, media_type=METRICS_CONTENT_TYPE)
+
+
+def _ndjson_documents(after: Optional[Tuple[str, str]]) -> Iterator[bytes]:
+    # One chunk per page: only a page of rows is ever held in memory
+    for page in docs_agent.iter_documents(after, page_size=MAX_PAGE_SIZE):
+        yield "".join(json.dumps(doc) + "\n" for doc in page).encode()
+
+
 @app.get("/documents")
-async def list_documents():
-    """List all indexed documents"""
-    import sqlite3
+async def list_documents(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Documents per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json (one page) or ndjson (everything, streamed)"),
+):
+    """
+    List indexed documents, newest first
     
+    JSON responses are one page of `limit` documents; pass `next_cursor` back
+    as `cursor` for the next page (null after the last). NDJSON streams every
+    document from `cursor` on, one JSON object per line.
+    """
+    after = decode_cursor(cursor)
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_documents(after), media_type="application/x-ndjson")
     try:
-        conn = sqlite3.connect(docs_agent.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, source_url, title, doc_type, date_fetched, num_sections
-            FROM documents
-            ORDER BY date_fetched DESC
-        """)
-        
-        documents = []
-        for row in cursor.fetchall():
-            documents.append({
-                "id": row[0],
-                "source_url": row[1],
-                "title": row[2],
-                "doc_type": row[3],
-                "date_fetched": row[4],
-                "num_sections": row[5],
-            })
-        
-        conn.close()
-        
+        documents, next_after = await run_blocking(docs_agent.list_documents, limit, after)
+        stats = await run_blocking(docs_agent.get_stats)
         return {
-            "total": len(documents),
-            "documents": documents
+            "total": stats.total_documents,
+            "documents": documents,
+            "next_cursor": encode_cursor(next_after),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: recall@k and latency of ANN backends against exact vector search
+
+Usage:
+    python benchmarks/bench_ann.py --vectors 200000 --dim 384 --k 10
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Allow running as `python benchmarks/bench_ann.py` from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docs_agent.ann_index import HNSWIndex, IVFIndex
+from docs_agent.embeddings import normalize
+from docs_agent.vector_store import VectorStore
+
+
+def clustered_vectors(count, centres, seed):
+    """Unit vectors scattered around topic centres, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    clusters, dim = centres.shape
+    labels = rng.integers(0, clusters, size=count)
+    noise = rng.standard_normal((count, dim)) / np.sqrt(dim)
+    return normalize(centres[labels] + noise)
+
+
+def build(store, vectors, batch):
+    start = time.perf_counter()
+    for i in range(0, len(vectors), batch):
+        store.add("bench", np.arange(i, min(i + batch, len(vectors))), vectors[i:i + batch])
+    return time.perf_counter() - start
+
+
+def measure(store, queries, k, truth=None):
+    """Return (mean latency ms, recall@k vs truth)"""
+    hits = 0
+    start = time.perf_counter()
+    results = [store.search(q, k, exact=truth is None) for q in queries]
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    if truth is not None:
+        for got, expected in zip(results, truth):
+            hits += len({rowid for rowid, _ in got} & expected)
+        return latency, hits / (len(queries) * k), results
+    return latency, 1.0, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=5000)
+    args = parser.parse_args()
+
+    centres = normalize(np.random.default_rng(0).standard_normal((args.clusters, args.dim)))
+    vectors = clustered_vectors(args.vectors, centres, seed=1)
+    queries = clustered_vectors(args.queries, centres, seed=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ivf = IVFIndex(Path(tmp) / "ivf", min_train=min(50_000, args.vectors))
+        store = VectorStore(Path(tmp) / "vectors", ann=ivf)
+        print(f"IVF build ({args.vectors} x {args.dim}): {build(store, vectors, args.batch):.1f}s, "
+              f"{len(ivf.centroids)} lists")
+
+        exact_ms, _, exact = measure(store, queries, args.k)
+        truth = [{rowid for rowid, _ in result} for result in exact]
+        print(f"  exact            {exact_ms:8.2f} ms/query   recall@{args.k} 1.000")
+
+        for nprobe in (1, 4, 8, 16, 32, 64):
+            ivf.nprobe = nprobe
+            ms, recall, _ = measure(store, queries, args.k, truth)
+            print(f"  ivf nprobe={nprobe:<4} {ms:8.2f} ms/query   recall@{args.k} {recall:.3f}")
+
+        try:
+            hnsw = HNSWIndex(Path(tmp) / "hnsw")
+        except ImportError:
+            print("  hnsw             skipped (pip install hnswlib)")
+            return
+
+        store = VectorStore(Path(tmp) / "vectors_hnsw", ann=hnsw)
+        print(f"HNSW build: {build(store, vectors, args.batch):.1f}s")
+        for ef_search in (16, 32, 64, 128, 256):
+            hnsw.ef_search = ef_search
+            ms, recall, _ = measure(store, queries, args.k, truth)
+            print(f"  hnsw ef={ef_search:<6} {ms:8.2f} ms/query   recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: API search latency while a large ingest runs
+
+Serves api_server's app with uvicorn in-process, keeps a steady stream of
+/search requests going from client threads, and starts a big ingest of
+local Markdown files halfway through. Search latency is reported for the
+idle and the ingesting phase, for two server variants:
+
+    before   handlers call DocsAgent directly on the event loop
+             (the previous /search and /ingest)
+    after    /search on the bounded thread pool, /ingest as a background job
+
+Usage:
+    python benchmarks/bench_api_load.py --files 300 --clients 8
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from synthetic import WORDS, make_documents, random_queries
+
+os.environ["DOCS_EMBEDDING_PROVIDER"] = "hash"
+# Measure the search path itself, not repeated queries answered from cache
+os.environ["DOCS_QUERY_CACHE_SIZE"] = "0"
+
+import requests
+import uvicorn
+
+import api_server
+from docs_agent import DocsAgent
+
+
+@api_server.app.get("/_bench/search_inline")
+async def search_inline(q: str, top_k: int = 5, method: str = "hybrid"):
+    results = api_server.docs_agent.search(q, top_k, method)
+    return {"query": q, "total_results": len(results), "results": [r.to_dict() for r in results]}
+
+
+@api_server.app.post("/_bench/ingest_inline")
+async def ingest_inline(request: api_server.IngestRequest):
+    docs = api_server.docs_agent.ingest_sources(request.sources, show_progress=False)
+    return {"status": "success", "ingested": len(docs)}
+
+
+def write_sources(root: Path, num_files: int, sections: int = 40, seed: int = 7):
+    """Markdown files with `sections` headed sections each"""
+    rng = random.Random(seed)
+    root.mkdir()
+    paths = []
+    for i in range(num_files):
+        parts = [f"# Guide {i}"]
+        for j in range(sections):
+            parts.append(f"## {' '.join(rng.choices(WORDS, k=3))} {j}")
+            parts.append(" ".join(rng.choices(WORDS, k=150)))
+        path = root / f"guide_{i}.md"
+        path.write_text("\n\n".join(parts))
+        paths.append(str(path))
+    return paths
+
+
+def serve(index_dir: Path, port: int):
+    api_server.INDEX_DIR = index_dir
+    server = uvicorn.Server(uvicorn.Config(api_server.app, port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server failed to start on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run_variant(variant, index_dir, sources, queries, clients, idle_seconds, port):
+    server, thread = serve(index_dir, port)
+    base = f"http://127.0.0.1:{port}"
+    search_path = "/_bench/search_inline" if variant == "before" else "/search"
+
+    stop = threading.Event()
+    ingesting = threading.Event()
+    samples = {"idle": [], "ingest": []}
+    lock = threading.Lock()
+
+    def client(slot):
+        session = requests.Session()
+        i = slot
+        while not stop.is_set():
+            phase = "ingest" if ingesting.is_set() else "idle"
+            start = time.perf_counter()
+            session.get(base + search_path, params={"q": queries[i % len(queries)], "top_k": 5}).raise_for_status()
+            with lock:
+                samples[phase].append((time.perf_counter() - start) * 1000)
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(slot,)) for slot in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(idle_seconds)
+
+    ingesting.set()
+    start = time.perf_counter()
+    if variant == "before":
+        response = requests.post(base + "/_bench/ingest_inline", json={"sources": sources})
+        response.raise_for_status()
+    else:
+        job_id = requests.post(base + "/ingest", json={"sources": sources}).json()["job_id"]
+        while requests.get(f"{base}/jobs/{job_id}").json()["status"] in ("queued", "running"):
+            time.sleep(0.2)
+    ingest_seconds = time.perf_counter() - start
+    stop.set()
+    for t in threads:
+        t.join()
+
+    server.should_exit = True
+    thread.join()
+    return samples, ingest_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=300, help="Markdown files in the ingest")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent search clients")
+    parser.add_argument("--preload", type=int, default=20000, help="Sections indexed up front")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    preload = make_documents(args.preload)
+    queries = random_queries(200)
+
+    print(f"{args.clients} search clients; ingest of {args.files} files x 40 sections "
+          f"into {args.preload} preloaded sections")
+    print(f"  {'variant':<7} {'phase':<7} {'requests':>8} {'p50':>9} {'p99':>9} {'max':>9}")
+    for variant in ("before", "after"):
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = Path(tmp) / "index"
+            agent = DocsAgent(index_dir, embedding_provider="hash", ann_backend=None)
+            for i in range(0, len(preload), 50):
+                agent._save_documents(preload[i:i + 50])
+            agent.close()
+            sources = write_sources(Path(tmp) / "src", args.files)
+
+            samples, ingest_seconds = run_variant(
+                variant, index_dir, sources, queries, args.clients, args.idle_seconds, args.port,
+            )
+
+        for phase in ("idle", "ingest"):
+            latencies = samples[phase]
+            print(f"  {variant:<7} {phase:<7} {len(latencies):>8} "
+                  f"{statistics.median(latencies) if latencies else 0:>6.1f} ms "
+                  f"{percentile(latencies, 0.99):>6.1f} ms {max(latencies, default=0):>6.1f} ms")
+        print(f"  {variant:<7} ingest took {ingest_seconds:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N sequential searches vs. one search_many call
+
+Usage:
+    python benchmarks/bench_batch.py --sections 50000 --queries 10 30
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_documents, random_queries
+
+from docs_agent import DocsAgent
+
+
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=50000)
+    parser.add_argument("--queries", type=int, nargs="+", default=[10, 30])
+    parser.add_argument("--methods", nargs="+", default=["keyword", "semantic", "hybrid"])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Query cache off: every call does the full work
+        agent = DocsAgent(Path(tmp) / "index", embedding_provider="hash", ann_backend=None, query_cache_size=0)
+        docs = make_documents(args.sections)
+        for i in range(0, len(docs), 50):
+            agent._save_documents(docs[i:i + 50])
+
+        print(f"{args.sections} sections, hash embeddings, exact vector search")
+        print(f"  {'method':<9} {'queries':>7} {'sequential':>12} {'batch':>10} {'speedup':>8}")
+        for method in args.methods:
+            for n in args.queries:
+                queries = random_queries(n, seed=n)
+                sequential = timed(lambda: [agent.search(q, 5, method) for q in queries], args.repeats)
+                batch = timed(lambda: agent.search_many(queries, 5, method), args.repeats)
+                print(f"  {method:<9} {n:>7} {sequential:>9.1f} ms {batch:>7.1f} ms {sequential / batch:>7.1f}x")
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: N concurrent search readers against one ingest writer
+
+Runs the same workload twice: with the shared connection manager (WAL,
+per-thread readers, one writer) and with the previous behaviour emulated
+(rollback journal, a fresh connection for every call).
+
+Usage:
+    python benchmarks/bench_concurrency.py --readers 8 --seconds 10
+"""
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from synthetic import make_documents, random_queries
+
+from docs_agent import DocsAgent
+
+
+class PerCallDatabase:
+    """The old access pattern: default journal, connect/close around every call"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+    def reader(self) -> sqlite3.Connection:
+        # Closed when the caller drops its last reference
+        return sqlite3.connect(self.path, isolation_level=None)
+
+    @contextmanager
+    def transaction(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            yield conn.cursor()
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+def run(agent, docs, queries, readers, seconds, batch_size, method):
+    search = agent.search_engine._fts_search if method == "fts" else agent.search_engine._keyword_search
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    errors = [0] * readers
+    written = [0]
+
+    def reader(slot):
+        i = slot
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                search(queries[i % len(queries)], 5)
+            except sqlite3.OperationalError:
+                errors[slot] += 1  # "database is locked"
+                continue
+            latencies[slot].append((time.perf_counter() - start) * 1000)
+            i += readers
+
+    def writer():
+        for i in range(0, len(docs), batch_size):
+            if stop.is_set():
+                break
+            agent._save_documents(docs[i:i + batch_size])
+            written[0] += len(docs[i:i + batch_size])
+
+    threads = [threading.Thread(target=reader, args=(slot,)) for slot in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(l for per_reader in latencies for l in per_reader)
+    p95 = all_latencies[int(len(all_latencies) * 0.95) - 1] if all_latencies else 0.0
+    return {
+        "reads_per_s": len(all_latencies) / elapsed,
+        "p50": statistics.median(all_latencies) if all_latencies else 0.0,
+        "p95": p95,
+        "errors": sum(errors),
+        "docs_written": written[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--preload", type=int, default=20000, help="Sections indexed up front")
+    parser.add_argument("--batch-size", type=int, default=5, help="Documents per write transaction")
+    parser.add_argument("--method", choices=["fts", "keyword"], default="fts",
+                        help="fts runs inside SQLite; keyword is dominated by Python scoring")
+    args = parser.parse_args()
+
+    preload = make_documents(args.preload)
+    # Distinct ids for the documents written during the run
+    incoming = make_documents(args.preload, seed=1)
+    for doc in incoming:
+        doc.id = "live_" + doc.id
+        for section in doc.sections:
+            section.document_id = doc.id
+            section.id = "live_" + section.id
+    queries = random_queries(200)
+
+    print(f"{args.readers} {args.method} readers + 1 writer for {args.seconds:.0f}s, "
+          f"{args.preload} sections preloaded")
+    for name in ("shared", "per-call"):
+        with tempfile.TemporaryDirectory() as tmp:
+            agent = DocsAgent(Path(tmp) / "index", embedding_provider="hash", ann_backend=None)
+            agent.search_engine.embeddings_available = False  # Measure SQLite only
+            for i in range(0, len(preload), 50):
+                agent._save_documents(preload[i:i + 50])
+
+            if name == "per-call":
+                agent.close()
+                agent.db = agent.search_engine.db = PerCallDatabase(agent.db_path)
+
+            stats = run(agent, incoming, queries, args.readers, args.seconds, args.batch_size, args.method)
+            agent.close()
+
+        print(f"  {name:<9} {stats['reads_per_s']:8.1f} reads/s   p50 {stats['p50']:7.2f} ms   "
+              f"p95 {stats['p95']:7.2f} ms   locked errors {stats['errors']:4d}   "
+              f"docs written {stats['docs_written']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Python keyword scorer vs. SQLite FTS5/BM25
+
+Usage:
+    python benchmarks/bench_fts.py --sections 100000 --queries 50
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_documents, random_queries
+
+from docs_agent import DocsAgent
+
+
+def time_queries(search, queries, top_k):
+    """Return per-query latencies in milliseconds"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {name:<10} mean {statistics.mean(latencies):8.2f} ms   "
+          f"p50 {statistics.median(latencies):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = DocsAgent(Path(tmp) / "index")
+
+        start = time.perf_counter()
+        for doc in make_documents(args.sections):
+            agent._save_document(doc)
+        print(f"Indexed {args.sections} sections in {time.perf_counter() - start:.1f}s")
+
+        search = agent.search_engine
+        queries = random_queries(args.queries)
+        # Warm the page cache before timing
+        time_queries(search._keyword_search, queries[:5], args.top_k)
+
+        print(f"{len(queries)} queries, top_k={args.top_k}:")
+        report("keyword", time_queries(search._keyword_search, queries, args.top_k))
+        if search.fts_index.available:
+            report("fts", time_queries(search._fts_search, queries, args.top_k))
+        else:
+            print("  fts        unavailable (SQLite built without FTS5)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTML parsing of one large reference page
+
+Compares the previous parser (BeautifulSoup tree, find_next_siblings per
+heading, keywords extracted per section and again for the whole text) with
+the single-pass splitter, both with the BeautifulSoup fallback and with the
+lxml streaming parser. Each variant runs in a fresh process so that peak
+memory figures don't bleed into each other.
+
+Usage:
+    python benchmarks/bench_parse.py --headings 5000
+"""
+
+import argparse
+import multiprocessing
+import random
+import resource
+import time
+import tracemalloc
+
+from synthetic import WORDS
+
+from bs4 import BeautifulSoup
+
+from docs_agent import ingestion
+from docs_agent.ingestion import DocumentIngester
+from docs_agent.models import DocumentType
+
+
+def make_page(num_headings: int, paragraphs: int = 3, words: int = 40, seed: int = 42) -> str:
+    """A flat reference page: one long run of headings and paragraphs"""
+    rng = random.Random(seed)
+    parts = ["<html><head><title>Reference</title></head><body>",
+             "<nav><a href='/'>Home</a></nav>"]
+    for i in range(num_headings):
+        level = 2 if i % 10 == 0 else 3
+        parts.append(f"<h{level}>{' '.join(rng.choices(WORDS, k=3))} {i}</h{level}>")
+        for _ in range(paragraphs):
+            parts.append(f"<p>{' '.join(rng.choices(WORDS, k=words))}</p>")
+        if i % 5 == 0:
+            parts.append(f"<pre><code>client.{rng.choice(WORDS)}(timeout=30)</code></pre>")
+    parts.append("<footer>Generated</footer></body></html>")
+    return "\n".join(parts)
+
+
+def legacy_parse(content: str):
+    """The parser as it was before single-pass sectioning"""
+    ingester = DocumentIngester()
+    soup = BeautifulSoup(content, 'lxml')
+    title_tag = soup.find('title')
+    title = title_tag.text if title_tag else ""
+    for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
+        tag.decompose()
+
+    sections = []
+    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        heading_text = heading.get_text(strip=True)
+        content_parts = []
+        for sibling in heading.find_next_siblings():
+            if sibling.name and sibling.name.startswith('h'):
+                break
+            text = sibling.get_text(strip=True)
+            if text:
+                content_parts.append(text)
+        section_content = '\n\n'.join(content_parts)
+        if section_content or heading_text:
+            keywords = ingester._extract_keywords(heading_text + " " + section_content, 10)
+            sections.append((heading_text, section_content, keywords))
+
+    all_text = ' '.join(content for _, content, _ in sections)
+    return title, sections, ingester._extract_keywords(all_text, 30)
+
+
+def run_variant(variant: str, num_headings: int, queue):
+    page = make_page(num_headings)
+    if variant == "bs4":
+        ingestion.etree = None  # Force the BeautifulSoup fallback
+
+    def parse():
+        if variant == "before":
+            return len(legacy_parse(page)[1])
+        doc = DocumentIngester().parse("bench.html", page, DocumentType.HTML)
+        return len(doc.sections)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    sections = parse()
+    elapsed = time.perf_counter() - start
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    # Second run under tracemalloc: Python-heap peak (misses libxml2's own allocations)
+    tracemalloc.start()
+    parse()
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queue.put((variant, sections, elapsed, rss_peak, py_peak, len(page)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--headings", type=int, default=5000)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    results = []
+    for variant in ("before", "bs4", "lxml"):
+        proc = ctx.Process(target=run_variant, args=(variant, args.headings, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    page_size = results[0][5]
+    print(f"Page: {args.headings} headings, {page_size / 1e6:.1f} MB of HTML")
+    print(f"  {'variant':<8} {'sections':>8} {'time':>10} {'peak RSS':>12} {'peak heap':>12}")
+    for variant, sections, elapsed, rss_peak, py_peak, _ in results:
+        # ru_maxrss is in KiB on Linux
+        print(f"  {variant:<8} {sections:>8} {elapsed:>8.2f} s {rss_peak / 1024:>9.1f} MB "
+              f"{py_peak / 1e6:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
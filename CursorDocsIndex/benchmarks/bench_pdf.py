@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PDF extraction and sectioning
+
+Synthetic manuals (see synthetic.make_pdf) are split into sections by
+docs_agent.pdf, each variant in a fresh process so peak memory is its own:
+
+    one reader   a single PdfReader over the whole file, pages joined
+                 (what reading the PDF like any other document amounts to)
+    sequential   split_pdf_sections, page ranges read in-process
+    pool         split_pdf_sections, page ranges on a process pool
+
+Reported: wall time, pages per second, and peak RSS of the parent process
+and of the largest worker.
+
+Usage:
+    python benchmarks/bench_pdf.py --pages 100 500 --workers 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from synthetic import make_pdf
+
+
+def descendants_peak_mb(stop: threading.Event, peak: list, interval: float = 0.05):
+    """
+    Track the largest peak RSS (VmHWM) among this process' descendants
+
+    Pool workers are started by a forkserver, so they are grandchildren that
+    RUSAGE_CHILDREN never sees; /proc is polled instead (Linux only).
+    """
+    me = os.getpid()
+    while not stop.wait(interval):
+        parents = {}
+        for stat in Path("/proc").glob("[0-9]*/stat"):
+            try:
+                # "pid (comm) state ppid ...", comm may contain spaces
+                fields = stat.read_text().rsplit(")", 1)[1].split()
+                parents[int(stat.parent.name)] = int(fields[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        for pid in parents:
+            ancestor = parents.get(pid)
+            while ancestor and ancestor != me:
+                ancestor = parents.get(ancestor)
+            if ancestor != me:
+                continue
+            try:
+                for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                    if line.startswith("VmHWM:"):
+                        peak[0] = max(peak[0], int(line.split()[1]) / 1024)
+            except OSError:
+                continue
+
+
+def measure(path: str, variant: str, workers: int) -> dict:
+    """Run one variant in this process"""
+    from docs_agent.pdf import pypdf, split_pdf_sections
+
+    peak = [0.0]
+    stop = threading.Event()
+    poller = threading.Thread(target=descendants_peak_mb, args=(stop, peak), daemon=True)
+    poller.start()
+    start = time.perf_counter()
+    if variant == "one reader":
+        reader = pypdf.PdfReader(path)
+        text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+        sections = len(text) > 0
+    else:
+        _, _, sections = split_pdf_sections(path, 1 if variant == "sequential" else workers)
+        sections = len(sections)
+    seconds = time.perf_counter() - start
+    stop.set()
+    poller.join()
+    return {
+        "seconds": seconds,
+        "sections": sections,
+        # ru_maxrss is in kilobytes on Linux
+        "parent_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "worker_mb": peak[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--measure", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        path, variant, workers = args.measure
+        print(json.dumps(measure(path, variant, int(workers))))
+        return
+
+    print(f"  {'pages':>6} {'variant':<12} {'wall':>8} {'pages/s':>8} {'parent':>9} {'worker':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = make_pdf(Path(tmp) / f"manual-{pages}.pdf", pages)
+            for variant in ("one reader", "sequential", "pool"):
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--measure", str(path), variant, str(args.workers)],
+                    capture_output=True, text=True, check=True,
+                )
+                result = json.loads(proc.stdout)
+                worker = f"{result['worker_mb']:6.0f} MB" if variant == "pool" else f"{'-':>9}"
+                print(f"  {pages:>6} {variant:<12} {result['seconds']:>6.2f} s "
+                      f"{pages / result['seconds']:>8.0f} {result['parent_mb']:>6.0f} MB {worker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of materialized search results
+
+Rankings are computed once up front; what is measured is turning them into
+results and serving them (to_dict), the part that scales with the number of
+queries a server answers and the query cache holds. "before" builds a full
+DocumentSection and a stub Document per hit, as search did before results
+became lazy; "lazy" keeps one slotted row per hit and hydrates nothing.
+
+Usage:
+    python benchmarks/bench_results.py --sections 20000 --queries 1000 --top-k 20
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from synthetic import make_documents, random_queries
+
+from docs_agent import DocsAgent
+from docs_agent.inverted_index import tokenize
+from docs_agent.models import Document, DocumentSection
+
+
+@dataclass
+class LegacySearchResult:
+    """SearchResult as it was: a plain dataclass holding both objects"""
+    section: DocumentSection
+    document: Document
+    score: float
+    match_type: str
+    excerpt: str = ""
+
+    def to_dict(self):
+        return {
+            "source": self.document.source_url,
+            "doc_title": self.document.title,
+            "section_title": self.section.title,
+            "content": self.section.content,
+            "excerpt": self.excerpt,
+            "score": self.score,
+            "match_type": self.match_type,
+            "keywords": self.section.keywords,
+            "heading_level": self.section.heading_level,
+        }
+
+
+def legacy_load_results(engine, cursor, ranked, query_terms):
+    """The eager loading search used to do for every hit"""
+    rows = engine._fetch_rows(cursor, [rowid for rowid, _ in ranked])
+    results = []
+    for rowid, score in ranked:
+        row = rows[rowid]
+        section = DocumentSection(
+            id=row.section_id,
+            document_id=row.document_id,
+            title=row.title,
+            content=row.content,
+            heading_level=row.heading_level,
+            keywords=json.loads(row.keywords_json),
+            order=row.order,
+        )
+        document = Document(
+            id=row.document_id,
+            source_url=row.source_url,
+            title=row.doc_title,
+            doc_type=row.doc_type,
+            date_fetched=None,
+            sections=[],
+        )
+        results.append(LegacySearchResult(
+            section, document, score, "keyword", engine._create_excerpt(row.content, query_terms),
+        ))
+    return results
+
+
+def measure(load, rankings, term_sets):
+    """(seconds, bytes retained by the results, peak bytes while building and serving)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = [load(ranked, terms) for ranked, terms in zip(rankings, term_sets)]
+    retained, _ = tracemalloc.get_traced_memory()
+    for results in held:
+        [result.to_dict() for result in results]
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = DocsAgent(Path(tmp) / "index", embedding_provider=None, query_cache_size=0)
+        docs = make_documents(args.sections)
+        for i in range(0, len(docs), 50):
+            agent._save_documents(docs[i:i + 50])
+
+        engine = agent.search_engine
+        cursor = engine.db.reader().cursor()
+        queries = random_queries(args.queries)
+        term_sets = [set(tokenize(query)) for query in queries]
+        rankings = engine.inverted_index.top_many(cursor, queries, args.top_k, term_sets)
+        hits = sum(len(ranked) for ranked in rankings)
+
+        variants = {
+            "before": lambda ranked, terms: legacy_load_results(engine, cursor, ranked, terms),
+            "lazy": lambda ranked, terms: engine._load_results(cursor, ranked, terms, "keyword"),
+        }
+        print(f"{args.sections} sections, {args.queries} queries, {hits} hits held")
+        print(f"  {'variant':<8} {'time':>10} {'retained':>12} {'per hit':>10} {'peak':>12}")
+        for name, load in variants.items():
+            elapsed, retained, peak = measure(load, rankings, term_sets)
+            print(f"  {name:<8} {elapsed * 1000:>7.0f} ms {retained / 1e6:>9.1f} MB "
+                  f"{retained / max(hits, 1):>7.0f} B {peak / 1e6:>9.1f} MB")
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
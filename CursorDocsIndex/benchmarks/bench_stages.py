@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: where the time of a search goes, and what tracing it costs
+
+Runs the same random queries with every search method against a synthetic
+index (query cache off) and prints the per-stage p50/p95/p99 recorded by
+DocsAgent.metrics, i.e. what /metrics exports. Then measures what tracing
+adds to a search: the cost of one span, inside a trace and outside of one
+(where it is a no-op), times the spans a search records.
+
+Usage:
+    python benchmarks/bench_stages.py --sections 20000 --queries 200
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import make_documents, random_queries
+
+from docs_agent import DocsAgent
+from docs_agent.metrics import Metrics, span
+
+METHODS = ("keyword", "fts", "semantic", "hybrid")
+
+
+def span_cost_us(traced: bool, rounds: int = 200_000) -> float:
+    """Microseconds one span takes, with or without a trace to report to"""
+    def run():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            with span("stage"):
+                pass
+        return (time.perf_counter() - start) / rounds * 1e6
+
+    if not traced:
+        return run()
+    with Metrics().trace("bench", ""):
+        return run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = DocsAgent(Path(tmp) / "index", embedding_provider="hash", query_cache_size=0)
+        docs = make_documents(args.sections)
+        for i in range(0, len(docs), 50):
+            agent._save_documents(docs[i:i + 50])
+        queries = random_queries(args.queries)
+        print(f"{args.sections} sections, {len(queries)} queries per method")
+
+        per_method = {}
+        for method in METHODS:
+            agent.metrics = Metrics()
+            for query in queries:
+                agent.search(query, top_k=10, method=method)
+            summary = agent.metrics.summary()
+            total = summary["docs_search_seconds"]
+            print(f"\n{method}  ({', '.join(total)})")
+            print(f"  {'stage':<16} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+            stages = sorted(summary["docs_search_stage_seconds"].items(), key=lambda item: -item[1]["mean"])
+            per_method[method] = stages
+            for labels, stats in [*stages, *total.items()]:
+                name = dict(pair.split("=") for pair in labels.split(",")).get("stage", "total")
+                print(f"  {name:<16} {stats['count']:>6} " + " ".join(
+                    f"{stats[q] * 1000:>6.3f} ms" for q in ("p50", "p95", "p99")
+                ))
+
+        traced, untraced = span_cost_us(True), span_cost_us(False)
+        spans = max(len(stages) for stages in per_method.values())
+        print(f"\ntracing overhead: {traced:.2f} us per span ({untraced:.2f} us outside a trace), "
+              f"at most {spans} spans per search: ~{traced * spans:.0f} us per search")
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
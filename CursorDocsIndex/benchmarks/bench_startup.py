@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: startup cost of `docs_cli.py lookup`
+
+Runs the CLI the way an editor integration does, one process per lookup,
+under `python -X importtime`, against a synthetic index in a temporary
+HOME. Reported per variant: median wall time per lookup, total import time
+and the heaviest top-level imports.
+
+    in-process   no daemon running: the CLI opens the index itself
+    daemon       `docs_cli.py daemon start` holds the index open
+
+Usage:
+    python benchmarks/bench_startup.py --sections 5000 --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from synthetic import make_documents, random_queries
+
+CLI = Path(__file__).resolve().parent.parent / "docs_cli.py"
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds of each top-level import in `-X importtime` output"""
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below their importer
+        if not name.startswith("  "):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def run_lookups(env: Dict[str, str], queries: List[str]) -> Tuple[List[float], Dict[str, int]]:
+    """Wall seconds per lookup, and the imports of the last one"""
+    times, imports = [], {}
+    for query in queries:
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", str(CLI), "lookup", query, "--json"],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        times.append(time.perf_counter() - start)
+        imports = parse_importtime(proc.stderr)
+    return times, imports
+
+
+def wait_for_daemon(env: Dict[str, str], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = subprocess.run(
+            [sys.executable, str(CLI), "daemon", "status"], env=env, capture_output=True,
+        )
+        if status.returncode == 0:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("daemon did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=6, help="Heaviest imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, DOCS_EMBEDDING_PROVIDER="hash")
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(CLI.parent), env.get("PYTHONPATH")]))
+
+        sys.path.insert(0, str(CLI.parent))
+        from docs_agent import DocsAgent
+
+        agent = DocsAgent(Path(home) / "CursorDocsIndex", embedding_provider="hash")
+        docs = make_documents(args.sections)
+        for i in range(0, len(docs), 50):
+            agent._save_documents(docs[i:i + 50])
+        agent.close()
+
+        queries = random_queries(args.runs)
+        results = {"in-process": run_lookups(env, queries)}
+
+        daemon = subprocess.Popen(
+            [sys.executable, str(CLI), "daemon", "start"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_daemon(env)
+            results["daemon"] = run_lookups(env, queries)
+        finally:
+            subprocess.run([sys.executable, str(CLI), "daemon", "stop"], env=env, capture_output=True)
+            daemon.wait(timeout=30)
+
+    print(f"{args.sections} sections, {args.runs} lookups per variant")
+    print(f"  {'variant':<12} {'wall':>9} {'imports':>10}   heaviest imports")
+    for name, (times, imports) in results.items():
+        heaviest = sorted(imports.items(), key=lambda item: -item[1])[:args.top]
+        print(f"  {name:<12} {statistics.median(times) * 1000:>6.0f} ms "
+              f"{sum(imports.values()) / 1000:>7.0f} ms   "
+              + ", ".join(f"{module} {us / 1000:.0f}" for module, us in heaviest))
+
+
+if __name__ == "__main__":
+    main()
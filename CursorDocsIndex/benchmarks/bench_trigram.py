@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: term expansion through the trigram index
+
+Sections get a few synthetic identifiers each (`request_handler_17`,
+`SessionCachePool`...) so the vocabulary is large, as in real API docs.
+Measured:
+
+    substring   partial identifiers: the old full-vocabulary instr() scan
+                vs. the trigram lookup (results must be identical)
+    fuzzy       words with one typo: how often the intended term is found,
+                and keyword search latency with and without typo tolerance
+
+Usage:
+    python benchmarks/bench_trigram.py --sections 20000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import WORDS, make_documents
+
+from docs_agent import DocsAgent
+from docs_agent.inverted_index import tokenize
+
+
+def identifier(rng: random.Random) -> str:
+    parts = rng.sample(WORDS, rng.choice([2, 3]))
+    if rng.random() < 0.5:
+        return "_".join(parts) + f"_{rng.randrange(100)}"
+    return "".join(part.title() for part in parts) + rng.choice(["", "Base", "Impl", "V2"])
+
+
+def typo(rng: random.Random, word: str) -> str:
+    """Drop, double or swap one character"""
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(["drop", "double", "swap"])
+    if kind == "drop":
+        return word[:i] + word[i + 1:]
+    if kind == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def timed(fn, items):
+    """(results, per-item milliseconds)"""
+    results, latencies = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"  {name:<22} mean {statistics.mean(latencies):7.2f} ms   "
+          f"p50 {statistics.median(latencies):7.2f} ms   p95 {p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, default=20000)
+    parser.add_argument("--identifiers", type=int, default=5, help="Identifiers per section")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = DocsAgent(Path(tmp) / "index", embedding_provider=None, query_cache_size=0)
+        docs = make_documents(args.sections)
+        names = set()
+        for doc in docs:
+            for section in doc.sections:
+                extra = [identifier(rng) for _ in range(args.identifiers)]
+                names.update(extra)
+                section.content += " " + " ".join(extra)
+        for i in range(0, len(docs), 50):
+            agent._save_documents(docs[i:i + 50])
+
+        index = agent.search_engine.inverted_index
+        cursor = agent.db.reader().cursor()
+        vocabulary = cursor.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        print(f"{args.sections} sections, {vocabulary} vocabulary terms")
+
+        # Partial identifiers, as typed while the name is being completed
+        fragments = []
+        for name in rng.sample(sorted(names), args.queries):
+            term = tokenize(name)[0]
+            fragments.append(term[:rng.randrange(4, len(term) + 1)])
+
+        def scan(fragment):
+            cursor.execute("SELECT term FROM terms WHERE instr(term, ?) > 0", (fragment,))
+            return sorted(term for (term,) in cursor.fetchall())
+
+        before, scan_ms = timed(scan, fragments)
+        after, trigram_ms = timed(lambda f: sorted(index.trigrams.containing(cursor, f)), fragments)
+        assert before == after, "trigram lookup must match the vocabulary scan"
+        print("substring expansion")
+        report("instr() scan", scan_ms)
+        report("trigram index", trigram_ms)
+
+        typos = [(word, typo(rng, word)) for word in rng.choices(WORDS, k=args.queries)]
+        found, fuzzy_ms = timed(lambda pair: index.trigrams.similar(cursor, pair[1]), typos)
+        recall = sum(word in [term for term, _ in similar] for (word, _), similar in zip(typos, found))
+        print(f"fuzzy expansion: intended term found for {recall}/{len(typos)} typos")
+        report("similar()", fuzzy_ms)
+
+        search = lambda pair: agent.search(pair[1], top_k=10, method="keyword")
+        hits, tolerant_ms = timed(search, typos)
+        answered = sum(bool(results) for results in hits)
+        index.expansion_budget = 0
+        _, strict_ms = timed(search, typos)
+        print(f"keyword search on typos: {answered}/{len(typos)} answered with typo tolerance, "
+              f"0/{len(typos)} without")
+        report("typo tolerance", tolerant_ms)
+        report("exact terms only", strict_ms)
+        agent.close()
+
+
+if __name__ == "__main__":
+    main()
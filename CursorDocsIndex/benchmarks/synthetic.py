@@ -0,0 +1,118 @@
+"""
+Synthetic corpus generation shared by the benchmarks
+"""
+
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# Allow running as `python benchmarks/<script>.py` from the project root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docs_agent.models import Document, DocumentSection, DocumentType
+
+WORDS = [
+    "request", "response", "session", "token", "header", "client", "server",
+    "router", "dependency", "injection", "middleware", "handler", "schema",
+    "validation", "model", "field", "query", "path", "parameter", "cookie",
+    "authentication", "authorization", "oauth", "scope", "cache", "timeout",
+    "retry", "stream", "upload", "download", "websocket", "event", "hook",
+    "component", "state", "effect", "context", "reducer", "render", "props",
+    "database", "transaction", "migration", "index", "cursor", "connection",
+    "pool", "worker", "queue", "task", "config", "settings", "environment",
+    "logging", "metrics", "tracing", "error", "exception", "status", "limit",
+]
+
+
+def make_documents(num_sections: int, sections_per_doc: int = 50,
+                   words_per_section: int = 120, seed: int = 42) -> List[Document]:
+    """Build documents with `num_sections` sections of random vocabulary"""
+    rng = random.Random(seed)
+    # Zipf-ish weighting so some terms are common and some are rare
+    weights = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+    documents = []
+
+    for doc_num in range((num_sections + sections_per_doc - 1) // sections_per_doc):
+        doc_id = f"bench{doc_num:06d}"
+        count = min(sections_per_doc, num_sections - doc_num * sections_per_doc)
+        sections = []
+        for order in range(count):
+            title = " ".join(rng.choices(WORDS, weights, k=3)).title()
+            content = " ".join(rng.choices(WORDS, weights, k=words_per_section))
+            sections.append(DocumentSection(
+                id=f"{doc_id}_{order}",
+                document_id=doc_id,
+                title=title,
+                content=content,
+                heading_level=2,
+                keywords=sorted(set(rng.choices(WORDS, weights, k=8))),
+                order=order,
+            ))
+        documents.append(Document(
+            id=doc_id,
+            source_url=f"https://example.com/docs/{doc_num}",
+            title=f"Benchmark Document {doc_num}",
+            doc_type=DocumentType.HTML,
+            date_fetched=datetime.now(),
+            sections=sections,
+        ))
+
+    return documents
+
+
+def random_queries(count: int, seed: int = 7) -> List[str]:
+    """Two/three word queries drawn uniformly from the vocabulary"""
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, rng.choice([1, 2, 3]))) for _ in range(count)]
+
+
+def make_pdf(path: Path, num_pages: int, pages_per_chapter: int = 10,
+             lines_per_page: int = 40, seed: int = 42) -> Path:
+    """
+    Write a manual-like PDF: chapters of random vocabulary with an outline
+    entry per chapter and per section (two per page), needs pypdf
+    """
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+
+    chapter = None
+    for number in range(num_pages):
+        headings = []
+        if number % pages_per_chapter == 0:
+            headings.append((1, f"Chapter {number // pages_per_chapter + 1} {rng.choice(WORDS).title()}"))
+        headings.append((2, f"{number + 1}.1 {' '.join(rng.choices(WORDS, k=2)).title()}"))
+        headings.append((2, f"{number + 1}.2 {' '.join(rng.choices(WORDS, k=2)).title()}"))
+
+        lines = []
+        for i, (_, heading) in enumerate(headings):
+            lines.append(heading)
+            lines.extend(" ".join(rng.choices(WORDS, k=10)) for _ in range(lines_per_page // len(headings)))
+        text = "\n".join(f"({line}) Tj T*" for line in lines)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 9 Tf 11 TL 40 800 Td {text} ET".encode())
+
+        page = writer.add_blank_page(595, 842)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        for level, heading in headings:
+            if level == 1:
+                chapter = writer.add_outline_item(heading, number)
+            else:
+                writer.add_outline_item(heading, number, parent=chapter)
+
+    writer.add_metadata({"/Title": "Synthetic Vendor Manual"})
+    with open(path, "wb") as f:
+        writer.write(f)
+    return Path(path)
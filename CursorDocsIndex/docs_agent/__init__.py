@@ -10,10 +10,28 @@ Author: Built for Noah's Vibe-Coding Environment
 __version__ = "1.0.0"
 __author__ = "Vibe Coding Team"
 
-from .core import DocsAgent
-from .ingestion import DocumentIngester
-from .search import SemanticSearch
-from .models import Document, DocumentSection, SearchResult
+import importlib
+
+# Exports are imported on first access, so light submodules (e.g. the
+# daemon client behind `docs_cli.py lookup`) don't load the whole engine
+_LAZY_EXPORTS = {
+    "DocsAgent": ".core",
+    "DocumentIngester": ".ingestion",
+    "SemanticSearch": ".search",
+    "Document": ".models",
+    "DocumentSection": ".models",
+    "SearchResult": ".models",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     "DocsAgent",
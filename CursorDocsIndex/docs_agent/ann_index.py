@@ -0,0 +1,390 @@
+"""
+Approximate nearest-neighbour backends for the vector store
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Rowid marking an empty or deleted slot in the vector store
+EMPTY = -1
+
+
+class ANNIndex:
+    """
+    Base class for approximate indexes layered over a VectorStore
+
+    The store calls `add` after appending rows, `remove` after tombstoning,
+    `remap` after compaction and `reset` when it is cleared. `search` returns
+    None while the index isn't usable, in which case the store falls back
+    to an exact scan. The store makes every call under its lock, so a change
+    never runs alongside a search.
+    """
+
+    name = "base"
+
+    def add(self, store, start: int, stop: int):
+        """Index store rows [start, stop)"""
+
+    def remove(self, rowids: List[int]):
+        """Forget the given section rowids"""
+
+    def remap(self, keep: np.ndarray):
+        """Store rows were compacted: new row i is old row keep[i]"""
+
+    def reset(self):
+        """Drop everything"""
+
+    def flush(self):
+        """Write changes kept in memory to disk (at checkpoints and on close)"""
+
+    def search(self, store, query: np.ndarray, top_k: int) -> Optional[List[Tuple[int, float]]]:
+        raise NotImplementedError
+
+    def search_many(self, store, queries: np.ndarray, top_k: int) -> Optional[List[List[Tuple[int, float]]]]:
+        """Search (m, dim) queries; None if any of them needs the exact scan"""
+        results = []
+        for query in queries:
+            hits = self.search(store, query, top_k)
+            if hits is None:
+                return None
+            results.append(hits)
+        return results
+
+
+class IVFIndex(ANNIndex):
+    """
+    Inverted-file (IVF-Flat) index
+
+    Vectors are clustered with spherical k-means into ~sqrt(n) lists; a query
+    scores only the rows of the `nprobe` lists whose centroids are closest.
+    Raising `nprobe` trades latency for recall. The index trains itself once
+    the store holds `min_train` vectors and retrains when the store has grown
+    `retrain_factor`-fold; below `min_train` an exact scan is fast enough.
+
+    Files under `ann_dir`: centroids.npy, assign.i32 (one list id per store
+    row, appended raw so incremental inserts are O(batch)) and meta.json.
+    """
+
+    name = "ivf"
+
+    def __init__(self, ann_dir: Path, nprobe: int = 16, min_train: int = 50_000,
+                 retrain_factor: float = 4.0, kmeans_iterations: int = 10,
+                 seed: int = 0):
+        self.ann_dir = Path(ann_dir)
+        self.ann_dir.mkdir(parents=True, exist_ok=True)
+        self.centroids_path = self.ann_dir / "centroids.npy"
+        self.assign_path = self.ann_dir / "assign.i32"
+        self.meta_path = self.ann_dir / "meta.json"
+
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assign: Optional[np.ndarray] = None
+        self.trained_count = 0
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _load(self):
+        if not (self.meta_path.exists() and self.centroids_path.exists()):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self.trained_count = meta["trained_count"]
+        self.centroids = np.load(self.centroids_path)
+        self.assign = np.fromfile(self.assign_path, dtype=np.int32)
+
+    def _save(self):
+        np.save(self.centroids_path, self.centroids)
+        self.assign.tofile(self.assign_path)
+        with open(self.meta_path, "w") as f:
+            json.dump({
+                "trained_count": self.trained_count,
+                "nlist": len(self.centroids),
+            }, f)
+
+    def reset(self):
+        self.centroids = None
+        self.assign = None
+        self.trained_count = 0
+        for path in (self.centroids_path, self.assign_path, self.meta_path):
+            path.unlink(missing_ok=True)
+
+    def add(self, store, start: int, stop: int):
+        live = len(store)
+        if not self.trained or len(self.assign) != start:
+            # Untrained, or out of sync with the store (e.g. crash mid-write)
+            if live >= self.min_train:
+                self.train(store)
+            return
+
+        if live >= self.trained_count * self.retrain_factor:
+            self.train(store)
+            return
+
+        new = self._nearest(store.matrix[start:stop])
+        with open(self.assign_path, "ab") as f:
+            new.tofile(f)
+        self.assign = np.concatenate([self.assign, new])
+
+    def remap(self, keep: np.ndarray):
+        if self.trained:
+            self.assign = self.assign[keep]
+            self._save()
+
+    def train(self, store):
+        """Cluster the live vectors and assign every store row to a list"""
+        rows = np.nonzero(store.rowids[:store.count] != EMPTY)[0]
+        if not len(rows):
+            return
+
+        nlist = max(1, int(math.sqrt(len(rows))))
+        rng = np.random.default_rng(self.seed)
+        # ~64 points per centroid is plenty for k-means
+        sample = rng.choice(rows, size=min(len(rows), nlist * 64), replace=False)
+        sample = np.array(store.matrix[np.sort(sample)])
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            nonempty = counts > 0
+            sums = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+            centroids[nonempty] = sums
+            # Re-seed empty lists from random sample points
+            empty = np.nonzero(~nonempty)[0]
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), size=len(empty))]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        self.centroids = centroids.astype(np.float32)
+        self.assign = self._nearest(store.matrix[:store.count])
+        self.trained_count = len(rows)
+        self._save()
+
+    def _nearest(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """Closest centroid per vector, in chunks to bound memory"""
+        out = np.empty(len(vectors), dtype=np.int32)
+        for i in range(0, len(vectors), chunk):
+            out[i:i + chunk] = np.argmax(vectors[i:i + chunk] @ self.centroids.T, axis=1)
+        return out
+
+    def search(self, store, query: np.ndarray, top_k: int) -> Optional[List[Tuple[int, float]]]:
+        if not self.trained or len(self.assign) != store.count:
+            return None
+
+        return self._search_lists(store, query, self.centroids @ query, top_k)
+
+    def search_many(self, store, queries: np.ndarray, top_k: int) -> Optional[List[List[Tuple[int, float]]]]:
+        if not self.trained or len(self.assign) != store.count:
+            return None
+
+        # Centroid scores for every query in one matrix product
+        centroid_scores = queries @ self.centroids.T
+        return [
+            self._search_lists(store, query, scores, top_k)
+            for query, scores in zip(queries, centroid_scores)
+        ]
+
+    def _search_lists(self, store, query: np.ndarray, centroid_scores: np.ndarray,
+                      top_k: int) -> List[Tuple[int, float]]:
+        """Exact scores over the rows of the nprobe best lists"""
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+
+        selected = np.zeros(len(self.centroids), dtype=bool)
+        selected[probe] = True
+        candidates = np.nonzero(selected[self.assign])[0]
+        candidates = candidates[store.rowids[candidates] != EMPTY]
+        if not len(candidates):
+            return []
+
+        scores = store.matrix[candidates] @ query
+        k = min(top_k, len(candidates))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return [(int(store.rowids[candidates[i]]), float(scores[i])) for i in top]
+
+
+class HNSWIndex(ANNIndex):
+    """
+    HNSW graph via the optional `hnswlib` package
+
+    Labels are section rowids, so compaction of the store doesn't affect the
+    graph. `ef_search` trades latency for recall at query time.
+
+    Inserts and deletes change the graph in memory only. Writing it out
+    costs O(index size), so that happens on `flush()` (once per ingest and
+    on close) or after `save_every` changes. A graph saved before later
+    changes were lost (a crash) is marked unclean and discarded on load;
+    searches scan exactly until the next insert rebuilds it from the store.
+    """
+
+    name = "hnsw"
+
+    def __init__(self, ann_dir: Path, ef_search: int = 64, ef_construction: int = 200,
+                 m: int = 16, save_every: int = 100_000):
+        import hnswlib
+
+        self._hnswlib = hnswlib
+        self.ann_dir = Path(ann_dir)
+        self.ann_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.ann_dir / "hnsw.bin"
+        self.meta_path = self.ann_dir / "meta.json"
+        self.ef_search = ef_search
+        self.ef_construction = ef_construction
+        self.m = m
+        self.save_every = save_every
+        self.index = None
+        self.dim: Optional[int] = None
+        # Changes since the graph was last written
+        self.unsaved = 0
+        self._load()
+
+    def _load(self):
+        if not (self.meta_path.exists() and self.index_path.exists()):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if not meta.get("clean", True):
+            # Changed after its last save and never saved again
+            self.reset()
+            return
+        self.dim = meta["dim"]
+        self.index = self._hnswlib.Index(space="ip", dim=self.dim)
+        self.index.load_index(str(self.index_path), allow_replace_deleted=True)
+
+    def _save(self):
+        self.index.save_index(str(self.index_path))
+        self._save_meta(clean=True)
+        self.unsaved = 0
+
+    def _save_meta(self, clean: bool):
+        with open(self.meta_path, "w") as f:
+            json.dump({"dim": self.dim, "clean": clean}, f)
+
+    def _changed(self, count: int):
+        """Note `count` in-memory changes, saving once enough have piled up"""
+        if not self.unsaved and self.index_path.exists():
+            # The file on disk no longer matches the graph
+            self._save_meta(clean=False)
+        self.unsaved += count
+        if self.unsaved >= self.save_every:
+            self._save()
+
+    def flush(self):
+        if self.index is not None and self.unsaved:
+            self._save()
+
+    def reset(self):
+        self.index = None
+        self.dim = None
+        self.unsaved = 0
+        for path in (self.index_path, self.meta_path):
+            path.unlink(missing_ok=True)
+
+    def add(self, store, start: int, stop: int):
+        if self.index is None or self.dim != store.dim:
+            self.dim = store.dim
+            self.index = self._hnswlib.Index(space="ip", dim=self.dim)
+            self.index.init_index(
+                max_elements=max(1024, stop), ef_construction=self.ef_construction,
+                M=self.m, allow_replace_deleted=True,
+            )
+            start = 0
+
+        needed = self.index.get_current_count() + (stop - start)
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, self.index.get_max_elements() * 2))
+
+        rowids = np.asarray(store.rowids[start:stop])
+        live = rowids != EMPTY
+        if live.any():
+            self.index.add_items(
+                np.asarray(store.matrix[start:stop])[live], rowids[live],
+                replace_deleted=True,
+            )
+        self._changed(stop - start)
+
+    def remove(self, rowids: List[int]):
+        if self.index is None:
+            return
+        for rowid in rowids:
+            try:
+                self.index.mark_deleted(int(rowid))
+            except RuntimeError:
+                pass  # Never indexed
+        self._changed(len(rowids))
+
+    def search(self, store, query: np.ndarray, top_k: int) -> Optional[List[Tuple[int, float]]]:
+        if self.index is None or self.dim != store.dim:
+            return None
+
+        k = min(top_k, len(store))
+        if not k:
+            return []
+        self.index.set_ef(max(self.ef_search, k))
+        try:
+            labels, distances = self.index.knn_query(query.reshape(1, -1), k=k)
+        except RuntimeError:
+            # Too few reachable live elements for k, let the store scan
+            return None
+        # Inner-product "distance" is 1 - dot
+        return [(int(label), float(1.0 - dist)) for label, dist in zip(labels[0], distances[0])]
+
+    def search_many(self, store, queries: np.ndarray, top_k: int) -> Optional[List[List[Tuple[int, float]]]]:
+        if self.index is None or self.dim != store.dim:
+            return None
+
+        k = min(top_k, len(store))
+        if not k:
+            return [[] for _ in queries]
+        self.index.set_ef(max(self.ef_search, k))
+        try:
+            # hnswlib spreads a batch across its own threads
+            labels, distances = self.index.knn_query(queries, k=k)
+        except RuntimeError:
+            return None
+        return [
+            [(int(label), float(1.0 - dist)) for label, dist in zip(row_labels, row_distances)]
+            for row_labels, row_distances in zip(labels, distances)
+        ]
+
+
+def create_ann_index(backend: Optional[str], ann_dir: Path, **options) -> Optional[ANNIndex]:
+    """
+    Create an ANN backend by name
+
+    Args:
+        backend: "ivf", "hnsw", or None for exact search only
+        ann_dir: Directory for the backend's files
+        options: Backend knobs (nprobe, min_train for IVF; ef_search, m for HNSW)
+
+    Returns:
+        Backend instance, or None
+    """
+    if backend is None:
+        return None
+    elif backend == "ivf":
+        return IVFIndex(ann_dir, **options)
+    elif backend == "hnsw":
+        try:
+            return HNSWIndex(ann_dir, **options)
+        except ImportError:
+            print("⚠️  hnswlib not installed - using IVF index")
+            return IVFIndex(ann_dir)
+    raise ValueError(f"Unknown ANN backend: {backend}")
@@ -0,0 +1,110 @@
+"""
+Compressed, content-addressed storage for raw document content
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # gzip from the standard library is the fallback
+    zstandard = None
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+def content_digest(content: str) -> str:
+    """Address of a blob: sha256 of its UTF-8 text"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class BlobStore:
+    """
+    Raw page content, stored once per distinct body
+
+    Blobs live in `<root>/<first 2 hex>/<sha256>.zst` (or `.gz` when the
+    optional `zstandard` package isn't installed). Identical content
+    fetched from several URLs, or re-fetched unchanged, is stored once.
+    Both formats are readable regardless of which one new blobs use.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.extension = ".zst" if zstandard is not None else ".gz"
+
+    def _path(self, digest: str, extension: str) -> Path:
+        return self.root / digest[:2] / f"{digest}{extension}"
+
+    def _find(self, digest: str) -> Optional[Path]:
+        for extension in (".zst", ".gz"):
+            path = self._path(digest, extension)
+            if path.exists():
+                return path
+        return None
+
+    def put(self, content: str) -> str:
+        """Store content if it isn't already present; returns its digest"""
+        digest = content_digest(content)
+        if self._find(digest) is not None:
+            return digest
+
+        data = content.encode('utf-8')
+        if zstandard is not None:
+            data = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        else:
+            data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+        path = self._path(digest, self.extension)
+        path.parent.mkdir(exist_ok=True)
+        # Write-then-rename so a crash never leaves a truncated blob
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Decompressed content, or None if the blob is missing"""
+        path = self._find(digest)
+        if path is None:
+            return None
+        data = path.read_bytes()
+        if path.suffix == ".zst":
+            if zstandard is None:
+                raise RuntimeError(f"{path.name} is zstd-compressed; install 'zstandard' to read it")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            data = gzip.decompress(data)
+        return data.decode('utf-8')
+
+    def blobs(self) -> Iterator[Tuple[str, Path]]:
+        """(digest, path) of every stored blob"""
+        for path in self.root.glob("??/*"):
+            if path.suffix in (".zst", ".gz"):
+                yield path.stem, path
+
+    def prune(self, keep: Iterable[str]) -> Tuple[int, int]:
+        """
+        Delete blobs not in `keep`
+
+        Returns:
+            (blobs deleted, bytes freed)
+        """
+        keep = set(keep)
+        deleted = freed = 0
+        for digest, path in list(self.blobs()):
+            if digest not in keep:
+                freed += path.stat().st_size
+                path.unlink()
+                deleted += 1
+        return deleted, freed
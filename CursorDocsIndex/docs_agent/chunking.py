@@ -0,0 +1,177 @@
+"""
+Token-aware splitting of oversized sections into overlapping chunks
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from .models import count_tokens
+
+BLOCK_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+CODE_FENCE = re.compile(r"^\s*(```|~~~)")
+# A line introducing a list, e.g. "**Parameters:**" in OpenAPI operations
+LIST_HEADER = re.compile(r"^\W*\w[^:\n]{0,60}:\W*$")
+
+# (text, tokens, separator placed before it when joined to the previous unit)
+Unit = Tuple[str, int, str]
+
+
+@dataclass
+class Chunker:
+    """
+    Split section content into chunks of at most `max_tokens` tokens
+
+    Content is cut at the coarsest boundary that fits: blank-line blocks,
+    then lines, then sentences, and only as a last resort inside a run of
+    words. Fenced code blocks stay whole when they fit and are otherwise cut
+    between lines; a list that has to be cut (OpenAPI parameters, responses)
+    repeats its header line in every piece. Consecutive chunks share about
+    `overlap` tokens of context at their boundary.
+
+    Tokens are counted with models.count_tokens.
+    """
+    max_tokens: int = 512
+    overlap: int = 64
+
+    def __post_init__(self):
+        if self.max_tokens < 1:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= self.overlap < self.max_tokens:
+            raise ValueError("overlap must be between 0 and max_tokens - 1")
+
+    def split(self, text: str) -> List[str]:
+        """Chunks of `text`; a single element when it already fits"""
+        if count_tokens(text) <= self.max_tokens:
+            return [text]
+        return self._pack(self._units(text))
+
+    def _units(self, text: str) -> List[Unit]:
+        """Pieces of text that each fit in a chunk, in order"""
+        units: List[Unit] = []
+        for block in self._blocks(text):
+            tokens = count_tokens(block)
+            if tokens <= self.max_tokens:
+                units.append((block, tokens, "\n\n"))
+            elif CODE_FENCE.match(block) or "\n" in block.strip():
+                units.extend(self._lines(block))
+            else:
+                units.extend(self._sentences(block, "\n\n"))
+        return units
+
+    @staticmethod
+    def _blocks(text: str) -> List[str]:
+        """Blank-line separated blocks, fenced code blocks kept together"""
+        blocks: List[str] = []
+        fenced: List[str] = []
+        for block in BLOCK_BREAK.split(text.strip()):
+            fences = sum(1 for line in block.splitlines() if CODE_FENCE.match(line))
+            if fenced:
+                fenced.append(block)
+                if fences % 2:
+                    blocks.append("\n\n".join(fenced))
+                    fenced = []
+            elif fences % 2:
+                fenced.append(block)
+            elif block.strip():
+                blocks.append(block)
+        if fenced:
+            blocks.append("\n\n".join(fenced))
+        return blocks
+
+    def _lines(self, block: str) -> List[Unit]:
+        """Line-level units of an oversized block"""
+        lines = block.split("\n")
+        header = lines[0] if LIST_HEADER.match(lines[0]) and not CODE_FENCE.match(lines[0]) else None
+        units: List[Unit] = []
+        separator = "\n\n"
+        for line in lines:
+            tokens = count_tokens(line)
+            if tokens > self.max_tokens:
+                units.extend(self._sentences(line, separator))
+            else:
+                units.append((line, tokens, separator))
+            separator = "\n"
+        if header is None:
+            return units
+
+        # Re-state the list header at the top of every piece
+        header_tokens = count_tokens(header)
+        budget = self.max_tokens - header_tokens
+        if budget <= self.overlap:
+            return units
+        pieces = Chunker(budget, self.overlap)._pack(units[1:])
+        return [
+            (f"{header}\n{piece}", header_tokens + count_tokens(piece), "\n\n" if i == 0 else "\n")
+            for i, piece in enumerate(pieces)
+        ]
+
+    def _sentences(self, text: str, separator: str) -> List[Unit]:
+        """Sentence-level units, with over-long sentences cut into word windows"""
+        units: List[Unit] = []
+        for sentence in SENTENCE_BREAK.split(text):
+            tokens = count_tokens(sentence)
+            if tokens <= self.max_tokens:
+                units.append((sentence, tokens, separator))
+            else:
+                units.extend((window, count_tokens(window), separator) for window in self._windows(sentence))
+            separator = " "
+        return units
+
+    def _windows(self, text: str) -> List[str]:
+        """Cut a run of words into overlapping windows that fit"""
+        words = text.split()
+        windows = []
+        start = 0
+        while start < len(words):
+            end = start
+            tokens = 0
+            while end < len(words):
+                word_tokens = count_tokens(words[end])
+                if tokens + word_tokens > self.max_tokens and end > start:
+                    break
+                tokens += word_tokens
+                end += 1
+            windows.append(" ".join(words[start:end]))
+            if end == len(words):
+                break
+            # Step back over about `overlap` tokens, always moving forward
+            back = end
+            kept = 0
+            while back > start + 1 and kept + count_tokens(words[back - 1]) <= self.overlap:
+                back -= 1
+                kept += count_tokens(words[back])
+            start = back
+        return windows
+
+    def _pack(self, units: List[Unit]) -> List[str]:
+        """Greedily fill chunks with units, carrying an overlap tail forward"""
+        chunks: List[str] = []
+        current: List[Unit] = []
+        tokens = 0
+        for unit in units:
+            if current and tokens + unit[1] > self.max_tokens:
+                chunks.append(self._join(current))
+                # Trailing units worth at most `overlap` tokens start the next chunk
+                tail: List[Unit] = []
+                tail_tokens = 0
+                for previous in reversed(current):
+                    if tail_tokens + previous[1] > self.overlap or tail_tokens + previous[1] + unit[1] > self.max_tokens:
+                        break
+                    tail.insert(0, previous)
+                    tail_tokens += previous[1]
+                current, tokens = tail, tail_tokens
+            current.append(unit)
+            tokens += unit[1]
+        if current:
+            chunks.append(self._join(current))
+        return chunks
+
+    @staticmethod
+    def _join(units: List[Unit]) -> str:
+        parts = [units[0][0]]
+        for text, _, separator in units[1:]:
+            parts.append(separator)
+            parts.append(text)
+        return "".join(parts)
@@ -2,19 +2,62 @@
 Core Docs-Agent orchestrator
 """
 
+import functools
 import json
 import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Callable, Iterable, Iterator, Sized, Tuple
 from datetime import datetime
-from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
 
-from .models import Document, SearchResult, IndexStats
-from .ingestion import DocumentIngester
+from .models import (
+    Document,
+    DocumentSection,
+    DocumentType,
+    IndexStats,
+    SearchResult,
+    count_tokens,
+    section_hash,
+)
+from .chunking import Chunker
+from .blob_store import BlobStore
+from .database import Database, batched
+from .http_cache import HttpCache, NotModified
+from .migrations import migrate
+from .metrics import Metrics, Sample, SlowQueryLog, span
+from .pipeline import IngestionPipeline, ResultCallback
+from .query_cache import QueryCache, bump_generation, read_generation
 from .search import SemanticSearch
+from .snapshot import export_snapshot
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
+    from .ingestion import DocumentIngester
+
+# Below this many sources, documents are parsed in-process
+PROCESS_POOL_MIN_SOURCES = 4
+
+# Searches slower than the slow_query_threshold are logged here, in index_dir
+SLOW_QUERY_LOG = "logs/slow_queries.jsonl"
+
+
+@functools.lru_cache(maxsize=None)
+def _console() -> "Console":
+    """Progress output, imported on first ingest so searches never load rich"""
+    from rich.console import Console
+    return Console()
+
+
+def _parse_fetched(
+    source: str, fetched: Tuple[str, Dict[str, List[str]], str], chunker: Optional[Chunker] = None
+) -> Document:
+    """Parse stage of the pipeline, module-level so parser processes can unpickle it"""
+    from .ingestion import parse_document
+    content, known_keywords, corpus_path = fetched
+    return parse_document(
+        source, content, known_keywords=known_keywords, corpus_path=corpus_path, chunker=chunker
+    )
 
 
 class DocsAgent:
@@ -22,144 +65,487 @@ class DocsAgent:
     Main orchestrator for documentation indexing and search
     """
     
-    def __init__(self, index_dir: Path, embedding_provider: str = "openrouter"):
+    def __init__(
+        self,
+        index_dir: Path,
+        embedding_provider: str = "openrouter",
+        ann_backend: Optional[str] = "ivf",
+        ann_options: Optional[Dict[str, Any]] = None,
+        fusion: str = "rrf",
+        query_cache_size: int = 1024,
+        query_cache_ttl: float = 300,
+        persist_query_cache: bool = False,
+        chunk_tokens: Optional[int] = 512,
+        chunk_overlap: int = 64,
+        slow_query_threshold: Optional[float] = None,
+    ):
         """
         Initialize Docs-Agent
         
         Args:
             index_dir: Directory to store index and cache
-            embedding_provider: "openrouter", "openai", or "local"
+            embedding_provider: "openrouter", "openai", "local", or "hash"
+            ann_backend: "ivf", "hnsw", or None for exact vector search
+            ann_options: ANN knobs, e.g. {"nprobe": 32} or {"ef_search": 128}
+            fusion: Hybrid result fusion, "rrf" or "weighted"
+            query_cache_size: Search results kept in memory (0 disables)
+            query_cache_ttl: Seconds a cached result may be served
+            persist_query_cache: Save the cache under cache/ on close() and
+                start warm from it next time
+            chunk_tokens: Sections longer than this many tokens are also
+                indexed as overlapping chunks of at most this size, and
+                searches rank the chunks (None: never split)
+            chunk_overlap: Tokens shared by consecutive chunks
+            slow_query_threshold: Seconds past which a search is written to
+                the slow-query log (SLOW_QUERY_LOG) with its plan and stage
+                timings (None: no log)
         """
         self.index_dir = Path(index_dir)
         self.index_dir.mkdir(parents=True, exist_ok=True)
         
         # Create subdirectories
-        self.parsed_dir = self.index_dir / "parsed"
-        self.parsed_dir.mkdir(exist_ok=True)
-        
         self.cache_dir = self.index_dir / "cache"
         self.cache_dir.mkdir(exist_ok=True)
         
-        # Initialize components
-        self.ingester = DocumentIngester(self.cache_dir)
-        self.search_engine = SemanticSearch(self.index_dir, embedding_provider)
+        # Raw content, compressed and stored once per distinct body
+        self.blob_store = BlobStore(self.index_dir / "blobs")
+        
+        # Indexes created before compact storage kept one JSON per document here
+        self.parsed_dir = self.index_dir / "parsed"
         
-        # Metadata database
+        # Metadata database, shared by ingest and search
         self.db_path = self.index_dir / "metadata.db"
+        self.db = Database(self.db_path)
+        
+        # Initialize components; fetching and parsing are set up on first
+        # use (see the ingester property), so lookups skip their imports
+        self._http_cache: Optional[HttpCache] = None
+        self._ingester: Optional["DocumentIngester"] = None
+        self._lazy_lock = threading.RLock()
+        self.chunker = Chunker(chunk_tokens, chunk_overlap) if chunk_tokens else None
+        self.search_engine = SemanticSearch(
+            self.index_dir,
+            embedding_provider,
+            ann_backend=ann_backend,
+            ann_options=ann_options,
+            fusion=fusion,
+            database=self.db,
+        )
+        
+        # Repeated queries between index writes (see QueryCache)
+        self.query_cache = QueryCache(
+            max_entries=query_cache_size,
+            ttl_seconds=query_cache_ttl,
+            path=self.cache_dir / "query_cache.json" if persist_query_cache else None,
+        )
+        
+        # Search and ingestion timings, exported by render_metrics()
+        slow_log = None
+        if slow_query_threshold is not None:
+            slow_log = SlowQueryLog(self.index_dir / SLOW_QUERY_LOG, slow_query_threshold)
+        self.metrics = Metrics(slow_log)
+        
         self._init_database()
     
+    @property
+    def http_cache(self) -> HttpCache:
+        """Conditional-request cache of fetched pages, opened on first use"""
+        with self._lazy_lock:
+            if self._http_cache is None:
+                self._http_cache = HttpCache(self.cache_dir)
+            return self._http_cache
+    
+    @property
+    def ingester(self) -> "DocumentIngester":
+        """Fetcher and parsers, created on first use"""
+        with self._lazy_lock:
+            if self._ingester is None:
+                from .ingestion import DocumentIngester
+                self._ingester = DocumentIngester(self.cache_dir, http_cache=self.http_cache)
+            return self._ingester
+    
+    def close(self):
+        """Persist the query cache (if enabled) and ANN index, close the database connections"""
+        self.query_cache.save()
+        self.search_engine.vector_store.flush()
+        self.db.close()
+        if self._http_cache is not None:
+            self._http_cache.db.close()
+    
     def _init_database(self):
         """Initialize SQLite metadata database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS documents (
-                id TEXT PRIMARY KEY,
-                source_url TEXT NOT NULL,
-                title TEXT,
-                doc_type TEXT,
-                date_fetched TEXT,
-                num_sections INTEGER,
-                keywords TEXT,
-                metadata TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sections (
-                id TEXT PRIMARY KEY,
-                document_id TEXT,
-                title TEXT,
-                content TEXT,
-                heading_level INTEGER,
-                keywords TEXT,
-                order_num INTEGER,
-                FOREIGN KEY (document_id) REFERENCES documents(id)
-            )
-        """)
+        with self.db.transaction() as cursor:
+            # documents, sections, index_metadata and their upgrades
+            migrate(cursor)
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS index_metadata (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
+            # Term -> postings index used by keyword search
+            inverted_index = self.search_engine.inverted_index
+            inverted_index.create_schema(cursor)
+            inverted_index.ensure_built(cursor)
         
-        conn.commit()
-        conn.close()
+            # Optional FTS5 mirror of sections (skipped if SQLite lacks FTS5)
+            fts_index = self.search_engine.fts_index
+            fts_index.create_schema(cursor)
+            fts_index.ensure_built(cursor)
     
-    def ingest_sources(self, sources: List[str], show_progress: bool = True) -> List[Document]:
+    def ingest_sources(
+        self,
+        sources: Iterable[str],
+        show_progress: bool = True,
+        fetch_workers: int = 8,
+        parse_workers: Optional[int] = None,
+        per_host: int = 4,
+        batch_size: int = 25,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Document]:
         """
         Ingest multiple documentation sources
         
+        Sources are fetched concurrently, parsed in a process pool and written
+        by a single writer in batched transactions (see IngestionPipeline).
+        
         Args:
-            sources: List of URLs or file paths
+            sources: List (or lazy iterable) of URLs or file paths
             show_progress: Show progress bar
+            fetch_workers: Concurrent fetches
+            parse_workers: Parser processes (None = auto, 0 = parse inline)
+            per_host: Concurrent fetches per host
+            batch_size: Documents written per transaction
+            on_result: Called with (source, document, error) as each source
+                finishes, on the calling thread
             
         Returns:
             List of ingested documents
         """
-        documents = []
+        return self._run_pipeline(
+            sources, self._fetch_source, show_progress,
+            fetch_workers, parse_workers, per_host, batch_size, on_result,
+        )
+    
+    def crawl(
+        self,
+        seed_url: str,
+        max_depth: int = 3,
+        max_pages: int = 500,
+        path_prefix: Optional[str] = None,
+        use_sitemap: bool = True,
+        respect_robots: bool = True,
+        restart: bool = False,
+        show_progress: bool = True,
+        fetch_workers: int = 8,
+        parse_workers: Optional[int] = None,
+        per_host: int = 4,
+        batch_size: int = 25,
+    ) -> List[Document]:
+        """
+        Crawl a documentation site from a seed URL and ingest every page
         
-        if show_progress:
-            with Progress(
-                SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console,
-            ) as progress:
-                task = progress.add_task("[cyan]Ingesting documents...", total=len(sources))
-                
-                for source in sources:
-                    progress.update(task, description=f"[cyan]Ingesting: {source}")
-                    try:
-                        doc = self.ingester.ingest(source)
-                        self._save_document(doc)
-                        self.search_engine.index_document(doc)
-                        documents.append(doc)
-                        console.print(f"✅ Ingested: {doc.title}", style="green")
-                    except Exception as e:
-                        console.print(f"❌ Failed: {source} - {e}", style="red")
-                    progress.advance(task)
-        else:
-            for source in sources:
-                try:
-                    doc = self.ingester.ingest(source)
-                    self._save_document(doc)
-                    self.search_engine.index_document(doc)
-                    documents.append(doc)
-                except Exception as e:
-                    console.print(f"❌ Failed: {source} - {e}", style="red")
+        Pages stream into the ingestion pipeline as they are discovered.
+        Crawl progress is kept under cache/crawl, so running the same crawl
+        again after an interruption resumes it.
+        
+        Args:
+            seed_url: Page to start from
+            max_depth: Link hops from the seed to follow
+            max_pages: Pages to ingest in this run
+            path_prefix: Only follow URLs whose path starts with this
+            use_sitemap: Also queue pages listed in the site's sitemaps
+            respect_robots: Honour robots.txt rules and Crawl-delay
+            restart: Discard a previous, unfinished crawl of this seed
+            show_progress: Show progress output
+            fetch_workers, parse_workers, per_host, batch_size: As for ingest_sources
+            
+        Returns:
+            List of ingested documents
+        """
+        from .crawler import SiteCrawler
         
-        return documents
+        crawler = SiteCrawler(
+            seed_url,
+            self.cache_dir / "crawl",
+            session=self.ingester.session,
+            max_depth=max_depth,
+            max_pages=max_pages,
+            path_prefix=path_prefix,
+            use_sitemap=use_sitemap,
+            respect_robots=respect_robots,
+        )
+        if restart:
+            crawler.reset()
+        
+        def fetch(source: str):
+            content = None
+            try:
+                fetched = self._fetch_source(source)
+                content = fetched[0]
+                return fetched
+            except NotModified:
+                # Unchanged pages still have links worth following
+                content = self.http_cache.load(source)
+                raise
+            finally:
+                crawler.page_fetched(source, content)
+        
+        try:
+            return self._run_pipeline(
+                crawler, fetch, show_progress,
+                fetch_workers, parse_workers, per_host, batch_size,
+            )
+        finally:
+            crawler.close()
+    
+    def _run_pipeline(
+        self,
+        sources: Iterable[Optional[str]],
+        fetch: Callable[[str], Tuple[str, Dict[str, List[str]], str]],
+        show_progress: bool,
+        fetch_workers: int,
+        parse_workers: Optional[int],
+        per_host: int,
+        batch_size: int,
+        on_result: Optional[ResultCallback] = None,
+    ) -> List[Document]:
+        """Run sources through an IngestionPipeline, reporting each result"""
+        callback = on_result or (lambda source, doc, error: None)
+        
+        def report(source, doc, error):
+            outcome = "failed" if error is not None else "unchanged" if doc is None else "ingested"
+            self.metrics.inc("docs_ingest_sources_total", outcome=outcome)
+            callback(source, doc, error)
+        
+        total = len(sources) if isinstance(sources, Sized) else None
+        if parse_workers is None and total is not None and total < PROCESS_POOL_MIN_SOURCES:
+            # Spawning parser processes costs more than it saves here
+            parse_workers = 0
+        
+        pipeline = IngestionPipeline(
+            fetch=fetch,
+            parse=functools.partial(_parse_fetched, chunker=self.chunker),
+            write=self._save_documents,
+            fetch_workers=fetch_workers,
+            parse_workers=parse_workers,
+            per_host=per_host,
+            batch_size=batch_size,
+            observe=lambda stage, seconds: self.metrics.observe("docs_ingest_stage_seconds", seconds, stage=stage),
+            # Downloaded PDFs of sources that never reached a parser
+            discard=lambda source, fetched: self.ingester.discard(source, fetched[0]),
+        )
+        
+        def run(on_result: ResultCallback) -> List[Document]:
+            try:
+                return pipeline.run(sources, on_result)
+            finally:
+                # One ANN checkpoint per ingest rather than per written batch
+                self.search_engine.vector_store.flush()
+        
+        console = _console()
+        if not show_progress:
+            def log_result(source, doc, error):
+                if error is not None:
+                    console.print(f"❌ Failed: {source} - {error}", style="red")
+                report(source, doc, error)
+            
+            return run(log_result)
+        
+        from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TextColumn
+        
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            MofNCompleteColumn(),
+            console=console,
+        ) as progress:
+            task = progress.add_task("[cyan]Ingesting documents...", total=total)
+            
+            def show_result(source, doc, error):
+                if doc is not None:
+                    console.print(f"✅ Ingested: {doc.title}", style="green")
+                elif error is None:
+                    console.print(f"⏭️  Unchanged: {source}", style="dim")
+                else:
+                    console.print(f"❌ Failed: {source} - {error}", style="red")
+                progress.update(task, description=f"[cyan]Ingested: {source}")
+                progress.advance(task)
+                report(source, doc, error)
+            
+            return run(show_result)
+    
+    def _fetch_source(self, source: str) -> Tuple[str, Dict[str, List[str]], str]:
+        """
+        Fetch stage of the pipeline (runs on worker threads)
+        
+        Returns:
+            (content, known keywords by section hash, path of the database
+            holding the corpus statistics) for _parse_fetched
+        """
+        doc_id = self.ingester._generate_id(source)
+        conn = self.db.reader()
+        # A 304 may only skip the source if its document is actually indexed
+        indexed = conn.execute(
+            "SELECT 1 FROM documents WHERE id = ?", (doc_id,)
+        ).fetchone() is not None
+        rows = conn.execute(
+            "SELECT content_hash, keywords FROM sections WHERE document_id = ?", (doc_id,)
+        ).fetchall()
+        
+        content = self.ingester.fetch(source, skip_unchanged=indexed)
+        known_keywords = {
+            content_hash: json.loads(keywords)
+            for content_hash, keywords in rows
+            if content_hash and keywords
+        }
+        return content, known_keywords, str(self.db_path)
     
     def _save_document(self, doc: Document):
         """Save document to database and filesystem"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._save_documents([doc])
+    
+    def _save_documents(self, docs: List[Document]):
+        """Save a batch of documents in one transaction, then index them"""
+        # Blobs go first so a committed row never points at a missing one;
+        # unchanged bodies are already stored and cost one hash
+        raw_shas = {
+            doc.id: self.blob_store.put(doc.raw_content)
+            for doc in docs if doc.raw_content is not None
+        }
+        
+        stale_rowids = []
+        new_rowids = []
+        with self.metrics.timer("docs_ingest_stage_seconds", stage="store"):
+            with self.db.transaction() as cursor:
+                for doc in docs:
+                    removed, added = self._write_document(cursor, doc, raw_shas.get(doc.id))
+                    stale_rowids.extend(removed)
+                    new_rowids.extend(added)
+                bump_generation(cursor)
+        
+        with self.metrics.timer("docs_ingest_stage_seconds", stage="embed"):
+            try:
+                # Vectors of removed or rewritten sections are keyed by their old rowids
+                self.search_engine.remove_sections(stale_rowids)
+                
+                # Only new or changed sections need embedding
+                self.search_engine.index_sections(new_rowids)
+            finally:
+                # Semantic and hybrid searches run between the commit and
+                # here were cached under the new generation without the
+                # new vectors; bump again so they aren't served
+                if stale_rowids or new_rowids:
+                    with self.db.transaction() as cursor:
+                        bump_generation(cursor)
+    
+    def _write_document(
+        self, cursor: sqlite3.Cursor, doc: Document, raw_sha: Optional[str] = None
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Write one document's rows inside the caller's transaction
+        
+        Sections are diffed against the stored ones by content hash:
+        unchanged sections keep their row (and postings, FTS entry and
+        vector), at most getting a new position; changed and new sections
+        are inserted; sections no longer present are deleted everywhere.
+        
+        Chunks are rows of their own. A section that has chunks is stored
+        but not indexed, its chunks stand in for it in every search index;
+        document and stats counts only include top-level sections.
+        
+        Returns:
+            (removed rowids, inserted searchable rowids)
+        """
+        cursor.execute("SELECT doc_type FROM documents WHERE id = ?", (doc.id,))
+        previous = cursor.fetchone()
+        
+        num_chunks = Counter(
+            section.parent_section_id for section in doc.sections if section.parent_section_id
+        )
+        top_level = [section for section in doc.sections if not section.parent_section_id]
         
         # Save document metadata
         cursor.execute("""
             INSERT OR REPLACE INTO documents 
-            (id, source_url, title, doc_type, date_fetched, num_sections, keywords, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            (id, source_url, title, doc_type, date_fetched, num_sections, keywords, metadata, raw_sha)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             doc.id,
             doc.source_url,
             doc.title,
             doc.doc_type.value,
             doc.date_fetched.isoformat(),
-            len(doc.sections),
+            len(top_level),
             json.dumps(doc.keywords),
             json.dumps(doc.metadata),
+            raw_sha,
         ))
         
-        # Save sections
+        cursor.execute("""
+            SELECT rowid, id, content_hash, heading_level, order_num, token_count,
+                   parent_section_id, num_chunks
+            FROM sections WHERE document_id = ?
+            ORDER BY order_num
+        """, (doc.id,))
+        stored = cursor.fetchall()
+        stored_by_hash = defaultdict(list)
+        for row in stored:
+            stored_by_hash[row[2], row[7]].append(row)
+        
+        # Match each new section to a stored row with the same content that
+        # is indexed the same way (chunked or not)
+        kept = []
+        fresh = []
         for section in doc.sections:
+            if section.content_hash is None:
+                section.content_hash = section_hash(section.title, section.content)
+            matches = stored_by_hash.get((section.content_hash, num_chunks[section.id]))
+            if matches:
+                kept.append((matches.pop(0), section))
+            else:
+                fresh.append(section)
+        removed = [row[0] for rows in stored_by_hash.values() for row in rows]
+        
+        inverted_index = self.search_engine.inverted_index
+        fts_index = self.search_engine.fts_index
+        
+        # Removed sections leave every index (FTS first, it reads the rows)
+        if removed:
+            fts_index.remove_sections(cursor, removed)
+            inverted_index.remove_sections(cursor, doc.id, removed)
+            for chunk in batched(removed):
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"DELETE FROM sections WHERE rowid IN ({placeholders})", chunk)
+        
+        # Unchanged sections that moved: park their ids first so that
+        # renumbering can't collide with another row's current id
+        moved = [
+            (row[0], section) for row, section in kept
+            if (row[1], row[3], row[4], row[6])
+            != (section.id, section.heading_level, section.order, section.parent_section_id)
+        ]
+        cursor.executemany(
+            "UPDATE sections SET id = id || '#' || rowid WHERE rowid = ?",
+            [(rowid,) for rowid, _ in moved],
+        )
+        cursor.executemany(
+            "UPDATE sections SET id = ?, heading_level = ?, order_num = ?, parent_section_id = ? WHERE rowid = ?",
+            [
+                (section.id, section.heading_level, section.order, section.parent_section_id, rowid)
+                for rowid, section in moved
+            ],
+        )
+        
+        # New and changed sections
+        inserted = []
+        tokens = sum(row[5] for row, section in kept if not section.parent_section_id)
+        for section in fresh:
+            token_count = count_tokens(section.title) + count_tokens(section.content)
+            if not section.parent_section_id:
+                tokens += token_count
+            chunks = num_chunks[section.id]
             cursor.execute("""
-                INSERT OR REPLACE INTO sections
-                (id, document_id, title, content, heading_level, keywords, order_num)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO sections
+                (id, document_id, title, content, heading_level, keywords, order_num,
+                 content_hash, token_count, metadata, parent_section_id, num_chunks)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 section.id,
                 doc.id,
@@ -168,42 +554,154 @@ class DocsAgent:
                 section.heading_level,
                 json.dumps(section.keywords),
                 section.order,
+                section.content_hash,
+                token_count,
+                json.dumps(section.metadata) if section.metadata else None,
+                section.parent_section_id,
+                chunks,
             ))
+            if chunks:
+                continue
+            rowid = cursor.lastrowid
+            inverted_index.add_section(cursor, rowid, section)
+            fts_index.add_section(cursor, rowid, section)
+            inserted.append(rowid)
         
-        conn.commit()
-        conn.close()
+        # Swap the document's old totals for its new ones
+        deltas: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        if previous:
+            old = deltas[previous[0]]
+            old[0] -= 1
+            old[1] -= sum(1 for row in stored if not row[6])
+            old[2] -= sum(row[5] for row in stored if not row[6])
+        new = deltas[doc.doc_type.value]
+        new[0] += 1
+        new[1] += len(top_level)
+        new[2] += tokens
+        self._update_counters(cursor, deltas)
         
-        # Save full document as JSON
-        doc_file = self.parsed_dir / f"{doc.id}.json"
-        with open(doc_file, 'w') as f:
-            json.dump(doc.to_dict(), f, indent=2)
+        return removed, inserted
     
-    def search(self, query: str, top_k: int = 5, method: str = "hybrid") -> List[SearchResult]:
+    @staticmethod
+    def _update_counters(cursor: sqlite3.Cursor, deltas: Dict[str, List[int]]):
+        """Apply (documents, sections, tokens) deltas per doc_type to stats_counters"""
+        cursor.executemany("""
+            INSERT INTO stats_counters (doc_type, documents, sections, tokens)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(doc_type) DO UPDATE SET
+                documents = documents + excluded.documents,
+                sections = sections + excluded.sections,
+                tokens = tokens + excluded.tokens
+        """, [(doc_type, *delta) for doc_type, delta in deltas.items() if any(delta)])
+    
+    def search(
+        self, query: str, top_k: int = 5, method: str = "hybrid", expand: bool = False
+    ) -> List[SearchResult]:
         """
         Search the document index
         
         Args:
             query: Search query
             top_k: Number of results to return
-            method: "semantic", "keyword", or "hybrid"
+            method: "semantic", "keyword", "fts", or "hybrid"
+            expand: Return the whole section for chunk hits (see
+                SemanticSearch.expand); may return fewer than top_k
             
         Returns:
             List of search results
         """
-        return self.search_engine.search(query, top_k, method)
+        with self.metrics.trace("search", query) as trace:
+            trace.plan.update(requested=method, top_k=top_k)
+            key = QueryCache.key(query, top_k, method)
+            with span("cache"):
+                # Read before searching: a write landing mid-search leaves
+                # this entry one generation behind, so it is never served
+                generation = read_generation(self.db.reader())
+                results = self.query_cache.get(key, generation)
+            if results is None:
+                results = self.search_engine.search(query, top_k, method)
+                self.query_cache.put(key, generation, results)
+            trace.plan["results"] = len(results)
+            if expand:
+                with span("expand_sections"):
+                    return self.search_engine.expand(results)
+            return results
+    
+    def search_many(
+        self, queries: List[str], top_k: int = 5, method: str = "hybrid", expand: bool = False
+    ) -> List[List[SearchResult]]:
+        """
+        Search several queries at once
+        
+        Cached queries are answered from the query cache; the rest are
+        evaluated together in one pass over the index (see
+        SemanticSearch.search_many).
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            method: "semantic", "keyword", "fts", or "hybrid"
+            expand: Return the whole section for chunk hits
+            
+        Returns:
+            One list of search results per query, in order
+        """
+        with self.metrics.trace("search_batch", queries) as trace:
+            trace.plan.update(requested=method, top_k=top_k)
+            with span("cache"):
+                generation = read_generation(self.db.reader())
+                keys = [QueryCache.key(query, top_k, method) for query in queries]
+                results: List[Optional[List[SearchResult]]] = [
+                    self.query_cache.get(key, generation) for key in keys
+                ]
+            
+            # Duplicates within the batch are evaluated once
+            pending: Dict[Tuple[str, int, str], str] = {}
+            for query, key, cached in zip(queries, keys, results):
+                if cached is None:
+                    pending.setdefault(key, query)
+            trace.plan["evaluated"] = len(pending)
+            
+            if pending:
+                computed = dict(zip(
+                    pending,
+                    self.search_engine.search_many(list(pending.values()), top_k, method),
+                ))
+                for key, hits in computed.items():
+                    self.query_cache.put(key, generation, hits)
+                results = [
+                    cached if cached is not None else list(computed[key])
+                    for key, cached in zip(keys, results)
+                ]
+            
+            if expand:
+                with span("expand_sections"):
+                    return [self.search_engine.expand(hits) for hits in results]
+            return results
     
-    def lookup(self, query: str) -> Dict[str, Any]:
+    def lookup(
+        self, query: str, fields: Optional[List[str]] = None, expand: bool = False
+    ) -> Dict[str, Any]:
         """
         Simplified lookup interface for AI integration
         
         Args:
             query: Search query
+            fields: Keep only these SearchResult fields, in the best match
+                and in all_results (default: everything)
+            expand: Report whole sections for chunk hits
             
         Returns:
             Dict with source, excerpt, score
         """
-        results = self.search(query, top_k=3, method="hybrid")
-        
+        with self.metrics.trace("lookup", query):
+            results = self.search(query, top_k=3, method="hybrid", expand=expand)
+            with span("serialize"):
+                return self._lookup_response(results, fields)
+    
+    @staticmethod
+    def _lookup_response(results: List[SearchResult], fields: Optional[List[str]]) -> Dict[str, Any]:
+        """The lookup() answer for its search results"""
         if not results:
             return {
                 "found": False,
@@ -212,40 +710,287 @@ class DocsAgent:
         
         best_result = results[0]
         
-        return {
-            "found": True,
+        best = {
             "source": best_result.document.source_url,
             "doc_title": best_result.document.title,
             "section_title": best_result.section.title,
             "excerpt": best_result.section.content[:500] + "..." if len(best_result.section.content) > 500 else best_result.section.content,
             "score": best_result.score,
             "keywords": best_result.section.keywords,
-            "all_results": [r.to_dict() for r in results]
+        }
+        if fields is not None:
+            best = {name: value for name, value in best.items() if name in fields}
+        
+        return {
+            "found": True,
+            **best,
+            "all_results": [r.to_dict(fields) for r in results]
         }
     
-    def get_stats(self) -> IndexStats:
-        """Get index statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def list_documents(
+        self,
+        limit: int = 100,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str]]]:
+        """
+        One page of indexed documents, newest first
         
-        cursor.execute("SELECT COUNT(*) FROM documents")
-        total_docs = cursor.fetchone()[0]
+        Pages are keyset-based: `after` is the (date_fetched, id) of the
+        last document of the previous page, so every page is an index range
+        scan no matter how deep, and documents ingested in between don't
+        shift the pages still to come.
         
-        cursor.execute("SELECT COUNT(*) FROM sections")
-        total_sections = cursor.fetchone()[0]
+        Args:
+            limit: Documents per page
+            after: Position returned by the previous call (None: first page)
+            
+        Returns:
+            (documents, position of the next page or None after the last)
+        """
+        if after is None:
+            rows = self.db.reader().execute("""
+                SELECT id, source_url, title, doc_type, date_fetched, num_sections
+                FROM documents
+                ORDER BY date_fetched DESC, id DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        else:
+            rows = self.db.reader().execute("""
+                SELECT id, source_url, title, doc_type, date_fetched, num_sections
+                FROM documents
+                WHERE (date_fetched, id) < (?, ?)
+                ORDER BY date_fetched DESC, id DESC
+                LIMIT ?
+            """, (*after, limit)).fetchall()
         
-        cursor.execute("SELECT doc_type, COUNT(*) FROM documents GROUP BY doc_type")
-        doc_types = dict(cursor.fetchall())
+        documents = [
+            {
+                "id": doc_id,
+                "source_url": source_url,
+                "title": title,
+                "doc_type": doc_type,
+                "date_fetched": date_fetched,
+                "num_sections": num_sections,
+            }
+            for doc_id, source_url, title, doc_type, date_fetched, num_sections in rows
+        ]
+        next_after = (rows[-1][4], rows[-1][0]) if len(rows) == limit else None
+        return documents, next_after
+    
+    def iter_documents(
+        self,
+        after: Optional[Tuple[str, str]] = None,
+        page_size: int = 500,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        All documents after `after`, newest first, a page at a time
         
-        conn.close()
+        Each page is read in full before it is yielded, so no read stays
+        open between pages and the consumer may resume on another thread.
+        """
+        while True:
+            documents, after = self.list_documents(page_size, after)
+            if documents:
+                yield documents
+            if after is None:
+                return
+    
+    def get_stats(self) -> IndexStats:
+        """Get index statistics"""
+        # Running totals kept by the writer, one row per doc_type
+        rows = self.db.reader().execute(
+            "SELECT doc_type, documents, sections, tokens FROM stats_counters"
+        ).fetchall()
+        doc_types = {doc_type: documents for doc_type, documents, _, _ in rows if documents}
+        
+        hits, misses = self.http_cache.stats()
+        query_hits, query_misses = self.query_cache.stats()
         
         return IndexStats(
-            total_documents=total_docs,
-            total_sections=total_sections,
-            total_tokens=0,  # TODO: Calculate
+            total_documents=sum(row[1] for row in rows),
+            total_sections=sum(row[2] for row in rows),
+            total_tokens=sum(row[3] for row in rows),
             document_types=doc_types,
             last_updated=datetime.now(),
             embedding_model=self.search_engine.embedding_provider,
             index_version="1.0.0",
+            http_cache_hits=hits,
+            http_cache_misses=misses,
+            query_cache_hits=query_hits,
+            query_cache_misses=query_misses,
         )
-
+    
+    def render_metrics(self) -> str:
+        """
+        Search and ingestion metrics in the Prometheus text format
+        
+        Besides what `metrics` recorded: query and HTTP cache counters and
+        the size of the index, read at call time.
+        """
+        rows = self.db.reader().execute(
+            "SELECT doc_type, documents, sections FROM stats_counters"
+        ).fetchall()
+        query_hits, query_misses = self.query_cache.stats()
+        
+        samples: List[Sample] = [
+            ("docs_query_cache_hits_total", "counter", "Searches answered from the query cache", {}, query_hits),
+            ("docs_query_cache_misses_total", "counter", "Searches the query cache could not answer", {}, query_misses),
+            ("docs_vectors", "gauge", "Section vectors in the vector store", {}, len(self.search_engine.vector_store)),
+        ]
+        for doc_type, documents, sections in rows:
+            samples.append(("docs_documents", "gauge", "Indexed documents", {"doc_type": doc_type}, documents))
+            samples.append(("docs_sections", "gauge", "Indexed sections", {"doc_type": doc_type}, sections))
+        hits, misses = self.http_cache.stats()
+        samples.append(("docs_http_cache_hits_total", "counter", "Fetches answered 304 Not Modified", {}, hits))
+        samples.append(("docs_http_cache_misses_total", "counter", "Fetches that downloaded the page", {}, misses))
+        return self.metrics.render(samples)
+    
+    def get_document(self, doc_id: str, include_raw: bool = False) -> Optional[Document]:
+        """
+        Load a document and its sections (not their chunks) from the index
+        
+        Args:
+            doc_id: Document id
+            include_raw: Also load the raw content from the blob store
+                (decompressed on demand, off by default)
+        """
+        conn = self.db.reader()
+        row = conn.execute("""
+            SELECT source_url, title, doc_type, date_fetched, keywords, metadata, raw_sha
+            FROM documents WHERE id = ?
+        """, (doc_id,)).fetchone()
+        if row is None:
+            return None
+        source_url, title, doc_type, date_fetched, keywords_json, metadata_json, raw_sha = row
+        
+        sections = [
+            DocumentSection(
+                id=section_id,
+                document_id=doc_id,
+                title=section_title,
+                content=content,
+                heading_level=heading_level,
+                keywords=json.loads(section_keywords) if section_keywords else [],
+                order=order_num,
+                metadata=json.loads(section_metadata) if section_metadata else {},
+                content_hash=content_hash,
+            )
+            for section_id, section_title, content, heading_level, section_keywords, order_num,
+                section_metadata, content_hash in conn.execute("""
+                SELECT id, title, content, heading_level, keywords, order_num, metadata, content_hash
+                FROM sections WHERE document_id = ? AND parent_section_id IS NULL
+                ORDER BY order_num
+            """, (doc_id,))
+        ]
+        
+        return Document(
+            id=doc_id,
+            source_url=source_url,
+            title=title,
+            doc_type=DocumentType(doc_type),
+            date_fetched=datetime.fromisoformat(date_fetched),
+            sections=sections,
+            keywords=json.loads(keywords_json) if keywords_json else [],
+            metadata=json.loads(metadata_json) if metadata_json else {},
+            raw_content=self.blob_store.get(raw_sha) if include_raw and raw_sha else None,
+        )
+    
+    def get_raw_content(self, doc_id: str) -> Optional[str]:
+        """Raw content of a document as fetched, or None if it wasn't kept"""
+        row = self.db.reader().execute(
+            "SELECT raw_sha FROM documents WHERE id = ?", (doc_id,)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return self.blob_store.get(row[0])
+    
+    def compact(self) -> Dict[str, int]:
+        """
+        Move an index to compact storage and reclaim space
+        
+        - Legacy `parsed/<id>.json` files are folded in: raw content goes to
+          the blob store (deduplicated), section metadata to the sections
+          table, and the files are deleted.
+        - Blobs no longer referenced by any document are deleted.
+        - metadata.db is vacuumed.
+        
+        Returns:
+            Byte counts before and after, per storage area
+        """
+        def blob_bytes() -> int:
+            return sum(path.stat().st_size for _, path in self.blob_store.blobs())
+        
+        def db_bytes() -> int:
+            return sum(
+                path.stat().st_size
+                for path in (self.db_path, Path(f"{self.db_path}-wal"))
+                if path.exists()
+            )
+        
+        legacy_files = sorted(self.parsed_dir.glob("*.json")) if self.parsed_dir.exists() else []
+        report = {
+            "documents_migrated": 0,
+            "parsed_bytes_before": sum(path.stat().st_size for path in legacy_files),
+            "blob_bytes_before": blob_bytes(),
+            "db_bytes_before": db_bytes(),
+        }
+        
+        for doc_file in legacy_files:
+            with open(doc_file) as f:
+                data = json.load(f)
+            raw_content = data.get("raw_content")
+            raw_sha = self.blob_store.put(raw_content) if raw_content is not None else None
+            with self.db.transaction() as cursor:
+                cursor.execute(
+                    "UPDATE documents SET raw_sha = COALESCE(raw_sha, ?) WHERE id = ?",
+                    (raw_sha, data["id"]),
+                )
+                cursor.executemany(
+                    "UPDATE sections SET metadata = ? WHERE id = ? AND metadata IS NULL",
+                    [
+                        (json.dumps(section["metadata"]), section["id"])
+                        for section in data.get("sections", []) if section.get("metadata")
+                    ],
+                )
+            doc_file.unlink()
+            report["documents_migrated"] += 1
+        if self.parsed_dir.exists() and not any(self.parsed_dir.iterdir()):
+            self.parsed_dir.rmdir()
+        
+        referenced = [
+            raw_sha for (raw_sha,) in self.db.reader().execute(
+                "SELECT DISTINCT raw_sha FROM documents WHERE raw_sha IS NOT NULL"
+            )
+        ]
+        report["blobs_pruned"], _ = self.blob_store.prune(referenced)
+        
+        # VACUUM can't run inside a transaction
+        with self.db.autocommit() as cursor:
+            cursor.execute("VACUUM")
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        
+        report["parsed_bytes_after"] = 0
+        report["blob_bytes_after"] = blob_bytes()
+        report["db_bytes_after"] = db_bytes()
+        report["bytes_saved"] = sum(
+            report[f"{area}_bytes_before"] - report[f"{area}_bytes_after"]
+            for area in ("parsed", "blob", "db")
+        )
+        return report
+    
+    def export_snapshot(self, destination: Path, include_caches: bool = True) -> Dict[str, Any]:
+        """
+        Write the whole index to one snapshot archive
+        
+        See snapshot.export_snapshot; database writes from this agent wait
+        until the export is done. Load the archive with
+        snapshot.import_snapshot before opening a DocsAgent on the target.
+        
+        Returns:
+            The snapshot's manifest
+        """
+        # The persisted query cache and ANN index travel too, make them current
+        self.query_cache.save()
+        self.search_engine.vector_store.flush()
+        with self.db.transaction():
+            return export_snapshot(self.index_dir, destination, include_caches)
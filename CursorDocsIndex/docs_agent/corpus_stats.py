@@ -0,0 +1,130 @@
+"""
+Corpus statistics for IDF weighting: document frequencies and section lengths
+"""
+
+import math
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .database import batched
+
+SECTIONS_KEY = "corpus_sections"
+LENGTH_KEY = "corpus_length"
+
+
+def idf(df, sections: int):
+    """
+    BM25 inverse document frequency (the always-positive Lucene variant)
+
+    Works on scalars and numpy arrays alike. With an empty corpus every term
+    gets the same weight, so TF-IDF ranking falls back to plain frequency.
+    """
+    if isinstance(df, np.ndarray):
+        sections = np.maximum(sections, df)
+        return np.log1p((sections - df + 0.5) / (df + 0.5))
+    sections = max(sections, df)
+    return math.log1p((sections - df + 0.5) / (df + 0.5))
+
+
+def read_totals(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """(sections with at least one term, total content terms over them)"""
+    values = dict(conn.execute(
+        "SELECT key, value FROM index_metadata WHERE key IN (?, ?)", (SECTIONS_KEY, LENGTH_KEY)
+    ).fetchall())
+    return int(values.get(SECTIONS_KEY, 0)), int(values.get(LENGTH_KEY, 0))
+
+
+def update_totals(cursor: sqlite3.Cursor, sections: int, length: int):
+    """Add to the running totals; call inside the writing transaction"""
+    cursor.executemany("""
+        INSERT INTO index_metadata (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value
+    """, [(SECTIONS_KEY, sections), (LENGTH_KEY, length)])
+
+
+def reset_totals(cursor: sqlite3.Cursor):
+    cursor.execute(
+        "DELETE FROM index_metadata WHERE key IN (?, ?)", (SECTIONS_KEY, LENGTH_KEY)
+    )
+
+
+def update_frequencies(cursor: sqlite3.Cursor, deltas: Counter) -> Tuple[List[str], List[str]]:
+    """
+    Apply per-term document frequency deltas to the vocabulary
+
+    Returns:
+        (terms that entered the vocabulary, terms that left it)
+    """
+    added = [term for term, delta in deltas.items() if delta > 0]
+    known = set(read_frequencies(cursor.connection, added))
+    cursor.executemany("""
+        INSERT INTO terms (term, df) VALUES (?, ?)
+        ON CONFLICT(term) DO UPDATE SET df = df + excluded.df
+    """, [(term, delta) for term, delta in deltas.items() if delta])
+    # Terms no section contains any more leave the vocabulary
+    gone = []
+    for chunk in batched([term for term, delta in deltas.items() if delta < 0]):
+        placeholders = ",".join("?" * len(chunk))
+        gone.extend(term for (term,) in cursor.execute(
+            f"SELECT term FROM terms WHERE df <= 0 AND term IN ({placeholders})", chunk
+        ).fetchall())
+        cursor.execute(f"DELETE FROM terms WHERE df <= 0 AND term IN ({placeholders})", chunk)
+    return [term for term in added if term not in known], gone
+
+
+def read_frequencies(conn: sqlite3.Connection, terms: List[str]) -> Dict[str, int]:
+    """Document frequency of each of `terms` that is indexed"""
+    frequencies: Dict[str, int] = {}
+    for chunk in batched(terms):
+        placeholders = ",".join("?" * len(chunk))
+        frequencies.update(conn.execute(
+            f"SELECT term, df FROM terms WHERE term IN ({placeholders})", chunk
+        ).fetchall())
+    return frequencies
+
+
+class CorpusStats:
+    """
+    Read-only view of an index's corpus statistics
+
+    Parser processes can't share the agent's connections, so each opens
+    its own on the database file. Weights reflect the last committed write:
+    documents of the batch still being ingested don't count yet.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def idf(self, terms: List[str]) -> Optional[np.ndarray]:
+        """
+        IDF per term, in order
+
+        Returns:
+            Array of weights, or None when the index can't be read (not
+            created yet), meaning all terms weigh the same
+        """
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = sqlite3.connect(
+                        f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+                    )
+                sections, _ = read_totals(self._conn)
+                frequencies = read_frequencies(self._conn, terms)
+            except sqlite3.Error:
+                return None
+        df = np.array([frequencies.get(term, 0) for term in terms], dtype=np.float64)
+        return idf(df, sections)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
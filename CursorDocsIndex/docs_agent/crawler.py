@@ -0,0 +1,395 @@
+"""
+Recursive same-origin site crawler feeding the ingestion pipeline
+"""
+
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+# Links to these are never documentation pages
+SKIPPED_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico', '.webp',
+    '.css', '.js', '.map', '.woff', '.woff2', '.ttf', '.eot',
+    '.zip', '.gz', '.tar', '.tgz', '.whl', '.exe', '.dmg',
+    '.mp4', '.mp3', '.webm', '.pdf',
+)
+
+# Nested sitemap indexes are followed at most this deep
+MAX_SITEMAP_DEPTH = 3
+
+
+def canonicalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Normalize a URL so that equivalent spellings dedupe to one frontier entry
+
+    Resolves it against `base`, lowercases scheme and host, drops default
+    ports and fragments, sorts query parameters and turns an empty path
+    into "/". Returns None for anything that isn't http(s).
+    """
+    if base is not None:
+        url = urljoin(base, url.strip())
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        return None
+
+    host = (parts.hostname or '').lower()
+    if not host:
+        return None
+    netloc = host
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        netloc = f"{host}:{parts.port}"
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+class _LinkParser(HTMLParser):
+    """Collects <a href>, <base href>, rel=canonical and meta robots nofollow"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links: List[str] = []
+        self.base: Optional[str] = None
+        self.canonical: Optional[str] = None
+        self.nofollow = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'a' and attrs.get('href'):
+            if 'nofollow' not in (attrs.get('rel') or '').lower():
+                self.links.append(attrs['href'])
+        elif tag == 'base' and attrs.get('href') and self.base is None:
+            self.base = attrs['href']
+        elif tag == 'link' and attrs.get('href') and 'canonical' in (attrs.get('rel') or '').lower():
+            self.canonical = attrs['href']
+        elif tag == 'meta' and (attrs.get('name') or '').lower() == 'robots':
+            self.nofollow = 'nofollow' in (attrs.get('content') or '').lower()
+
+
+def extract_links(url: str, content: str) -> Tuple[List[str], Optional[str]]:
+    """
+    Outgoing links of an HTML page, canonicalized
+
+    Returns:
+        (links, canonical URL declared by the page or None)
+    """
+    parser = _LinkParser()
+    try:
+        parser.feed(content)
+        parser.close()
+    except Exception:
+        pass  # Keep whatever was collected before the markup broke
+
+    base = urljoin(url, parser.base) if parser.base else url
+    canonical = canonicalize_url(parser.canonical, base) if parser.canonical else None
+    if parser.nofollow:
+        return [], canonical
+
+    links = []
+    for href in parser.links:
+        link = canonicalize_url(href, base)
+        if link:
+            links.append(link)
+    return links, canonical
+
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of one site, usable directly as a source iterable
+
+    Iterating yields page URLs as they are discovered. The fetch stage
+    reports each page back through `page_fetched`, whose links are then
+    queued; while pages are still in flight and nothing is queued the
+    iterator yields None, which IngestionPipeline treats as "nothing ready
+    yet". Only URLs on the seed's origin (and under `path_prefix`, if given)
+    that robots.txt allows are followed; `sitemap.xml` and sitemaps listed
+    in robots.txt seed the frontier as well.
+
+    The frontier lives in a small SQLite file, so an interrupted crawl picks
+    up where it stopped. A crawl that ran to completion starts over on the
+    next run, which is what periodic refreshes want.
+    """
+
+    def __init__(
+        self,
+        seed_url: str,
+        state_dir: Path,
+        session: Optional[requests.Session] = None,
+        max_depth: int = 3,
+        max_pages: int = 500,
+        path_prefix: Optional[str] = None,
+        use_sitemap: bool = True,
+        respect_robots: bool = True,
+    ):
+        """
+        Args:
+            seed_url: Page to start from
+            state_dir: Directory for the persistent frontier
+            session: HTTP session (shares headers and connection pool)
+            max_depth: Link hops from the seed to follow
+            max_pages: Pages to yield per run; the rest stays queued
+            path_prefix: Only follow URLs whose path starts with this
+            use_sitemap: Seed the frontier from the site's sitemaps
+            respect_robots: Skip URLs disallowed by robots.txt
+        """
+        seed = canonicalize_url(seed_url)
+        if seed is None:
+            raise ValueError(f"Not an http(s) URL: {seed_url}")
+
+        self.seed = seed
+        parts = urlsplit(seed)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.path_prefix = path_prefix or '/'
+        self.session = session or requests.Session()
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.use_sitemap = use_sitemap
+        self.respect_robots = respect_robots
+
+        self.robots: Optional[RobotFileParser] = None
+        self.crawl_delay = 0.0
+
+        state_dir = Path(state_dir)
+        state_dir.mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha256(seed.encode()).hexdigest()[:16]
+        self.db_path = state_dir / f"{key}.db"
+
+        # page_fetched runs on fetch threads, everything shares one connection
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._in_flight = 0
+        self._init_database()
+
+    def _init_database(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                state TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_frontier_state
+            ON frontier(state, depth)
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self._conn.commit()
+
+    def _get_state(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM crawl_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO crawl_state (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def reset(self):
+        """Forget all crawl progress"""
+        with self._lock:
+            self._conn.execute("DELETE FROM frontier")
+            self._conn.execute("DELETE FROM crawl_state")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Frontier size per state (queued, in_flight, done, failed, skipped)"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM frontier GROUP BY state"
+            ).fetchall())
+
+    def in_scope(self, url: str) -> bool:
+        """Same origin, under the path prefix, a page type, allowed by robots"""
+        if not url.startswith(self.origin + '/'):
+            return False
+        path = urlsplit(url).path
+        if not path.startswith(self.path_prefix):
+            return False
+        if path.lower().endswith(SKIPPED_EXTENSIONS):
+            return False
+        if self.robots is not None and not self.robots.can_fetch(self._user_agent, url):
+            return False
+        return True
+
+    @property
+    def _user_agent(self) -> str:
+        return self.session.headers.get('User-Agent', '*')
+
+    def _enqueue(self, urls: List[str], depth: int):
+        """Queue unseen in-scope URLs (caller holds the lock)"""
+        if depth > self.max_depth:
+            return
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO frontier (url, depth, state) VALUES (?, ?, 'queued')",
+            [(url, depth) for url in urls if self.in_scope(url)],
+        )
+
+    def _load_robots(self):
+        """Fetch robots.txt, returns the sitemap URLs it lists"""
+        self.robots = None
+        try:
+            response = self.session.get(f"{self.origin}/robots.txt", timeout=30)
+        except requests.RequestException:
+            return []
+
+        if response.status_code >= 400:
+            return []
+
+        robots = RobotFileParser()
+        robots.parse(response.text.splitlines())
+        if self.respect_robots:
+            self.robots = robots
+            self.crawl_delay = float(robots.crawl_delay(self._user_agent) or 0)
+        return list(robots.site_maps() or [])
+
+    def _sitemap_urls(self, sitemap_url: str, level: int = 0) -> List[str]:
+        """Page URLs listed in a sitemap (or sitemap index, followed recursively)"""
+        try:
+            response = self.session.get(sitemap_url, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException:
+            return []
+
+        data = response.content
+        if data[:2] == b'\x1f\x8b':
+            data = gzip.decompress(data)
+        try:
+            root = ET.fromstring(data)
+        except ET.ParseError:
+            return []
+
+        locs = [
+            el.text.strip() for el in root.iter()
+            if el.tag.rsplit('}', 1)[-1] == 'loc' and el.text
+        ]
+        if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+            if level >= MAX_SITEMAP_DEPTH:
+                return []
+            urls = []
+            for loc in locs:
+                urls.extend(self._sitemap_urls(loc, level + 1))
+            return urls
+
+        return [url for url in (canonicalize_url(loc) for loc in locs) if url]
+
+    def _start(self):
+        """Prepare the frontier: resume an interrupted crawl or begin a new one"""
+        sitemaps = self._load_robots()
+
+        with self._lock:
+            if self._get_state('complete') == '1':
+                self._conn.execute("DELETE FROM frontier")
+                self._set_state('complete', '0')
+            # Pages handed out by a run that was interrupted go back in line
+            self._conn.execute("UPDATE frontier SET state = 'queued' WHERE state = 'in_flight'")
+            resumed = self._conn.execute("SELECT 1 FROM frontier LIMIT 1").fetchone() is not None
+            self._conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, depth, state) VALUES (?, 0, 'queued')",
+                (self.seed,),
+            )
+            self._conn.commit()
+
+        if self.use_sitemap and not resumed:
+            sitemaps = sitemaps or [f"{self.origin}/sitemap.xml"]
+            urls = []
+            for sitemap in sitemaps:
+                urls.extend(self._sitemap_urls(sitemap))
+            with self._lock:
+                # Listed pages count as one hop from the seed
+                self._enqueue(urls, 1)
+                self._conn.commit()
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        self._start()
+        yielded = 0
+        last_yield = 0.0
+
+        while yielded < self.max_pages:
+            with self._lock:
+                row = self._conn.execute("""
+                    SELECT url FROM frontier WHERE state = 'queued'
+                    ORDER BY depth, rowid LIMIT 1
+                """).fetchone()
+
+                if row is None:
+                    if self._in_flight == 0:
+                        self._set_state('complete', '1')
+                        self._conn.commit()
+                        return
+                    # Links of in-flight pages aren't known yet
+                    url = None
+                else:
+                    url = row[0]
+
+            if url is None:
+                yield None
+                continue
+
+            wait = last_yield + self.crawl_delay - time.monotonic()
+            if wait > 0:
+                if self._in_flight:
+                    yield None
+                    continue
+                time.sleep(wait)
+
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE frontier SET state = 'in_flight' WHERE url = ?", (url,)
+                )
+                self._conn.commit()
+                self._in_flight += 1
+            yielded += 1
+            last_yield = time.monotonic()
+            yield url
+
+    def page_fetched(self, url: str, content: Optional[str]):
+        """
+        Record a fetched page and queue its links (thread-safe)
+
+        Args:
+            url: A URL this crawler yielded
+            content: Page body, or None if the fetch failed
+        """
+        links: List[str] = []
+        canonical = None
+        if content:
+            links, canonical = extract_links(url, content)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT depth FROM frontier WHERE url = ?", (url,)
+            ).fetchone()
+            depth = row[0] if row else 0
+            self._conn.execute(
+                "UPDATE frontier SET state = ? WHERE url = ?",
+                ('done' if content is not None else 'failed', url),
+            )
+            if canonical and canonical != url:
+                # Same page under its preferred URL, don't ingest it twice
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO frontier (url, depth, state) VALUES (?, ?, 'skipped')",
+                    (canonical, depth),
+                )
+            self._enqueue(links, depth + 1)
+            self._conn.commit()
+            self._in_flight -= 1
+
+    def close(self):
+        self._conn.close()
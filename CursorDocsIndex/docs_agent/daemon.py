@@ -0,0 +1,190 @@
+"""
+Resident daemon that keeps an index open for fast CLI lookups
+
+Editor integrations call `docs_cli.py lookup` very often; each run would
+otherwise re-import the engine and re-open the index. The daemon serves
+search and lookup over a Unix socket (mode 0600, `daemon.sock` in the index
+directory) and the CLI uses it whenever it answers. Protocol: one request
+per connection, a JSON line `{"op": ..., "args": {...}}`, answered with
+`{"ok": true, "result": ...}` or `{"ok": false, "error": "..."}`.
+
+This module only imports the standard library, so a client pays for
+nothing but the round trip.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SOCKET_NAME = "daemon.sock"
+# A lookup of a hot index answers in milliseconds; past this, the caller
+# is better off searching in-process
+CLIENT_TIMEOUT = 10.0
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class DaemonUnavailable(Exception):
+    """No daemon answered on the socket (callers fall back to in-process)"""
+
+
+class DaemonError(Exception):
+    """The daemon answered, but the request failed"""
+
+
+def socket_path(index_dir: Path) -> Path:
+    """Where the daemon for an index listens"""
+    return Path(index_dir) / SOCKET_NAME
+
+
+def call(path: Path, op: str, timeout: float = CLIENT_TIMEOUT, **args) -> Any:
+    """
+    Send one request to a running daemon
+
+    Args:
+        path: Socket path (see socket_path)
+        op: "search", "lookup", "ping" or "stop"
+        timeout: Seconds to wait for the answer
+        **args: Keyword arguments of the operation
+
+    Returns:
+        The operation's JSON result
+
+    Raises:
+        DaemonUnavailable: Nothing is listening (or it didn't answer)
+        DaemonError: The daemon reported an error
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailable("Unix sockets are not supported on this platform")
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps({"op": op, "args": args}).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except OSError as e:
+        # Missing or stale socket, refused connection, timeout
+        raise DaemonUnavailable(f"No daemon at {path}: {e}") from e
+
+    if not line:
+        raise DaemonUnavailable(f"Daemon at {path} closed the connection")
+    reply = json.loads(line)
+    if not reply["ok"]:
+        raise DaemonError(reply["error"])
+    return reply["result"]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            result = self.server.docs_daemon.dispatch(request["op"], request.get("args") or {})
+            reply = {"ok": True, "result": result}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class _Server(socketserver.UnixStreamServer):
+    # Requests are answered one at a time: a lookup takes milliseconds, and
+    # reopening the index (see DocsDaemon._agent) needs no coordination
+    docs_daemon: "DocsDaemon"
+
+
+class DocsDaemon:
+    """
+    Serve search and lookup for one index over a Unix socket
+
+    Other processes (e.g. `docs_cli.py ingest`) may write to the index while
+    the daemon runs. Searches read SQLite and see those writes, but the
+    vector matrix is loaded once; so whenever the index generation or the
+    vector store changed, the daemon reopens the index before answering.
+    """
+
+    def __init__(self, open_agent: Callable[[], Any], path: Path):
+        """
+        Args:
+            open_agent: Returns a new DocsAgent for the index
+            path: Socket to listen on
+        """
+        self.open_agent = open_agent
+        self.path = Path(path)
+        self.agent = open_agent()
+        self.state = self._index_state()
+        self.server: Optional[_Server] = None
+
+    def _index_state(self) -> Tuple[int, int]:
+        """(generation, vector metadata mtime): changes with every index write"""
+        from .query_cache import read_generation
+
+        generation = read_generation(self.agent.db.reader())
+        try:
+            vectors_mtime = self.agent.search_engine.vector_store.meta_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            vectors_mtime = 0
+        return generation, vectors_mtime
+
+    def _agent(self):
+        """The open index, reopened first if another process wrote to it"""
+        state = self._index_state()
+        if state != self.state:
+            self.agent.close()
+            self.agent = self.open_agent()
+            self.state = self._index_state()
+        return self.agent
+
+    def dispatch(self, op: str, args: Dict[str, Any]) -> Any:
+        """Run one request; the result must be JSON serializable"""
+        if op == "ping":
+            return {"pid": os.getpid(), "index_dir": str(self.agent.index_dir)}
+        if op == "stop":
+            # shutdown() waits for serve_forever, which waits for this request
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"pid": os.getpid()}
+        if op == "lookup":
+            return self._agent().lookup(
+                args["query"], fields=args.get("fields"), expand=args.get("expand", False)
+            )
+        if op == "search":
+            results = self._agent().search(
+                args["query"],
+                top_k=args.get("top_k", 5),
+                method=args.get("method", "hybrid"),
+                expand=args.get("expand", False),
+            )
+            return [result.to_dict(args.get("fields")) for result in results]
+        raise ValueError(f"Unknown operation: {op}")
+
+    def serve_forever(self):
+        """Listen until a "stop" request or KeyboardInterrupt, then clean up"""
+        if self.path.exists() or self.path.is_symlink():
+            try:
+                call(self.path, "ping", timeout=1.0)
+            except DaemonUnavailable:
+                # Left behind by a daemon that didn't shut down cleanly
+                self.path.unlink()
+            else:
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+
+        # bind() creates the socket 0600, so no other user can connect
+        # before its mode is set
+        umask = os.umask(0o177)
+        try:
+            self.server = _Server(str(self.path), _Handler)
+        finally:
+            os.umask(umask)
+        self.server.docs_daemon = self
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.path.unlink(missing_ok=True)
+            self.agent.close()
@@ -0,0 +1,156 @@
+"""
+Shared SQLite connections for the metadata database
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+# Applied to every connection. WAL lets readers proceed while the writer
+# commits; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only risks the last transactions on power loss.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+)
+
+# Page cache per connection (negative = KiB) and memory-mapped I/O window
+CACHE_SIZE_KIB = 32 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Per-connection cache of compiled statements; the hot queries are few
+# and fixed, so they are prepared once per connection and reused
+STATEMENT_CACHE_SIZE = 256
+
+# Bound parameters per statement: SQLite's default
+# SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds
+SQL_BATCH = 900
+
+
+def batched(items: List, size: int = SQL_BATCH) -> Iterable[List]:
+    """Yield successive slices of at most `size` items, e.g. for IN (...) lists"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Database:
+    """
+    Connection manager for one SQLite file
+
+    - `reader()` returns a long-lived connection owned by the calling thread,
+      in autocommit mode, so each query sees the latest committed data and
+      never blocks on the writer (WAL).
+    - `transaction()` hands out the single writer connection under a lock,
+      so writes from any thread are serialized without "database is locked"
+      retries, and commits or rolls back as a unit.
+    - `autocommit()` lends the writer outside a transaction, for the
+      statements SQLite refuses inside one (VACUUM).
+
+    Because connections persist, sqlite3's statement cache keeps the
+    repeated search and ingest queries prepared across calls.
+    """
+
+    def __init__(self, path: Path, cache_size_kib: int = CACHE_SIZE_KIB, mmap_size: int = MMAP_SIZE):
+        self.path = Path(path)
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+
+        self._local = threading.local()
+        self._lock = threading.Lock()          # guards _connections
+        self._write_lock = threading.RLock()   # one writer at a time
+        self._writer: Optional[sqlite3.Connection] = None
+        self._depth = 0
+        self._connections: List[sqlite3.Connection] = []
+
+        # journal_mode is persistent, set it once up front
+        with self.transaction() as cursor:
+            cursor.execute("PRAGMA journal_mode = WAL")
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        # Closing happens from whichever thread calls close()
+        conn = sqlite3.connect(
+            self.path,
+            timeout=30,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            **kwargs,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """This thread's read connection (do not close it)"""
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            conn = self._connect(isolation_level=None)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.reader = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Run writes in one transaction on the shared writer connection
+
+        Commits when the block exits normally, rolls back on an exception.
+        Nested use from the same thread joins the outer transaction.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            self._depth += 1
+            outer = self._depth == 1
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                if outer:
+                    conn.commit()
+            except BaseException:
+                if outer:
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+                self._depth -= 1
+
+    @contextmanager
+    def autocommit(self) -> Iterator[sqlite3.Cursor]:
+        """
+        A writer cursor outside any transaction, for VACUUM and checkpoints
+
+        Holds the writer lock, so no transaction runs meanwhile; each
+        statement commits on its own. Can't be used inside transaction().
+        """
+        with self._write_lock:
+            if self._depth:
+                raise RuntimeError("autocommit() can't run inside a transaction")
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            # The writer has nothing pending between transactions
+            isolation_level = conn.isolation_level
+            conn.isolation_level = None
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+                conn.isolation_level = isolation_level
+
+    def close(self):
+        """Close every connection handed out so far"""
+        with self._write_lock, self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._writer = None
+            self._local = threading.local()
@@ -0,0 +1,170 @@
+"""
+Pluggable embedding providers for semantic search
+"""
+
+import math
+import os
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+from .inverted_index import tokenize
+
+
+class EmbeddingProvider:
+    """
+    Base class for embedding providers
+
+    Subclasses turn a batch of texts into an (n, dim) float32 matrix of
+    L2-normalized rows, so that a dot product is the cosine similarity.
+    """
+
+    name = "base"
+    batch_size = 64
+    max_chars = 8000
+    # Cosine similarity below which a hit is unrelated to the query; every
+    # section has some similarity to any query, so without a floor a vector
+    # search always returns top_k hits
+    min_similarity = 0.2
+
+    @property
+    def identity(self) -> str:
+        """Provider + model, vectors from different identities aren't comparable"""
+        return self.name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts in batches of `batch_size`"""
+        batches = [
+            self._embed_batch([t[:self.max_chars] for t in texts[i:i + self.batch_size]])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return normalize(np.vstack(batches))
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Deterministic, offline stand-in: signed feature hashing of terms and
+    adjacent term pairs. Captures lexical overlap only, but needs no model
+    download or API key, which makes it suitable for tests and air-gapped use.
+    """
+
+    name = "hash"
+    batch_size = 1024
+    # Hash collisions alone give unrelated texts similarities up to ~0.1
+    min_similarity = 0.15
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    @property
+    def identity(self) -> str:
+        return f"{self.name}/{self.dim}"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            features = Counter(terms)
+            features.update(f"{a} {b}" for a, b in zip(terms, terms[1:]))
+            for feature, count in features.items():
+                # crc32 is stable across processes, unlike hash()
+                digest = zlib.crc32(feature.encode())
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                matrix[row, digest % self.dim] += sign * (1.0 + math.log(count))
+        return matrix
+
+
+class SentenceTransformerEmbedder(EmbeddingProvider):
+    """Local Sentence Transformers model (free, offline after first download)"""
+
+    name = "local"
+    min_similarity = 0.25
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    @property
+    def identity(self) -> str:
+        return f"{self.name}/{self.model_name}"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True).astype(np.float32)
+
+
+class OpenAIEmbedder(EmbeddingProvider):
+    """OpenAI-compatible embeddings API (OpenAI or OpenRouter)"""
+
+    batch_size = 96
+
+    def __init__(self, name: str, api_key: str, base_url: Optional[str] = None,
+                 model: str = "text-embedding-3-small"):
+        from openai import OpenAI
+
+        self.name = name
+        self.model = model
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+
+    @property
+    def identity(self) -> str:
+        return f"{self.name}/{self.model}"
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([item.embedding for item in response.data], dtype=np.float32)
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving all-zero rows untouched"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def get_embedding_provider(name: str) -> Optional[EmbeddingProvider]:
+    """
+    Create the embedding provider for a name
+
+    Args:
+        name: "openrouter", "openai", "local", or "hash"
+
+    Returns:
+        Provider instance, or None if it can't be used (e.g. no API key)
+    """
+    if name == "openrouter":
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if not api_key:
+            return None
+        return OpenAIEmbedder(
+            name, api_key,
+            base_url="https://openrouter.ai/api/v1",
+            model=os.getenv("DOCS_EMBEDDING_MODEL", "openai/text-embedding-3-small"),
+        )
+    elif name == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            return None
+        return OpenAIEmbedder(
+            name, api_key,
+            model=os.getenv("DOCS_EMBEDDING_MODEL", "text-embedding-3-small"),
+        )
+    elif name == "local":
+        try:
+            return SentenceTransformerEmbedder()
+        except ImportError:
+            print("⚠️  sentence-transformers not installed - using hashing embeddings")
+            return HashingEmbedder()
+    elif name == "hash":
+        return HashingEmbedder()
+    return None
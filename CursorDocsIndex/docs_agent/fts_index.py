@@ -0,0 +1,129 @@
+"""
+Optional SQLite FTS5 full-text index with BM25 ranking
+"""
+
+import json
+import sqlite3
+from typing import List, Tuple
+
+from .database import batched
+from .models import DocumentSection
+
+# bm25() column weights for (title, content, keywords), mirroring the
+# title > keyword > content ordering of the Python scorer
+BM25_WEIGHTS = (5.0, 1.0, 3.0)
+BM25_EXPR = f"bm25(sections_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})"
+
+# Approximate snippet length in tokens (~200 chars, like _create_excerpt)
+SNIPPET_TOKENS = 32
+
+
+class FTSIndex:
+    """
+    External-content FTS5 table mirroring sections(title, content, keywords).
+
+    The table stores no copy of the text; FTS5 reads it back from `sections`
+    by rowid for snippets. Because of that, rows must be removed from the
+    index *before* the section rows they point at are deleted.
+    """
+
+    VERSION = "1"
+
+    def __init__(self):
+        self.available = False
+
+    def create_schema(self, cursor: sqlite3.Cursor) -> bool:
+        """Create the FTS5 table, returns False if SQLite lacks FTS5"""
+        try:
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS sections_fts USING fts5(
+                    title, content, keywords,
+                    content='sections',
+                    content_rowid='rowid',
+                    tokenize='unicode61'
+                )
+            """)
+            self.available = True
+        except sqlite3.OperationalError:
+            self.available = False
+        return self.available
+
+    def ensure_built(self, cursor: sqlite3.Cursor):
+        """Populate the index from sections stored before it existed"""
+        if not self.available:
+            return
+
+        cursor.execute("SELECT value FROM index_metadata WHERE key = 'fts_index_version'")
+        row = cursor.fetchone()
+        if row and row[0] == self.VERSION:
+            return
+
+        # Not 'rebuild': sections split into chunks stay out of the index
+        cursor.execute("INSERT INTO sections_fts(sections_fts) VALUES ('delete-all')")
+        cursor.execute("""
+            INSERT INTO sections_fts (rowid, title, content, keywords)
+            SELECT rowid, title, content, keywords FROM sections WHERE num_chunks = 0
+        """)
+        cursor.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) VALUES (?, ?)",
+            ('fts_index_version', self.VERSION),
+        )
+
+    def add_section(self, cursor: sqlite3.Cursor, rowid: int, section: DocumentSection):
+        """Index a freshly inserted section row"""
+        if not self.available:
+            return
+
+        # Values must match the stored row exactly, keywords included
+        cursor.execute("""
+            INSERT INTO sections_fts (rowid, title, content, keywords)
+            VALUES (?, ?, ?, ?)
+        """, (rowid, section.title, section.content, json.dumps(section.keywords)))
+
+    def remove_sections(self, cursor: sqlite3.Cursor, rowids: List[int]):
+        """Remove individual sections (call before deleting the rows)"""
+        if not self.available:
+            return
+
+        for chunk in batched(rowids):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                INSERT INTO sections_fts (sections_fts, rowid, title, content, keywords)
+                SELECT 'delete', rowid, title, content, keywords
+                FROM sections WHERE rowid IN ({placeholders}) AND num_chunks = 0
+            """, chunk)
+
+    def search(
+        self, cursor: sqlite3.Cursor, query_terms: List[str], top_k: int
+    ) -> List[Tuple[int, float, str]]:
+        """
+        Match, rank and snippet inside SQLite
+
+        Args:
+            cursor: Open cursor on metadata.db
+            query_terms: Tokenized query terms
+            top_k: Number of results
+
+        Returns:
+            List of (section rowid, score, snippet), best first
+        """
+        if not self.available or not query_terms:
+            return []
+
+        cursor.execute(f"""
+            SELECT rowid,
+                   -{BM25_EXPR},
+                   snippet(sections_fts, 1, '', '', '...', {SNIPPET_TOKENS})
+            FROM sections_fts
+            WHERE sections_fts MATCH ?
+            ORDER BY {BM25_EXPR}
+            LIMIT ?
+        """, (self.build_match(query_terms), top_k))
+        return cursor.fetchall()
+
+    @staticmethod
+    def build_match(query_terms: List[str]) -> str:
+        """Build an FTS5 MATCH expression: any term, prefix-matched"""
+        # Quoting keeps user input from being parsed as FTS5 syntax
+        quoted = ['"' + term.replace('"', '""') + '"*' for term in sorted(set(query_terms))]
+        return " OR ".join(quoted)
@@ -0,0 +1,148 @@
+"""
+On-disk conditional HTTP cache for fetched documentation pages
+"""
+
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .database import Database
+
+
+class NotModified(Exception):
+    """The server answered 304 for a page that is already indexed"""
+
+    def __init__(self, url: str):
+        super().__init__(f"Not modified: {url}")
+        self.url = url
+
+
+class HttpCache:
+    """
+    URL-keyed cache of response bodies plus their ETag / Last-Modified
+
+    Bodies live in `<cache_dir>/http/<sha256(url)>.body`; validators, sizes
+    and access times live in `<cache_dir>/http/cache.db`. When the total
+    body size exceeds `max_bytes`, least recently used entries are evicted
+    down to 90% of the budget. Hit/miss counters are persisted so they show
+    up in index stats across processes.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        self.http_dir = Path(cache_dir) / "http"
+        self.http_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.http_dir / "cache.db"
+        self.max_bytes = max_bytes
+        # Used from concurrent fetch threads: per-thread readers, one writer
+        self.db = Database(self.db_path, cache_size_kib=2048, mmap_size=0)
+        self._init_database()
+
+    def _init_database(self):
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            cursor.executemany(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)",
+                [("hits",), ("misses",)],
+            )
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self.http_dir / f"{key}.body"
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for a cached URL (empty if not cached)"""
+        row = self.db.reader().execute(
+            "SELECT etag, last_modified FROM entries WHERE key = ?", (self._key(url),)
+        ).fetchone()
+
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def load(self, url: str) -> Optional[str]:
+        """Cached body for a URL, refreshing its access time"""
+        key = self._key(url)
+        try:
+            body = self._body_path(key).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return body
+
+    def store(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]):
+        """Save a fresh 200 response, then evict if over budget"""
+        if not etag and not last_modified:
+            # Nothing to revalidate with, caching the body wouldn't help
+            return
+
+        key = self._key(url)
+        data = body.encode('utf-8')
+        self._body_path(key).write_bytes(data)
+
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO entries (key, url, etag, last_modified, size, accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, url, etag, last_modified, len(data), time.time()))
+
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until under 90% of max_bytes"""
+        with self.db.transaction() as cursor:
+            total = cursor.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            target = int(self.max_bytes * 0.9)
+            evicted = []
+            for key, size in cursor.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+                if total <= target:
+                    break
+                evicted.append(key)
+                total -= size
+
+            cursor.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in evicted])
+
+        for key in evicted:
+            self._body_path(key).unlink(missing_ok=True)
+
+    def record(self, hit: bool):
+        """Count a cache hit (304) or miss (full download)"""
+        with self.db.transaction() as cursor:
+            cursor.execute(
+                "UPDATE counters SET value = value + 1 WHERE name = ?",
+                ("hits" if hit else "misses",),
+            )
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) since the cache was created"""
+        counters = dict(self.db.reader().execute("SELECT name, value FROM counters").fetchall())
+        return counters.get("hits", 0), counters.get("misses", 0)
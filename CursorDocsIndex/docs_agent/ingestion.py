@@ -3,29 +3,79 @@ Document ingestion and parsing module
 """
 
 import hashlib
+import io
+import os
 import re
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from urllib.parse import urlparse
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, Tag
 import markdown
-from collections import Counter
 
-from .models import Document, DocumentSection, DocumentType
+try:
+    from lxml import etree
+except ImportError:  # BeautifulSoup with html.parser still works
+    etree = None
+
+from .models import Document, DocumentSection, DocumentType, section_hash
+from .chunking import Chunker
+from .corpus_stats import CorpusStats
+from .http_cache import HttpCache, NotModified
+from .keywords import IdfLookup, WordCounts, extract_keywords
+from .pdf import split_pdf_sections
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+# Page chrome dropped before sectioning
+STRIPPED_TAGS = ('script', 'style', 'nav', 'footer', 'header')
+
+# (level, heading text, section content) per heading, in document order
+HtmlSections = List[Tuple[int, str, str]]
+
+# Downloaded PDFs are written to disk in pieces this size
+DOWNLOAD_CHUNK = 1 << 20
+
+
+def is_pdf_source(source: str) -> bool:
+    """Whether a URL or file path names a PDF"""
+    path = urlparse(source).path if source.startswith(('http://', 'https://')) else source
+    return path.lower().endswith('.pdf')
 
 
 class DocumentIngester:
     """Handles fetching and parsing documents from various sources"""
     
-    def __init__(self, cache_dir: Path):
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        http_cache: Optional[HttpCache] = None,
+        pdf_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            cache_dir: HTTP cache and downloaded PDFs (None: no HTTP cache,
+                PDFs are downloaded to the system temp directory)
+            http_cache: Use this cache instead of opening one in cache_dir
+            pdf_workers: Processes extracting the pages of a PDF (default:
+                one per CPU)
+        """
         self.cache_dir = cache_dir
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.http_cache = http_cache
+        self.pdf_workers = pdf_workers
+        if self.cache_dir is not None and self.http_cache is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.http_cache = HttpCache(self.cache_dir)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'DocsAgent/1.0 (Cursor AI Documentation Indexer)'
         })
+        # Shared by concurrent fetch threads, so keep enough pooled connections
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
     
     def ingest(self, source: str, doc_type: Optional[DocumentType] = None) -> Document:
         """
@@ -38,13 +88,60 @@ class DocumentIngester:
         Returns:
             Parsed Document object
         """
+        content = self.fetch(source)
+        return self.parse(source, content, doc_type)
+    
+    def fetch(self, source: str, skip_unchanged: bool = False) -> str:
+        """
+        Fetch raw content from URL or file path (I/O only, no parsing)
+        
+        PDFs are never loaded into memory: the content returned for them is
+        the path of the file on disk (for URLs, a downloaded copy that
+        `parse` deletes once read; pass content that won't be parsed to
+        `discard`), which `parse` reads page range by page range.
+        
+        Args:
+            source: URL or file path
+            skip_unchanged: Raise NotModified when the server answers 304,
+                instead of returning the cached body (for already-indexed pages)
+        """
         # Detect if source is URL or local path
         is_url = source.startswith(('http://', 'https://'))
         
+        if is_pdf_source(source):
+            return self._download(source) if is_url else os.path.abspath(source)
         if is_url:
-            content = self._fetch_url(source)
-        else:
-            content = self._read_file(source)
+            return self._fetch_url(source, skip_unchanged)
+        return self._read_file(source)
+    
+    def parse(
+        self,
+        source: str,
+        content: str,
+        doc_type: Optional[DocumentType] = None,
+        known_keywords: Optional[Dict[str, List[str]]] = None,
+        idf: Optional[IdfLookup] = None,
+        chunker: Optional[Chunker] = None,
+    ) -> Document:
+        """
+        Parse already-fetched content (CPU only, no I/O)
+        
+        Args:
+            source: URL or file path the content came from
+            content: Raw document content
+            doc_type: Optional explicit document type
+            known_keywords: Section content hash -> keywords from a previous
+                ingest; sections with a known hash reuse them instead of
+                running keyword extraction again
+            idf: Term weights for TF-IDF keywords (e.g. CorpusStats.idf);
+                without, keywords are the most frequent words
+            chunker: Split sections longer than its max_tokens into chunks,
+                appended to the sections with parent_section_id set
+            
+        Returns:
+            Parsed Document object
+        """
+        known = known_keywords or {}
         
         # Detect document type if not provided
         if doc_type is None:
@@ -52,22 +149,123 @@ class DocumentIngester:
         
         # Parse based on type
         if doc_type == DocumentType.HTML:
-            return self._parse_html(source, content)
+            doc = self._parse_html(source, content, known, idf)
         elif doc_type == DocumentType.MARKDOWN:
-            return self._parse_markdown(source, content)
+            doc = self._parse_markdown(source, content, known, idf)
         elif doc_type == DocumentType.OPENAPI:
-            return self._parse_openapi(source, content)
+            doc = self._parse_openapi(source, content, known, idf)
         elif doc_type == DocumentType.JSON:
-            return self._parse_json(source, content)
+            doc = self._parse_json(source, content, known, idf)
+        elif doc_type == DocumentType.PDF:
+            try:
+                doc = self._parse_pdf(source, content, known, idf)
+            finally:
+                self.discard(source, content)
         else:
-            return self._parse_plaintext(source, content)
+            doc = self._parse_plaintext(source, content, known, idf)
+        
+        if chunker is not None:
+            self._chunk_sections(doc, chunker, known, idf)
+        return doc
     
-    def _fetch_url(self, url: str) -> str:
-        """Fetch content from URL"""
-        response = self.session.get(url, timeout=30)
+    def _chunk_sections(
+        self, doc: Document, chunker: Chunker, known: Dict[str, List[str]], idf: Optional[IdfLookup]
+    ):
+        """
+        Add the chunks of every oversized section to doc.sections
+        
+        A chunk keeps its parent's title and heading level; `order` is its
+        position within the parent. Keywords of all new chunks come from one
+        extraction pass.
+        """
+        chunks = []
+        for section in doc.sections:
+            pieces = chunker.split(section.content)
+            if len(pieces) < 2:
+                continue
+            for i, piece in enumerate(pieces):
+                chunks.append(DocumentSection(
+                    id=f"{section.id}.{i}",
+                    document_id=doc.id,
+                    title=section.title,
+                    content=piece,
+                    heading_level=section.heading_level,
+                    keywords=known.get(section_hash(section.title, piece)),
+                    parent_section_id=section.id,
+                    order=i,
+                    metadata=dict(section.metadata),
+                    content_hash=section_hash(section.title, piece),
+                ))
+        
+        pending = [chunk for chunk in chunks if chunk.keywords is None]
+        extracted = extract_keywords([chunk.title + " " + chunk.content for chunk in pending], 10, idf)
+        for chunk, keywords in zip(pending, extracted):
+            chunk.keywords = keywords
+        doc.sections.extend(chunks)
+    
+    def _fetch_url(self, url: str, skip_unchanged: bool = False) -> str:
+        """Fetch content from URL, revalidating against the HTTP cache"""
+        if self.http_cache is None:
+            response = self.session.get(url, timeout=30)
+            response.raise_for_status()
+            return response.text
+        
+        response = self.session.get(url, timeout=30, headers=self.http_cache.validators(url))
+        
+        if response.status_code == 304:
+            self.http_cache.record(hit=True)
+            if skip_unchanged:
+                raise NotModified(url)
+            body = self.http_cache.load(url)
+            if body is not None:
+                return body
+            # Cached body was evicted, fetch it unconditionally
+            response = self.session.get(url, timeout=30)
+        
         response.raise_for_status()
+        self.http_cache.record(hit=False)
+        self.http_cache.store(
+            url,
+            response.text,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+        )
         return response.text
     
+    def discard(self, source: str, content: str):
+        """
+        Release what `fetch` returned once it is parsed or never will be
+        
+        For a PDF URL that is the copy `_download` wrote, which is deleted;
+        anything else needs no cleanup.
+        """
+        if is_pdf_source(source) and source.startswith(('http://', 'https://')):
+            Path(content).unlink(missing_ok=True)
+    
+    def _download(self, url: str) -> str:
+        """
+        Stream a URL to a file (PDFs), returning its path
+        
+        Each fetch gets a file of its own, deleted by `discard` (which
+        `parse` calls once it has read it), so concurrent ingests of one URL
+        don't share a file.
+        """
+        directory = (self.cache_dir or Path(tempfile.gettempdir()) / "docs-agent") / "pdf"
+        directory.mkdir(parents=True, exist_ok=True)
+        prefix = hashlib.sha256(url.encode()).hexdigest()[:16] + "-"
+        fd, path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=".pdf")
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with self.session.get(url, timeout=30, stream=True) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK):
+                        f.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path
+    
     def _read_file(self, path: str) -> str:
         """Read content from local file"""
         with open(path, 'r', encoding='utf-8') as f:
@@ -82,7 +280,7 @@ class DocumentIngester:
             return DocumentType.MARKDOWN
         elif lower_source.endswith('.html') or lower_source.endswith('.htm'):
             return DocumentType.HTML
-        elif lower_source.endswith('.pdf'):
+        elif is_pdf_source(source):
             return DocumentType.PDF
         elif lower_source.endswith(('.json', '.yaml', '.yml')):
             if 'openapi' in content.lower() or 'swagger' in content.lower():
@@ -103,89 +301,78 @@ class DocumentIngester:
         """Generate unique ID for document"""
         return hashlib.md5(source.encode()).hexdigest()
     
-    def _extract_keywords(self, text: str, top_n: int = 20) -> List[str]:
-        """Extract keywords using simple frequency analysis"""
-        # Remove common words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 
-                     'to', 'for', 'of', 'with', 'by', 'from', 'is', 'are', 'was',
-                     'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do',
-                     'does', 'did', 'will', 'would', 'could', 'should', 'may',
-                     'might', 'must', 'can', 'this', 'that', 'these', 'those'}
-        
-        # Extract words
-        words = re.findall(r'\b[a-z]{3,}\b', text.lower())
-        words = [w for w in words if w not in stop_words]
-        
-        # Count frequency
-        counter = Counter(words)
-        return [word for word, _ in counter.most_common(top_n)]
+    def _extract_keywords(self, text: str, top_n: int = 20, idf: Optional[IdfLookup] = None) -> List[str]:
+        """Extract keywords of one text (frequency, or TF-IDF with `idf`)"""
+        return extract_keywords([text], top_n, idf)[0]
     
-    def _parse_html(self, source: str, content: str) -> Document:
+    def _parse_html(
+        self, source: str, content: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
         """Parse HTML document"""
-        soup = BeautifulSoup(content, 'lxml')
-        
-        # Extract title
-        title_tag = soup.find('title')
-        title = title_tag.text if title_tag else urlparse(source).path.split('/')[-1]
+        if etree is not None:
+            title, headings, body_text = split_html_sections(content)
+        else:
+            title, headings, body_text = split_html_sections_soup(content)
         
-        # Remove script and style tags
-        for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
-            tag.decompose()
+        if title is None:
+            title = urlparse(source).path.split('/')[-1]
         
         doc_id = self._generate_id(source)
         sections = []
-        section_order = 0
+        headings = [(level, text, body) for level, text, body in headings if body or text]
         
-        # Find all headings and their content
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            level = int(heading.name[1])
-            heading_text = heading.get_text(strip=True)
-            
-            # Get content until next heading
-            content_parts = []
-            for sibling in heading.find_next_siblings():
-                if sibling.name and sibling.name.startswith('h'):
-                    break
-                text = sibling.get_text(strip=True)
-                if text:
-                    content_parts.append(text)
-            
-            section_content = '\n\n'.join(content_parts)
+        if headings:
+            # Headings and contents tokenized together: texts 2i and 2i+1
+            counts = WordCounts([text for _, heading_text, section_content in headings
+                                 for text in (heading_text, section_content)])
+            weights = counts.weights(idf)
+            hashes = [section_hash(heading_text, section_content) for _, heading_text, section_content in headings]
+            # Section keywords from heading + content, unless already known
+            groups = []
+            for i, content_hash in enumerate(hashes):
+                group = None if content_hash in known else i
+                groups.extend((group, group))
+            extracted = counts.top(groups, 10, weights)
+            # Document keywords from the contents alone
+            doc_keywords = counts.top([None, 0] * len(headings), 30, weights)[0]
             
-            if section_content or heading_text:
-                section_id = f"{doc_id}_{section_order}"
-                keywords = self._extract_keywords(heading_text + " " + section_content, 10)
-                
-                section = DocumentSection(
-                    id=section_id,
+            for i, (level, heading_text, section_content) in enumerate(headings):
+                keywords = known.get(hashes[i])
+                if keywords is None:
+                    keywords = extracted[i]
+                sections.append(DocumentSection(
+                    id=f"{doc_id}_{i}",
                     document_id=doc_id,
                     title=heading_text,
                     content=section_content,
                     heading_level=level,
                     keywords=keywords,
-                    order=section_order,
-                )
-                sections.append(section)
-                section_order += 1
+                    order=i,
+                    content_hash=hashes[i],
+                ))
         
         # If no sections found, use whole body
-        if not sections:
-            body = soup.find('body')
-            if body:
-                content_text = body.get_text(separator='\n\n', strip=True)
-                sections.append(DocumentSection(
-                    id=f"{doc_id}_0",
-                    document_id=doc_id,
-                    title=title,
-                    content=content_text,
-                    heading_level=1,
-                    keywords=self._extract_keywords(content_text, 20),
-                    order=0,
-                ))
+        elif body_text is not None:
+            counts = WordCounts([body_text])
+            weights = counts.weights(idf)
+            content_hash = section_hash(title, body_text)
+            keywords = known.get(content_hash)
+            if keywords is None:
+                keywords = counts.top([0], 20, weights)[0]
+            doc_keywords = counts.top([0], 30, weights)[0]
+            sections.append(DocumentSection(
+                id=f"{doc_id}_0",
+                document_id=doc_id,
+                title=title,
+                content=body_text,
+                heading_level=1,
+                keywords=keywords,
+                order=0,
+                content_hash=content_hash,
+            ))
         
-        # Extract overall keywords
-        all_text = ' '.join([s.content for s in sections])
-        doc_keywords = self._extract_keywords(all_text, 30)
+        else:
+            doc_keywords = []
         
         return Document(
             id=doc_id,
@@ -199,13 +386,15 @@ class DocumentIngester:
             metadata={'num_sections': len(sections)},
         )
     
-    def _parse_markdown(self, source: str, content: str) -> Document:
+    def _parse_markdown(
+        self, source: str, content: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
         """Parse Markdown document"""
         # Convert to HTML first for easier parsing
         html_content = markdown.markdown(content, extensions=['extra', 'toc'])
         
         # Use HTML parser
-        doc = self._parse_html(source, html_content)
+        doc = self._parse_html(source, html_content, known, idf)
         doc.doc_type = DocumentType.MARKDOWN
         
         # Extract title from first heading or filename
@@ -222,7 +411,9 @@ class DocumentIngester:
         doc.title = title
         return doc
     
-    def _parse_openapi(self, source: str, content: str) -> Document:
+    def _parse_openapi(
+        self, source: str, content: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
         """Parse OpenAPI/Swagger specification"""
         import json
         import yaml
@@ -264,8 +455,7 @@ class DocumentIngester:
                         section_content += f"- {code}: {desc}\n"
                 
                 section_id = f"{doc_id}_{section_order}"
-                keywords = self._extract_keywords(section_title + " " + section_content, 10)
-                keywords.extend([method.upper(), path.split('/')[1] if '/' in path else path])
+                content_hash = section_hash(section_title, section_content)
                 
                 sections.append(DocumentSection(
                     id=section_id,
@@ -273,12 +463,23 @@ class DocumentIngester:
                     title=section_title,
                     content=section_content,
                     heading_level=2,
-                    keywords=list(set(keywords)),
+                    keywords=known.get(content_hash),
                     order=section_order,
                     metadata={'method': method, 'path': path},
+                    content_hash=content_hash,
                 ))
                 section_order += 1
         
+        # Keywords of all new operations in one pass
+        pending = [section for section in sections if section.keywords is None]
+        extracted = extract_keywords(
+            [section.title + " " + section.content for section in pending], 10, idf
+        )
+        for section, keywords in zip(pending, extracted):
+            path = section.metadata['path']
+            keywords.extend([section.metadata['method'].upper(), path.split('/')[1] if '/' in path else path])
+            section.keywords = list(set(keywords))
+        
         return Document(
             id=doc_id,
             source_url=source,
@@ -291,7 +492,9 @@ class DocumentIngester:
             metadata={'version': spec.get('info', {}).get('version', 'unknown')},
         )
     
-    def _parse_json(self, source: str, content: str) -> Document:
+    def _parse_json(
+        self, source: str, content: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
         """Parse generic JSON document"""
         import json
         
@@ -301,6 +504,10 @@ class DocumentIngester:
         
         # Create a single section with formatted JSON
         formatted = json.dumps(data, indent=2)
+        content_hash = section_hash(title, formatted)
+        keywords = known.get(content_hash)
+        if keywords is None:
+            keywords = self._extract_keywords(formatted, 20, idf)
         
         section = DocumentSection(
             id=f"{doc_id}_0",
@@ -308,8 +515,9 @@ class DocumentIngester:
             title=title,
             content=formatted,
             heading_level=1,
-            keywords=self._extract_keywords(formatted, 20),
+            keywords=keywords,
             order=0,
+            content_hash=content_hash,
         )
         
         return Document(
@@ -323,7 +531,55 @@ class DocumentIngester:
             raw_content=content,
         )
     
-    def _parse_plaintext(self, source: str, content: str) -> Document:
+    def _parse_pdf(
+        self, source: str, path: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
+        """Parse a PDF file (`path`, as returned by fetch) into its outline's sections"""
+        doc_id = self._generate_id(source)
+        title, num_pages, parts = split_pdf_sections(path, self.pdf_workers)
+        if not title:
+            title = Path(urlparse(source).path).stem.replace('-', ' ').replace('_', ' ')
+        
+        # Section and document keywords from one pass, as for plain text
+        counts = WordCounts([heading + " " + content for _, heading, _, _, content in parts])
+        weights = counts.weights(idf)
+        hashes = [section_hash(heading, content) for _, heading, _, _, content in parts]
+        extracted = counts.top([None if h in known else i for i, h in enumerate(hashes)], 10, weights)
+        doc_keywords = counts.top([0] * len(parts), 30, weights)
+        
+        sections = []
+        for i, (level, heading, first_page, last_page, content) in enumerate(parts):
+            keywords = known.get(hashes[i])
+            if keywords is None:
+                keywords = extracted[i]
+            sections.append(DocumentSection(
+                id=f"{doc_id}_{i}",
+                document_id=doc_id,
+                # Text ahead of the first bookmark, in a PDF without a title
+                title=heading or title,
+                content=content,
+                heading_level=level,
+                keywords=keywords,
+                order=i,
+                metadata={'pages': [first_page + 1, last_page + 1]},
+                content_hash=hashes[i],
+            ))
+        
+        # The file itself is binary; its text lives in the sections
+        return Document(
+            id=doc_id,
+            source_url=source,
+            title=title,
+            doc_type=DocumentType.PDF,
+            date_fetched=datetime.now(),
+            sections=sections,
+            keywords=doc_keywords[0] if doc_keywords else [],
+            metadata={'num_sections': len(sections), 'num_pages': num_pages},
+        )
+    
+    def _parse_plaintext(
+        self, source: str, content: str, known: Dict[str, List[str]], idf: Optional[IdfLookup] = None
+    ) -> Document:
         """Parse plain text document"""
         doc_id = self._generate_id(source)
         title = Path(source).stem if not source.startswith('http') else urlparse(source).path.split('/')[-1]
@@ -332,15 +588,29 @@ class DocumentIngester:
         paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
         sections = []
         
+        # Paragraph and document keywords from one pass; the paragraphs
+        # hold every word of the content
+        counts = WordCounts(paragraphs)
+        weights = counts.weights(idf)
+        hashes = [section_hash(f"Section {i+1}", para) for i, para in enumerate(paragraphs)]
+        extracted = counts.top([None if h in known else i for i, h in enumerate(hashes)], 10, weights)
+        doc_keywords = counts.top([0] * len(paragraphs), 30, weights)
+        
         for i, para in enumerate(paragraphs):
+            section_title = f"Section {i+1}"
+            content_hash = hashes[i]
+            keywords = known.get(content_hash)
+            if keywords is None:
+                keywords = extracted[i]
             section = DocumentSection(
                 id=f"{doc_id}_{i}",
                 document_id=doc_id,
-                title=f"Section {i+1}",
+                title=section_title,
                 content=para,
                 heading_level=2,
-                keywords=self._extract_keywords(para, 10),
+                keywords=keywords,
                 order=i,
+                content_hash=content_hash,
             )
             sections.append(section)
         
@@ -351,7 +621,154 @@ class DocumentIngester:
             doc_type=DocumentType.PLAINTEXT,
             date_fetched=datetime.now(),
             sections=sections,
-            keywords=self._extract_keywords(content, 30),
+            keywords=doc_keywords[0] if doc_keywords else [],
             raw_content=content,
         )
 
+
+def split_html_sections(content: str) -> Tuple[Optional[str], HtmlSections, Optional[str]]:
+    """
+    Split an HTML page into heading sections in one streaming pass (lxml)
+    
+    A heading's section is the text of its following siblings up to the
+    next sibling whose tag starts with "h", with script/style/nav/footer/
+    header removed, exactly as `split_html_sections_soup` computes it.
+    Elements are reduced to their stripped text strings as soon as they
+    end and then cleared, so no full tree is ever held in memory and every
+    element is visited once.
+    
+    Returns:
+        (page <title> or None, sections, body text for pages without headings)
+    """
+    title = None
+    body_text = None
+    sections: List[list] = []           # [level, heading text, content parts]
+    
+    # One frame per open element: stripped strings of its ended children,
+    # the section its next siblings feed, and whether it is being dropped
+    stack: List[list] = []              # [child strings, open section, stripped]
+    
+    events = etree.iterparse(
+        io.BytesIO(content.encode('utf-8')),
+        events=('start', 'end'),
+        html=True,
+        encoding='utf-8',
+        no_network=True,
+    )
+    for event, el in events:
+        tag = el.tag
+        if event == 'start':
+            stripped = tag in STRIPPED_TAGS or bool(stack and stack[-1][2])
+            stack.append([[], None, stripped])
+            continue
+        
+        children, _, stripped = stack.pop()
+        
+        if tag == 'title' and title is None:
+            title = ''.join(el.itertext())
+        
+        # get_text(strip=True) of this element: its text, then each child's
+        # strings followed by that child's tail. Comments count only for
+        # their tail (they have no events, hence no entry in `children`)
+        strings = []
+        if not stripped:
+            text = (el.text or '').strip()
+            if text:
+                strings.append(text)
+            child_strings = iter(children)
+            for child in el:
+                if isinstance(child.tag, str):
+                    strings.extend(next(child_strings))
+                tail = (child.tail or '').strip()
+                if tail:
+                    strings.append(tail)
+        el.clear(keep_tail=True)
+        
+        if tag == 'body' and body_text is None:
+            body_text = '\n\n'.join(strings)
+        
+        if not stack:
+            continue
+        parent = stack[-1]
+        parent[0].append(strings)
+        
+        if stripped:
+            # Removed before sectioning, so it isn't anybody's sibling
+            continue
+        if tag in HEADING_TAGS:
+            section = [int(tag[1]), ''.join(strings), []]
+            sections.append(section)
+            parent[1] = section
+        elif tag.startswith('h'):
+            parent[1] = None
+        elif parent[1] is not None:
+            text = ''.join(strings)
+            if text:
+                parent[1][2].append(text)
+    
+    return title, [(level, heading, '\n\n'.join(parts)) for level, heading, parts in sections], body_text
+
+
+def split_html_sections_soup(content: str) -> Tuple[Optional[str], HtmlSections, Optional[str]]:
+    """
+    BeautifulSoup version of `split_html_sections`, used without lxml
+    
+    Walks each heading's siblings lazily and stops at the next heading, so
+    every sibling is visited once rather than once per preceding heading.
+    """
+    soup = BeautifulSoup(content, 'lxml' if etree is not None else 'html.parser')
+    
+    title_tag = soup.find('title')
+    title = title_tag.text if title_tag else None
+    
+    for tag in soup(list(STRIPPED_TAGS)):
+        tag.decompose()
+    
+    sections = []
+    for heading in soup.find_all(list(HEADING_TAGS)):
+        content_parts = []
+        for sibling in heading.next_siblings:
+            if not isinstance(sibling, Tag):
+                continue
+            if sibling.name.startswith('h'):
+                break
+            text = sibling.get_text(strip=True)
+            if text:
+                content_parts.append(text)
+        sections.append((int(heading.name[1]), heading.get_text(strip=True), '\n\n'.join(content_parts)))
+    
+    body = soup.find('body')
+    body_text = body.get_text(separator='\n\n', strip=True) if body else None
+    return title, sections, body_text
+
+
+# Per-process parser and corpus statistics used by parse_document in pool workers
+_worker_ingester: Optional[DocumentIngester] = None
+_worker_corpora: Dict[str, CorpusStats] = {}
+
+
+def parse_document(
+    source: str,
+    content: str,
+    doc_type: Optional[DocumentType] = None,
+    known_keywords: Optional[Dict[str, List[str]]] = None,
+    corpus_path: Optional[str] = None,
+    chunker: Optional[Chunker] = None,
+) -> Document:
+    """
+    Module-level parse entry point, picklable for process pools
+    
+    With `corpus_path` (an index's metadata.db), keywords are weighted by
+    that index's corpus statistics; with `chunker`, oversized sections are
+    split into chunks.
+    """
+    global _worker_ingester
+    if _worker_ingester is None:
+        _worker_ingester = DocumentIngester()
+    idf = None
+    if corpus_path is not None:
+        corpus = _worker_corpora.get(corpus_path)
+        if corpus is None:
+            corpus = _worker_corpora[corpus_path] = CorpusStats(Path(corpus_path))
+        idf = corpus.idf
+    return _worker_ingester.parse(source, content, doc_type, known_keywords, idf, chunker)
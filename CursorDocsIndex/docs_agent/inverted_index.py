@@ -0,0 +1,474 @@
+"""
+Persistent term -> postings inverted index stored in metadata.db
+"""
+
+import heapq
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .corpus_stats import idf, read_totals, reset_totals, update_frequencies, update_totals
+from .database import SQL_BATCH, batched
+from .metrics import annotate, span
+from .models import DocumentSection
+from .trigram_index import TrigramIndex, max_edits
+
+# Same term definition the query side has always used
+TERM_PATTERN = re.compile(r'\b\w{3,}\b')
+
+# Field weights, multiplied by the term's IDF: a title or keyword hit on top
+# of the BM25 content score (which saturates at BM25_K1 + 1)
+TITLE_WEIGHT = 5.0
+KEYWORD_WEIGHT = 3.0
+PHRASE_BONUS = 10.0
+
+# Share of its score a query term keeps when it only matched through typo
+# tolerance (terms a few edits away), and the time the whole expansion
+# stage of a query may spend looking for such terms
+FUZZY_WEIGHT = 0.5
+EXPANSION_BUDGET = 0.025
+
+# BM25 term frequency saturation and section length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase index terms"""
+    return TERM_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    Term -> section postings kept in the same database as the sections.
+
+    Each posting records whether the term occurs in the section title, in its
+    keyword list, how often it occurs in the content and how many terms the
+    content has, which is everything the keyword scorer needs. Query cost
+    therefore scales with the number of postings for the query terms rather
+    than with the size of the corpus.
+
+    The corpus statistics BM25 and TF-IDF keywords need are kept up to date
+    alongside the postings: each vocabulary term's document frequency (the
+    number of sections with a posting for it) and the number and total
+    content length of indexed sections (see corpus_stats.py).
+
+    The original scorer matched query terms as substrings. Since a query term
+    can never span a non-word character, every substring hit falls inside one
+    indexed term, so queries are expanded against the term vocabulary and the
+    postings of all containing terms are folded back into the query term.
+    A query term no indexed term contains (a typo, usually) is expanded to
+    the terms closest to it within a small edit distance instead, and scores
+    FUZZY_WEIGHT of a real match. Both expansions read the trigram index of
+    the vocabulary (see trigram_index.py); looking for similar terms stops
+    once the query's expansion budget is spent.
+    """
+
+    VERSION = "2"
+
+    def __init__(self, expansion_budget: float = EXPANSION_BUDGET):
+        """
+        Args:
+            expansion_budget: Seconds a query may spend expanding typos to
+                similar terms (0 disables typo tolerance)
+        """
+        self.expansion_budget = expansion_budget
+        self.trigrams = TrigramIndex()
+
+    def create_schema(self, cursor: sqlite3.Cursor):
+        """Create postings table if it doesn't exist"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                section_rowid INTEGER NOT NULL,
+                document_id TEXT NOT NULL,
+                in_title INTEGER NOT NULL,
+                in_keywords INTEGER NOT NULL,
+                content_count INTEGER NOT NULL,
+                section_length INTEGER NOT NULL,
+                PRIMARY KEY (term, section_rowid)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_postings_document
+            ON postings(document_id)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        self.trigrams.create_schema(cursor)
+
+    def ensure_built(self, cursor: sqlite3.Cursor):
+        """Build postings for sections stored before the index existed"""
+        cursor.execute(
+            "SELECT value FROM index_metadata WHERE key = 'inverted_index_version'"
+        )
+        row = cursor.fetchone()
+        if row and row[0] == self.VERSION:
+            self.trigrams.ensure_built(cursor)
+            return
+
+        # Older layouts lack columns: recreate the tables, then fill them
+        cursor.execute("DROP TABLE IF EXISTS postings")
+        cursor.execute("DROP TABLE IF EXISTS terms")
+        self.create_schema(cursor)
+        self.rebuild(cursor)
+        cursor.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) VALUES (?, ?)",
+            ('inverted_index_version', self.VERSION),
+        )
+
+    def rebuild(self, cursor: sqlite3.Cursor):
+        """Rebuild all postings from the sections table"""
+        cursor.execute("DELETE FROM postings")
+        cursor.execute("DELETE FROM terms")
+        self.trigrams.clear(cursor)
+        reset_totals(cursor)
+        rows = cursor.execute("""
+            SELECT rowid, document_id, title, content, keywords FROM sections
+            WHERE num_chunks = 0
+        """).fetchall()
+
+        for rowid, document_id, title, content, keywords_json in rows:
+            try:
+                keywords = json.loads(keywords_json)
+            except (TypeError, ValueError):
+                keywords = []
+            self._insert_postings(
+                cursor, rowid, document_id, title or "", content or "", keywords
+            )
+
+    def add_section(self, cursor: sqlite3.Cursor, rowid: int, section: DocumentSection):
+        """Add postings for a freshly inserted section row"""
+        self._insert_postings(
+            cursor, rowid, section.document_id,
+            section.title, section.content, section.keywords,
+        )
+
+    def remove_sections(self, cursor: sqlite3.Cursor, document_id: str, rowids: List[int]):
+        """Drop the postings of some of a document's sections"""
+        # Narrowed by document_id so the lookup uses idx_postings_document
+        for chunk in batched(rowids, SQL_BATCH - 1):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                SELECT term, section_rowid, section_length FROM postings
+                WHERE document_id = ? AND section_rowid IN ({placeholders})
+            """, [document_id, *chunk])
+            self._forget(cursor, cursor.fetchall())
+            cursor.execute(f"""
+                DELETE FROM postings
+                WHERE document_id = ? AND section_rowid IN ({placeholders})
+            """, [document_id, *chunk])
+
+    def _forget(self, cursor: sqlite3.Cursor, postings: List[Tuple[str, int, int]]):
+        """Take (term, section rowid, section length) postings out of the corpus statistics"""
+        if not postings:
+            return
+        deltas = Counter()
+        for term, _, _ in postings:
+            deltas[term] -= 1
+        _, gone = update_frequencies(cursor, deltas)
+        self.trigrams.remove_terms(cursor, gone)
+        lengths = {rowid: length for _, rowid, length in postings}
+        update_totals(cursor, -len(lengths), -sum(lengths.values()))
+
+    def _insert_postings(
+        self,
+        cursor: sqlite3.Cursor,
+        rowid: int,
+        document_id: str,
+        title: str,
+        content: str,
+        keywords: List[str],
+    ):
+        """Write one posting per distinct term of a section"""
+        title_terms = set(tokenize(title))
+        keyword_terms = {k.lower() for k in keywords}
+        content_counts = Counter(tokenize(content))
+
+        terms = title_terms | keyword_terms | set(content_counts)
+        if not terms:
+            return
+        length = sum(content_counts.values())
+        new_terms, _ = update_frequencies(cursor, Counter(dict.fromkeys(terms, 1)))
+        self.trigrams.add_terms(cursor, new_terms)
+        update_totals(cursor, 1, length)
+        cursor.executemany("""
+            INSERT OR REPLACE INTO postings
+            (term, section_rowid, document_id, in_title, in_keywords, content_count, section_length)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (
+                term,
+                rowid,
+                document_id,
+                int(term in title_terms),
+                int(term in keyword_terms),
+                content_counts.get(term, 0),
+                length,
+            )
+            for term in terms
+        ])
+
+    def score(
+        self,
+        cursor: sqlite3.Cursor,
+        query: str,
+        query_terms: Optional[Iterable[str]] = None,
+    ) -> Dict[int, float]:
+        """
+        Score every section that has a posting for at least one query term
+
+        Args:
+            cursor: Open cursor on metadata.db
+            query: Raw query string (used for the exact phrase bonus)
+            query_terms: Pre-tokenized query terms, defaults to tokenize(query)
+
+        Returns:
+            Mapping of section rowid -> score (only scores > 0)
+        """
+        terms = [query_terms] if query_terms is not None else None
+        return self.score_many(cursor, [query], terms)[0]
+
+    def score_many(
+        self,
+        cursor: sqlite3.Cursor,
+        queries: List[str],
+        query_terms: Optional[List[Iterable[str]]] = None,
+    ) -> List[Dict[int, float]]:
+        """
+        Score several queries in one pass over the postings
+
+        Term expansion and the postings read happen once for the union of
+        all query terms; each distinct query term is then scored with
+        vectorized group-bys and shared by every query that contains it.
+        Scores are identical to calling `score` per query.
+
+        Args:
+            cursor: Open cursor on metadata.db
+            queries: Raw query strings
+            query_terms: Pre-tokenized terms per query, defaults to tokenize()
+
+        Returns:
+            One rowid -> score mapping per query, in order
+        """
+        return [
+            dict(zip(rowids.tolist(), scores.tolist()))
+            for rowids, scores in self._score_arrays(cursor, queries, query_terms)
+        ]
+
+    def top_many(
+        self,
+        cursor: sqlite3.Cursor,
+        queries: List[str],
+        top_k: int,
+        query_terms: Optional[List[Iterable[str]]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Best `top_k` (rowid, score) pairs per query
+
+        Same ranking as `top_scored(score(...))`, without building a dict
+        of every matching section first.
+        """
+        return [
+            top_arrays(rowids, scores, top_k)
+            for rowids, scores in self._score_arrays(cursor, queries, query_terms)
+        ]
+
+    def _score_arrays(
+        self,
+        cursor: sqlite3.Cursor,
+        queries: List[str],
+        query_terms: Optional[List[Iterable[str]]] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(rowids, scores) arrays per query, scores > 0 only"""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        if query_terms is None:
+            query_terms = [tokenize(query) for query in queries]
+        term_lists = [sorted(set(terms)) for terms in query_terms]
+        all_terms = sorted(set().union(*term_lists))
+        if not all_terms:
+            return [empty for _ in queries]
+
+        with span("expand_terms"):
+            expansions, similar = self._expand(cursor, all_terms)
+        # Postings per indexed term as a (n, 5) array of [section_rowid,
+        # in_title, in_keywords, content_count, section_length]; a WITHOUT
+        # ROWID primary-key range read each, all numeric so conversion is cheap
+        postings: Dict[str, np.ndarray] = {}
+        with span("fetch_postings"):
+            for term in set(expansions).union(*similar.values()):
+                cursor.execute("""
+                    SELECT section_rowid, in_title, in_keywords, content_count, section_length
+                    FROM postings WHERE term = ?
+                """, (term,))
+                postings[term] = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 5)
+        annotate(
+            expanded_terms=len(expansions),
+            similar_terms=similar,
+            postings=sum(len(rows) for rows in postings.values()),
+        )
+
+        with span("score"):
+            num_sections, total_length = read_totals(cursor.connection)
+            average_length = total_length / num_sections if num_sections else 1.0
+
+            # Query term -> (rowids, score, has content) over all expanded terms
+            by_query_term: Dict[str, List[str]] = {}
+            for term, contained in expansions.items():
+                for query_term in contained:
+                    by_query_term.setdefault(query_term, []).append(term)
+
+            term_scores: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+            for query_term, terms in [*by_query_term.items(), *similar.items()]:
+                matched = np.concatenate([postings[t] for t in terms])
+                if not len(matched):
+                    continue
+                lengths = [len(postings[t]) for t in terms]
+                fuzzy = query_term in similar
+                # Substring matches count once per occurrence; keywords match
+                # exactly. A similar term stands in for the query term itself
+                occurrences = np.repeat([1 if fuzzy else t.count(query_term) for t in terms], lengths)
+                exact = np.repeat([fuzzy or t == query_term for t in terms], lengths)
+
+                rowids, groups = np.unique(matched[:, 0], return_inverse=True)
+                titled = np.bincount(groups, weights=matched[:, 1], minlength=len(rowids)) > 0
+                keyworded = np.bincount(groups, weights=matched[:, 2] * exact, minlength=len(rowids)) > 0
+                counts = np.bincount(groups, weights=matched[:, 3] * occurrences, minlength=len(rowids))
+                section_lengths = np.zeros(len(rowids))
+                section_lengths[groups] = matched[:, 4]
+
+                # The query term's document frequency: every section it matched
+                weight = idf(len(rowids), num_sections)
+                saturation = BM25_K1 * (1 - BM25_B + BM25_B * section_lengths / max(average_length, 1.0))
+                score = weight * (
+                    TITLE_WEIGHT * titled
+                    + KEYWORD_WEIGHT * keyworded
+                    + counts * (BM25_K1 + 1) / (counts + saturation)
+                )
+                if fuzzy:
+                    score *= FUZZY_WEIGHT
+                # Only the query term as typed can be part of the exact phrase
+                term_scores[query_term] = (rowids, score, (counts > 0) & (not fuzzy))
+
+            combined = []
+            for query, terms in zip(queries, term_lists):
+                parts = [term_scores[term] for term in terms if term in term_scores]
+                if not parts:
+                    combined.append((query, None, None, None, None))
+                    continue
+
+                rowids, groups = np.unique(np.concatenate([part[0] for part in parts]), return_inverse=True)
+                totals = np.bincount(groups, weights=np.concatenate([part[1] for part in parts]))
+                content_terms = np.bincount(groups, weights=np.concatenate([part[2] for part in parts]))
+
+                # A section can only contain the phrase if it contains every term
+                candidates = np.nonzero(content_terms == len(terms))[0]
+                combined.append((query, terms, rowids, totals, candidates))
+
+        results = []
+        with span("phrase_bonus"):
+            for query, terms, rowids, totals, candidates in combined:
+                if terms is None:
+                    results.append(empty)
+                    continue
+                self._apply_phrase_bonus(cursor, query.lower(), terms, rowids, totals, candidates)
+                positive = totals > 0
+                results.append((rowids[positive], totals[positive]))
+
+        return results
+
+    def _expand(
+        self, cursor: sqlite3.Cursor, terms: List[str]
+    ) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """
+        Expansion stage of a query
+
+        Returns:
+            (indexed term -> the query terms it contains, query term that no
+            indexed term contains -> similar indexed terms)
+        """
+        deadline = time.monotonic() + self.expansion_budget
+        expansions: Dict[str, List[str]] = {}
+        similar: Dict[str, List[str]] = {}
+        for query_term in terms:
+            contained = self.trigrams.containing(cursor, query_term)
+            for term in contained:
+                expansions.setdefault(term, []).append(query_term)
+            # Substring matching is the scorer's contract and always runs;
+            # typo tolerance gets whatever is left of the budget
+            if not contained and max_edits(query_term) and time.monotonic() < deadline:
+                matches = self.trigrams.similar(cursor, query_term, deadline)
+                if matches:
+                    similar[query_term] = [term for term, _ in matches]
+        return expansions, similar
+
+    def match_terms(self, cursor: sqlite3.Cursor, terms: Iterable[str]) -> List[str]:
+        """
+        Query terms plus the similar terms standing in for typos, for
+        retrievers that prefix-match terms themselves (FTS5)
+        """
+        deadline = time.monotonic() + self.expansion_budget
+        matched = sorted(set(terms))
+        for query_term in list(matched):
+            if not max_edits(query_term) or time.monotonic() >= deadline:
+                continue
+            # Prefix of an indexed term: FTS5 will find it as typed
+            if cursor.execute(
+                "SELECT 1 FROM terms WHERE term >= ? AND term < ? LIMIT 1",
+                (query_term, query_term + "\U0010ffff"),
+            ).fetchone():
+                continue
+            matched.extend(term for term, _ in self.trigrams.similar(cursor, query_term, deadline))
+        return matched
+
+    def _apply_phrase_bonus(
+        self,
+        cursor: sqlite3.Cursor,
+        phrase: str,
+        terms: List[str],
+        rowids: np.ndarray,
+        scores: np.ndarray,
+        candidates: np.ndarray,
+    ):
+        """Add the exact-phrase bonus to candidates (positions into rowids) whose content contains the query"""
+        if not len(candidates):
+            return
+
+        # Single-term query: containing the term already means containing the phrase
+        if len(terms) == 1 and phrase == terms[0]:
+            scores[candidates] += PHRASE_BONUS
+            return
+
+        position = {rowid: i for i, rowid in zip(candidates.tolist(), rowids[candidates].tolist())}
+        for chunk in batched(list(position)):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                SELECT rowid, content FROM sections WHERE rowid IN ({placeholders})
+            """, chunk)
+            for rowid, content in cursor.fetchall():
+                if phrase in (content or "").lower():
+                    scores[position[rowid]] += PHRASE_BONUS
+
+
+def top_scored(scores: Dict[int, float], top_k: int) -> List[Tuple[int, float]]:
+    """Return the top_k (rowid, score) pairs, ties broken by rowid"""
+    # A k-sized heap over the pairs instead of sorting all of them
+    return heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def top_arrays(rowids: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+    """`top_scored` over parallel arrays: partition to the k-th score, sort only the survivors"""
+    if len(scores) > top_k > 0:
+        keep = scores >= np.partition(scores, -top_k)[-top_k]
+        rowids, scores = rowids[keep], scores[keep]
+    order = np.lexsort((rowids, -scores))[:top_k]
+    return list(zip(rowids[order].tolist(), scores[order].tolist()))
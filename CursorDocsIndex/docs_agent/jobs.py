@@ -0,0 +1,157 @@
+"""
+Background ingestion jobs for the API server
+"""
+
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from .models import Document
+
+
+class JobStatus(Enum):
+    """Lifecycle of an ingestion job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestJob:
+    """One queued ingest request and its progress"""
+    id: str
+    sources: List[str]
+    show_progress: bool = False
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    ingested: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    errors: List[Dict[str, str]] = field(default_factory=list)
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary"""
+        processed = self.ingested + self.unchanged + self.failed
+        return {
+            "id": self.id,
+            "status": self.status.value,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": {
+                "total": len(self.sources),
+                "processed": processed,
+                "ingested": self.ingested,
+                "unchanged": self.unchanged,
+                "failed": self.failed,
+            },
+            "errors": self.errors,
+            "documents": self.documents,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    FIFO of ingest jobs run one at a time on a background thread
+
+    Ingestion has a single writer anyway, so jobs run back to back rather
+    than competing for it; searches keep being served meanwhile. Finished
+    jobs are remembered up to `max_jobs`, oldest dropped first.
+    """
+
+    def __init__(self, agent, max_jobs: int = 200):
+        """
+        Args:
+            agent: DocsAgent the jobs ingest into
+            max_jobs: Jobs kept for status lookups
+        """
+        self.agent = agent
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[IngestJob]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="ingest-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, sources: List[str], show_progress: bool = False) -> IngestJob:
+        """Queue an ingest of `sources`; returns immediately"""
+        job = IngestJob(id=uuid.uuid4().hex, sources=list(sources), show_progress=show_progress)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job, or None if unknown (or long forgotten)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def all_jobs(self) -> List[Dict[str, Any]]:
+        """Snapshots of all remembered jobs, newest first"""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop after the running job; jobs still queued are not run"""
+        self._queue.put(None)
+        self._worker.join(timeout)
+
+    def _trim(self):
+        finished = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in finished]:
+            if len(self._jobs) <= self.max_jobs:
+                break
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            with self._lock:
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now()
+
+            def on_result(source: str, doc: Optional[Document], error: Optional[Exception]):
+                with self._lock:
+                    if doc is not None:
+                        job.ingested += 1
+                        job.documents.append({
+                            "id": doc.id,
+                            "title": doc.title,
+                            "source": doc.source_url,
+                            "sections": len(doc.sections),
+                        })
+                    elif error is None:
+                        job.unchanged += 1
+                    else:
+                        job.failed += 1
+                        job.errors.append({"source": source, "error": str(error)})
+
+            try:
+                self.agent.ingest_sources(job.sources, show_progress=job.show_progress, on_result=on_result)
+            except Exception as e:
+                with self._lock:
+                    job.status = JobStatus.FAILED
+                    job.error = str(e)
+            else:
+                with self._lock:
+                    job.status = JobStatus.SUCCEEDED
+            finally:
+                with self._lock:
+                    job.finished_at = datetime.now()
+                    self._trim()
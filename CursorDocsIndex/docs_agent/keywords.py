@@ -0,0 +1,151 @@
+"""
+TF-IDF keyword extraction over all sections of a document at once
+"""
+
+import re
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at',
+    'to', 'for', 'of', 'with', 'by', 'from', 'is', 'are', 'was',
+    'were', 'be', 'been', 'being', 'have', 'has', 'had', 'do',
+    'does', 'did', 'will', 'would', 'could', 'should', 'may',
+    'might', 'must', 'can', 'this', 'that', 'these', 'those',
+})
+WORD_PATTERN = re.compile(r'\b[a-z]{3,}\b')
+
+# Entries ranked together by WordCounts.top (whole groups, so maybe more)
+RANK_BLOCK = 1 << 15
+
+# Term weights for a vocabulary, None for "all equal" (see CorpusStats.idf)
+IdfLookup = Callable[[List[str]], Optional[np.ndarray]]
+
+
+class WordCounts:
+    """
+    Non-stop word counts of many texts, from a single tokenization pass
+
+    Each text is tokenized once and its counts appended to flat arrays, one
+    entry per (text, word) pair with words interned to integer ids, so
+    ranking any grouping of the texts is a numpy group-by instead of a
+    Counter per group. Entries are in first-occurrence order, which breaks
+    ties the way Counter.most_common always did (first seen first).
+    """
+
+    def __init__(self, texts: Sequence[str]):
+        ids: Dict[str, int] = {}
+        words = array('i')
+        counts = array('i')
+        sizes = []
+        for text in texts:
+            text_counts = Counter(WORD_PATTERN.findall(text.lower()))
+            sizes.append(len(text_counts))
+            words.extend([ids.setdefault(word, len(ids)) for word in text_counts])
+            counts.extend(text_counts.values())
+
+        self.vocabulary: List[str] = list(ids)
+        stop = np.array([word in STOP_WORDS for word in self.vocabulary], dtype=bool)
+        word = np.frombuffer(words, dtype=np.int32)
+        keep = ~stop[word]
+        self.text = np.repeat(np.arange(len(texts), dtype=np.int32), sizes)[keep]
+        self.word = word[keep]
+        self.count = np.frombuffer(counts, dtype=np.int32)[keep]
+
+    def top(
+        self,
+        groups: Sequence[Optional[int]],
+        top_n: int,
+        weights: Optional[np.ndarray] = None,
+    ) -> List[List[str]]:
+        """
+        Highest-scoring words per group of texts
+
+        Args:
+            groups: Group of each text (None: the text is left out); a
+                group's counts are the sums over its texts
+            top_n: Words per group
+            weights: Per-vocabulary-word factor (IDF), default 1
+
+        Returns:
+            Words by descending count x weight, one list per group 0..max
+        """
+        num_groups = max((g for g in groups if g is not None), default=-1) + 1
+        result: List[List[str]] = [[] for _ in range(num_groups)]
+        if not num_groups or not len(self.count):
+            return result
+
+        # (group, word) pairs as one integer, 32 bits wide whenever they fit
+        vocabulary_size = max(len(self.vocabulary), 1)
+        dtype = np.int32 if num_groups * vocabulary_size < 2 ** 31 else np.int64
+        group_of_text = np.array([-1 if g is None else g for g in groups], dtype=dtype)
+
+        # Groups listed in text order (every caller's case) are ranked a
+        # block of texts at a time, which keeps the temporaries small
+        included = np.flatnonzero(group_of_text >= 0)
+        included_groups = group_of_text[included]
+        if np.all(included_groups[1:] >= included_groups[:-1]):
+            group_starts = included[np.concatenate(([True], included_groups[1:] != included_groups[:-1]))]
+        else:
+            group_starts = included[:1]
+        entry_offsets = np.searchsorted(self.text, np.arange(len(groups) + 1))
+        block_starts = [0]
+        for text in group_starts[1:].tolist():
+            if entry_offsets[text] - entry_offsets[block_starts[-1]] >= RANK_BLOCK:
+                block_starts.append(text)
+        block_starts.append(len(groups))
+
+        for first_text, end_text in zip(block_starts, block_starts[1:]):
+            entries = slice(entry_offsets[first_text], entry_offsets[end_text])
+            self._rank_block(
+                group_of_text[self.text[entries]] * dtype(vocabulary_size) + self.word[entries],
+                self.count[entries], vocabulary_size, top_n, weights, result,
+            )
+        return result
+
+    def _rank_block(
+        self,
+        key: np.ndarray,
+        count: np.ndarray,
+        vocabulary_size: int,
+        top_n: int,
+        weights: Optional[np.ndarray],
+        result: List[List[str]],
+    ):
+        """Append the top words of the groups in one block of entries to `result`"""
+        included = np.flatnonzero(key >= 0)
+        if not len(included):
+            return
+
+        # Merge the entries of texts in the same group: a stable sort keeps
+        # each (group, word) run in entry order, so its first entry is the
+        # earliest occurrence
+        order = included[np.argsort(key[included], kind="stable")]
+        key = key[order]
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        count = np.add.reduceat(count[order], starts)
+        earliest = order[starts]
+        group, word = key[starts] // vocabulary_size, key[starts] % vocabulary_size
+
+        score = count if weights is None else count * weights[word]
+        order = np.lexsort((earliest, -score, group))
+        group, word = group[order], word[order]
+        # Rank of each entry within its group
+        rank = np.arange(len(group)) - np.searchsorted(group, group, side="left")
+        for g, w in zip(group[rank < top_n].tolist(), word[rank < top_n].tolist()):
+            result[g].append(self.vocabulary[w])
+
+    def weights(self, idf: Optional[IdfLookup]) -> Optional[np.ndarray]:
+        """IDF of every vocabulary word, or None without corpus statistics"""
+        if idf is None or not self.vocabulary:
+            return None
+        return idf(self.vocabulary)
+
+
+def extract_keywords(texts: Sequence[str], top_n: int, idf: Optional[IdfLookup] = None) -> List[List[str]]:
+    """Top `top_n` TF-IDF keywords of each text"""
+    counts = WordCounts(texts)
+    return counts.top(range(len(texts)), top_n, counts.weights(idf))
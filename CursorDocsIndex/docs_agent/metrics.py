@@ -0,0 +1,331 @@
+"""
+Query-path timing spans, Prometheus metrics and the slow-query log
+"""
+
+import contextvars
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, from search stages of tens of
+# microseconds to big ingest batches; quantiles are interpolated within a bucket
+BUCKETS = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# The slow-query log is rotated past this size, keeping one previous file
+SLOW_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+# Metrics recorded by DocsAgent: name -> (type, help)
+METRICS = {
+    "docs_searches_total": (
+        "counter", "Searches by operation and method (\"cache\": answered from the query cache)"),
+    "docs_search_errors_total": ("counter", "Searches that raised"),
+    "docs_search_seconds": ("histogram", "Search latency by operation and method"),
+    "docs_search_stage_seconds": (
+        "histogram", "Time per search stage; retrievers of a hybrid search run concurrently"),
+    "docs_slow_queries_total": ("counter", "Searches written to the slow-query log"),
+    "docs_ingest_sources_total": ("counter", "Ingested sources by outcome"),
+    "docs_ingest_stage_seconds": (
+        "histogram", "Ingestion time per source (fetch, parse) or per batch (write, and its store and embed parts)"),
+}
+
+# (name, labels) identifying one series; labels sorted by name
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+# (name, type, help, labels, value) of a value read at render time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("docs_trace", default=None)
+
+
+class Trace:
+    """Stage timings and query plan of one search"""
+
+    def __init__(self, operation: str, query: Any):
+        self.operation = operation
+        self.query = query
+        self.plan: Dict[str, Any] = {}
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        # Retriever threads of a hybrid search report into the same trace
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "time": datetime.now().isoformat(timespec="milliseconds"),
+            "operation": self.operation,
+            "query": self.query,
+            "total_ms": round(self.elapsed * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+            "plan": self.plan,
+        }
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage of the current trace (free when there is none)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - start)
+
+
+def annotate(**plan: Any):
+    """Record how the current search is evaluated (its plan)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.plan.update(plan)
+
+
+def propagate(fn: Callable) -> Callable:
+    """`fn` running in the caller's trace, for submitting to another thread"""
+    # One copy per call: a context can't be entered by two threads at once
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        # One count per bucket and one past the last bound (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate, interpolated within a bucket as Prometheus' histogram_quantile does"""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    # Beyond the last bound: that bound is all that is known
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+def _series(name: str, labels: Dict[str, Any]) -> SeriesKey:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    escaped = [
+        f'{key}="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for key, value in labels
+    ]
+    return "{" + ",".join(escaped) + "}" if escaped else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class SlowQueryLog:
+    """
+    Searches slower than a threshold, one JSON object per line
+
+    Each line holds the query, its plan (method, retrievers, expanded
+    terms, candidate counts) and the time spent in every stage.
+    """
+
+    def __init__(self, path: Path, threshold: float, max_bytes: int = SLOW_LOG_MAX_BYTES):
+        """
+        Args:
+            path: Log file (created on the first slow query)
+            threshold: Seconds a search must take to be logged
+            max_bytes: Rotate to `<path>.1` past this size
+        """
+        self.path = Path(path)
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def record(self, trace: Trace) -> bool:
+        """Log the trace if it was slow; returns whether it was"""
+        if trace.elapsed < self.threshold:
+            return False
+        line = json.dumps(trace.to_dict(), default=str) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if self.path.stat().st_size > self.max_bytes:
+                    os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            except FileNotFoundError:
+                pass
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return True
+
+
+class Metrics:
+    """
+    Counters and latency histograms of one DocsAgent
+
+    Searches are traced: `trace()` opens one around a search, the engine
+    times its stages with `span()` and notes its plan with `annotate()`,
+    and the finished trace is added to the histograms (and the slow-query
+    log). `render()` exports everything in the Prometheus text format.
+    """
+
+    def __init__(self, slow_log: Optional[SlowQueryLog] = None):
+        self.slow_log = slow_log
+        self._counters: Dict[SeriesKey, float] = {}
+        self._histograms: Dict[SeriesKey, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any):
+        key = _series(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any):
+        key = _series(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def trace(self, operation: str, query: Any) -> Iterator[Trace]:
+        """
+        Trace a search; inside another trace (e.g. a lookup's search, or an
+        API request that also times serialization) it joins that one
+        """
+        current = _current_trace.get()
+        if current is not None:
+            yield current
+            return
+
+        trace = Trace(operation, query)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except Exception:
+            self.inc("docs_search_errors_total", operation=operation)
+            raise
+        else:
+            trace.elapsed = time.perf_counter() - trace.started
+            self.record(trace)
+        finally:
+            _current_trace.reset(token)
+
+    def record(self, trace: Trace):
+        """Add a finished trace to the counters, histograms and slow-query log"""
+        method = trace.plan.get("method", "cache")
+        self.inc("docs_searches_total", operation=trace.operation, method=method)
+        self.observe("docs_search_seconds", trace.elapsed, operation=trace.operation, method=method)
+        for stage, seconds in list(trace.stages.items()):
+            self.observe("docs_search_stage_seconds", seconds, operation=trace.operation, stage=stage)
+        if self.slow_log is not None and self.slow_log.record(trace):
+            self.inc("docs_slow_queries_total", operation=trace.operation)
+
+    def summary(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Histogram quantiles for people rather than Prometheus
+
+        Returns:
+            name -> series labels ("stage=score,...") -> count, mean and
+            p50/p95/p99 in seconds
+        """
+        with self._lock:
+            histograms = list(self._histograms.items())
+        summary: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (name, labels), histogram in histograms:
+            entry = {"count": histogram.count, "mean": histogram.sum / histogram.count}
+            for q in QUANTILES:
+                entry[f"p{round(q * 100)}"] = histogram.quantile(q)
+            summary.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = entry
+        return summary
+
+    def render(self, samples: Iterable[Sample] = ()) -> str:
+        """
+        Prometheus text exposition (format 0.0.4)
+
+        Args:
+            samples: Values read at scrape time (gauges, counters kept
+                elsewhere), rendered along with the recorded metrics
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(h.counts), h.sum, h.count, h.buckets) for key, h in self._histograms.items()
+            )
+
+        families: Dict[str, Tuple[str, str, List[str]]] = {}
+
+        def family(name: str, kind: str, help_text: str) -> List[str]:
+            return families.setdefault(name, (kind, help_text, []))[2]
+
+        for (name, labels), value in counters:
+            kind, help_text = METRICS.get(name, ("counter", name))
+            family(name, kind, help_text).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), counts, total, count, buckets in histograms:
+            kind, help_text = METRICS.get(name, ("histogram", name))
+            lines = family(name, kind, help_text)
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = _format_labels((*labels, ("le", _format_value(bound))))
+                lines.append(f"{name}_bucket{le} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, kind, help_text, labels, value in samples:
+            family(name, kind, help_text).append(
+                f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}"
+            )
+
+        out = []
+        for name, (kind, help_text, lines) in families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
@@ -0,0 +1,165 @@
+"""
+Versioned schema migrations for metadata.db
+"""
+
+import sqlite3
+from typing import Callable, List
+
+from .models import count_tokens, section_hash
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> set:
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+
+def _initial_schema(cursor: sqlite3.Cursor):
+    """Tables as they shipped in the first release"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            id TEXT PRIMARY KEY,
+            source_url TEXT NOT NULL,
+            title TEXT,
+            doc_type TEXT,
+            date_fetched TEXT,
+            num_sections INTEGER,
+            keywords TEXT,
+            metadata TEXT
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sections (
+            id TEXT PRIMARY KEY,
+            document_id TEXT,
+            title TEXT,
+            content TEXT,
+            heading_level INTEGER,
+            keywords TEXT,
+            order_num INTEGER,
+            FOREIGN KEY (document_id) REFERENCES documents(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _section_hashes(cursor: sqlite3.Cursor):
+    """Content hash per section, so re-ingests can diff documents"""
+    # Databases that predate versioning may already have the column
+    if "content_hash" not in _columns(cursor, "sections"):
+        cursor.execute("ALTER TABLE sections ADD COLUMN content_hash TEXT")
+        rows = cursor.execute("SELECT rowid, title, content FROM sections").fetchall()
+        cursor.executemany(
+            "UPDATE sections SET content_hash = ? WHERE rowid = ?",
+            [(section_hash(title or "", content or ""), rowid) for rowid, title, content in rows],
+        )
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sections_document
+        ON sections(document_id)
+    """)
+
+
+def _stats_counters(cursor: sqlite3.Cursor):
+    """Per-section token counts and running totals per document type"""
+    cursor.execute("ALTER TABLE sections ADD COLUMN token_count INTEGER NOT NULL DEFAULT 0")
+    rows = cursor.execute("SELECT rowid, title, content FROM sections").fetchall()
+    cursor.executemany(
+        "UPDATE sections SET token_count = ? WHERE rowid = ?",
+        [(count_tokens(title or "") + count_tokens(content or ""), rowid) for rowid, title, content in rows],
+    )
+
+    # Maintained by the writer on every ingest, read by get_stats()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            doc_type TEXT PRIMARY KEY,
+            documents INTEGER NOT NULL DEFAULT 0,
+            sections INTEGER NOT NULL DEFAULT 0,
+            tokens INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO stats_counters (doc_type, documents, sections, tokens)
+        SELECT d.doc_type, COUNT(*), COALESCE(SUM(s.num), 0), COALESCE(SUM(s.tokens), 0)
+        FROM documents d
+        LEFT JOIN (
+            SELECT document_id, COUNT(*) AS num, SUM(token_count) AS tokens
+            FROM sections GROUP BY document_id
+        ) s ON s.document_id = d.id
+        GROUP BY d.doc_type
+    """)
+
+    # /documents lists newest first
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_documents_date_fetched
+        ON documents(date_fetched)
+    """)
+
+
+def _compact_storage(cursor: sqlite3.Cursor):
+    """Everything parsed/<id>.json held that the tables didn't"""
+    # Digest of the raw content in the blob store (see blob_store.py)
+    cursor.execute("ALTER TABLE documents ADD COLUMN raw_sha TEXT")
+    cursor.execute("ALTER TABLE sections ADD COLUMN metadata TEXT")
+
+
+def _listing_index(cursor: sqlite3.Cursor):
+    """Keyset pages of /documents order by (date_fetched, id)"""
+    cursor.execute("DROP INDEX IF EXISTS idx_documents_date_fetched")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_documents_listing
+        ON documents(date_fetched, id)
+    """)
+
+
+def _section_chunks(cursor: sqlite3.Cursor):
+    """Chunks of oversized sections are rows pointing at their parent"""
+    cursor.execute("ALTER TABLE sections ADD COLUMN parent_section_id TEXT")
+    # Sections split into chunks are only searched through their chunks
+    cursor.execute("ALTER TABLE sections ADD COLUMN num_chunks INTEGER NOT NULL DEFAULT 0")
+
+
+# Applied in order; a database at user_version N has run the first N.
+# Append new steps, never edit or reorder shipped ones.
+MIGRATIONS: List[Callable[[sqlite3.Cursor], None]] = [
+    _initial_schema,
+    _section_hashes,
+    _stats_counters,
+    _compact_storage,
+    _listing_index,
+    _section_chunks,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(cursor: sqlite3.Cursor) -> int:
+    """
+    Bring the schema up to SCHEMA_VERSION
+
+    All pending steps run in the caller's transaction, so an interrupted
+    upgrade leaves the database at its previous version.
+
+    Returns:
+        Number of migrations applied
+    """
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"metadata.db schema version {version} is newer than this release supports ({SCHEMA_VERSION})"
+        )
+    if version == SCHEMA_VERSION:
+        return 0
+
+    # DDL doesn't open a transaction implicitly, make it explicit
+    if not cursor.connection.in_transaction:
+        cursor.execute("BEGIN")
+    for step in MIGRATIONS[version:]:
+        step(cursor)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return SCHEMA_VERSION - version
@@ -2,9 +2,12 @@
 Data models for Docs-Agent
 """
 
+import hashlib
+import json
+import re
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from enum import Enum
 
 
@@ -19,6 +22,20 @@ class DocumentType(Enum):
     UNKNOWN = "unknown"
 
 
+def section_hash(title: str, content: str) -> str:
+    """Content hash of a section, used to diff re-ingested documents"""
+    return hashlib.sha1(f"{title}\0{content}".encode('utf-8')).hexdigest()
+
+
+# Words and individual punctuation marks, a close stand-in for LLM tokens
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of a piece of text"""
+    return sum(1 for _ in TOKEN_PATTERN.finditer(text))
+
+
 @dataclass
 class DocumentSection:
     """A section or chunk of a document"""
@@ -32,6 +49,7 @@ class DocumentSection:
     parent_section_id: Optional[str] = None
     order: int = 0
     metadata: Dict[str, Any] = field(default_factory=dict)
+    content_hash: Optional[str] = None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -46,6 +64,7 @@ class DocumentSection:
             "parent_section_id": self.parent_section_id,
             "order": self.order,
             "metadata": self.metadata,
+            "content_hash": self.content_hash,
         }
 
 
@@ -95,28 +114,182 @@ class Document:
         )
 
 
-@dataclass
+class ResultRow:
+    """
+    Columns of one search hit, as read from sections joined to documents
+    
+    Holds the stored values only (keywords still JSON, dates ISO text);
+    `section()` and `document()` build full objects from them.
+    """
+    __slots__ = (
+        "section_id", "document_id", "title", "content", "heading_level",
+        "keywords_json", "order", "parent_section_id",
+        "source_url", "doc_title", "doc_type", "date_fetched",
+    )
+    
+    def __init__(
+        self, section_id: str, document_id: str, title: str, content: str,
+        heading_level: int, keywords_json: Optional[str], order: int,
+        parent_section_id: Optional[str], source_url: str, doc_title: str,
+        doc_type: str, date_fetched: Optional[str],
+    ):
+        self.section_id = section_id
+        self.document_id = document_id
+        self.title = title
+        self.content = content
+        self.heading_level = heading_level
+        self.keywords_json = keywords_json
+        self.order = order
+        self.parent_section_id = parent_section_id
+        self.source_url = source_url
+        self.doc_title = doc_title
+        self.doc_type = doc_type
+        self.date_fetched = date_fetched
+    
+    def values(self) -> Tuple[Any, ...]:
+        """Every column, in __slots__ order"""
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def keywords(self) -> List[str]:
+        try:
+            return json.loads(self.keywords_json)
+        except (TypeError, ValueError):
+            return []
+    
+    def section(self) -> DocumentSection:
+        return DocumentSection(
+            id=self.section_id,
+            document_id=self.document_id,
+            title=self.title,
+            content=self.content,
+            heading_level=self.heading_level,
+            keywords=self.keywords(),
+            parent_section_id=self.parent_section_id,
+            order=self.order,
+        )
+    
+    def document(self) -> Document:
+        """The hit's document, without its sections"""
+        return Document(
+            id=self.document_id,
+            source_url=self.source_url,
+            title=self.doc_title,
+            doc_type=DocumentType(self.doc_type) if self.doc_type else DocumentType.UNKNOWN,
+            date_fetched=datetime.fromisoformat(self.date_fetched) if self.date_fetched else None,
+        )
+
+
+# Where SearchResult.to_dict() finds each key: a ResultRow attribute, or an
+# attribute of the hydrated section or document
+ROW_FIELDS = {
+    "source": "source_url", "doc_title": "doc_title", "section_title": "title",
+    "content": "content", "heading_level": "heading_level",
+    "section_id": "section_id", "parent_section_id": "parent_section_id",
+}
+OBJECT_FIELDS = {
+    "source": ("document", "source_url"), "doc_title": ("document", "title"),
+    "section_title": ("section", "title"), "content": ("section", "content"),
+    "keywords": ("section", "keywords"), "heading_level": ("section", "heading_level"),
+    "section_id": ("section", "id"), "parent_section_id": ("section", "parent_section_id"),
+}
+
+
 class SearchResult:
-    """A search result with relevance score"""
-    section: DocumentSection
-    document: Document
-    score: float
-    match_type: str  # "semantic", "keyword", "hybrid"
-    excerpt: str = ""
+    """
+    A search result with relevance score
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return {
-            "source": self.document.source_url,
-            "doc_title": self.document.title,
-            "section_title": self.section.title,
-            "content": self.section.content,
-            "excerpt": self.excerpt,
-            "score": self.score,
-            "match_type": self.match_type,
-            "keywords": self.section.keywords,
-            "heading_level": self.section.heading_level,
-        }
+    Results built by the search engine carry a ResultRow and hydrate
+    `section` and `document` on first access; `to_dict` reads the row
+    directly, so serving a result never builds either object. Slots keep
+    the many results held by the query cache small.
+    """
+    __slots__ = ("score", "match_type", "excerpt", "_row", "_section", "_document")
+    
+    # Keys of to_dict(), in order; `fields` selects a subset
+    FIELDS = (
+        "source", "doc_title", "section_title", "content", "excerpt",
+        "score", "match_type", "keywords", "heading_level",
+        "section_id", "parent_section_id",
+    )
+    
+    def __init__(
+        self,
+        section: Optional[DocumentSection] = None,
+        document: Optional[Document] = None,
+        score: float = 0.0,
+        match_type: str = "",  # "semantic", "keyword", "fts", "hybrid"
+        excerpt: str = "",
+        row: Optional[ResultRow] = None,
+    ):
+        if row is None and (section is None or document is None):
+            raise ValueError("SearchResult needs a section and document, or a row")
+        self.score = score
+        self.match_type = match_type
+        self.excerpt = excerpt
+        self._row = row
+        self._section = section
+        self._document = document
+    
+    @property
+    def row(self) -> Optional[ResultRow]:
+        """The stored columns behind the result, None if built from objects"""
+        return self._row
+    
+    @property
+    def section_id(self) -> str:
+        """The hit's section id, without hydrating the section"""
+        return self._row.section_id if self._row is not None else self._section.id
+    
+    @property
+    def parent_section_id(self) -> Optional[str]:
+        """Id of the section a chunk hit was cut from, None for sections"""
+        return self._row.parent_section_id if self._row is not None else self._section.parent_section_id
+    
+    @property
+    def section(self) -> DocumentSection:
+        if self._section is None:
+            self._section = self._row.section()
+        return self._section
+    
+    @property
+    def document(self) -> Document:
+        if self._document is None:
+            self._document = self._row.document()
+        return self._document
+    
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SearchResult):
+            return NotImplemented
+        if self._row is not None and other._row is not None:
+            # Compare the stored columns rather than hydrating both sides
+            return (self.score, self.match_type, self.excerpt, self._row.values()) == (
+                other.score, other.match_type, other.excerpt, other._row.values()
+            )
+        return (self.score, self.match_type, self.excerpt, self.section, self.document) == (
+            other.score, other.match_type, other.excerpt, other.section, other.document
+        )
+    
+    def __repr__(self) -> str:
+        return f"SearchResult(section_id={self.section_id!r}, score={self.score!r}, match_type={self.match_type!r})"
+    
+    def to_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Convert to dictionary, optionally projected onto `fields`"""
+        # Until something hydrates the objects, the row is the source of truth
+        value = self._row_value if self._section is None and self._document is None else self._object_value
+        return {name: value(name) for name in (self.FIELDS if fields is None else fields)}
+    
+    def _row_value(self, name: str) -> Any:
+        if name in ("excerpt", "score", "match_type"):
+            return getattr(self, name)
+        if name == "keywords":
+            return self._row.keywords()
+        return getattr(self._row, ROW_FIELDS[name])
+    
+    def _object_value(self, name: str) -> Any:
+        if name in ("excerpt", "score", "match_type"):
+            return getattr(self, name)
+        owner, attribute = OBJECT_FIELDS[name]
+        return getattr(getattr(self, owner), attribute)
     
     def format_for_display(self) -> str:
         """Format for terminal display"""
@@ -143,6 +316,15 @@ class IndexStats:
     last_updated: datetime
     embedding_model: str
     index_version: str
+    http_cache_hits: int = 0
+    http_cache_misses: int = 0
+    query_cache_hits: int = 0
+    query_cache_misses: int = 0
+    
+    @property
+    def query_cache_hit_ratio(self) -> float:
+        lookups = self.query_cache_hits + self.query_cache_misses
+        return self.query_cache_hits / lookups if lookups else 0.0
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
@@ -154,5 +336,10 @@ class IndexStats:
             "last_updated": self.last_updated.isoformat(),
             "embedding_model": self.embedding_model,
             "index_version": self.index_version,
+            "http_cache_hits": self.http_cache_hits,
+            "http_cache_misses": self.http_cache_misses,
+            "query_cache_hits": self.query_cache_hits,
+            "query_cache_misses": self.query_cache_misses,
+            "query_cache_hit_ratio": round(self.query_cache_hit_ratio, 4),
         }
 
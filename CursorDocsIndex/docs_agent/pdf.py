@@ -0,0 +1,213 @@
+"""
+PDF text extraction and outline-based sectioning (optional pypdf)
+"""
+
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from .pipeline import process_pool
+
+try:
+    import pypdf
+except ImportError:  # PDFs can't be parsed without it
+    pypdf = None
+
+# Pages per extraction task; a file with fewer pages is read in-process
+PAGES_PER_TASK = 16
+# Tasks queued per pool worker: bounds the extracted text not yet consumed
+TASKS_PER_WORKER = 2
+
+# (level, title, first page, last page, content) per section, pages 0-based
+PdfSections = List[Tuple[int, str, int, int, str]]
+
+# Words broken across lines by hyphenation, and runs of blank lines
+HYPHENATED = re.compile(r"(\w)-\n(\w)")
+BLANK_LINES = re.compile(r"\n\s*\n\s*")
+
+
+def _require_pypdf():
+    if pypdf is None:
+        raise ImportError("Parsing PDFs needs the optional pypdf package (pip install pypdf)")
+
+
+def _clean(text: str) -> str:
+    text = HYPHENATED.sub(r"\1\2", text.replace("\r\n", "\n"))
+    return BLANK_LINES.sub("\n\n", text).strip()
+
+
+# The reader of the file being extracted in this process, see _open_reader
+_reader: Optional[Tuple[Tuple[str, int, int], "pypdf.PdfReader"]] = None
+
+
+def _open_reader(path: str):
+    """
+    A reader for `path`, kept for the next page range of the same file
+
+    Opening a PDF flattens its whole page tree, so a reader per page range
+    would make extraction quadratic in the number of pages.
+    """
+    global _reader
+    _require_pypdf()
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _reader is None or _reader[0] != key:
+        _reader = (key, pypdf.PdfReader(path))
+    return _reader[1]
+
+
+def _release_reader():
+    global _reader
+    _reader = None
+
+
+def extract_pages(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop), module-level so pool workers can unpickle it"""
+    reader = _open_reader(path)
+    texts = []
+    for number in range(start, min(stop, len(reader.pages))):
+        try:
+            text = reader.pages[number].extract_text() or ""
+        except Exception:
+            # One damaged page shouldn't cost the rest of the manual
+            text = ""
+        texts.append(_clean(text))
+    return texts
+
+
+def iter_pages(path: str, num_pages: int, workers: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield page texts in order, PAGES_PER_TASK pages per task
+
+    Page ranges go to a process pool, at most TASKS_PER_WORKER ranges per
+    worker ahead of the consumer. Inside a worker process (the ingestion
+    pipeline already parses documents in parallel) pages are read in-process.
+    """
+    ranges = [(start, start + PAGES_PER_TASK) for start in range(0, num_pages, PAGES_PER_TASK)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers < 2 or multiprocessing.parent_process() is not None:
+        for start, stop in ranges:
+            yield from extract_pages(path, start, stop)
+        return
+
+    pending: Deque[Future] = deque()
+    remaining = iter(ranges)
+    with process_pool(workers) as pool:
+        for start, stop in remaining:
+            pending.append(pool.submit(extract_pages, path, start, stop))
+            if len(pending) >= workers * TASKS_PER_WORKER:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            for start, stop in remaining:
+                pending.append(pool.submit(extract_pages, path, start, stop))
+                break
+            yield from pages
+
+
+def read_outline(reader) -> List[Tuple[int, str, int]]:
+    """(level, title, page) of every bookmark that points at a page, by page"""
+    entries = []
+
+    def walk(items, level):
+        for item in items:
+            # Children follow their parent as a nested list
+            if isinstance(item, list):
+                walk(item, level + 1)
+                continue
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                continue
+            title = " ".join(str(item.title or "").split())
+            if title and page is not None and page >= 0:
+                entries.append((min(level, 6), title, page))
+
+    try:
+        walk(reader.outline, 1)
+    except Exception:
+        # A broken outline is no reason to skip the text
+        return []
+    # Stable: entries starting on the same page keep their outline order
+    entries.sort(key=lambda entry: entry[2])
+    return entries
+
+
+def _find_heading(text: str, title: str, start: int) -> Optional[Tuple[int, int]]:
+    """Span of a bookmark's title in page text, whitespace and case insensitive"""
+    pattern = r"\s+".join(re.escape(word) for word in title.split())
+    match = re.compile(pattern, re.IGNORECASE).search(text, start)
+    return match.span() if match else None
+
+
+def split_pdf_sections(path: str, workers: Optional[int] = None) -> Tuple[Optional[str], int, PdfSections]:
+    """
+    Split a PDF into sections at its outline (bookmark) entries
+
+    A section runs from its bookmark to the next one, cut at the position
+    of the next bookmark's title where the page text contains it, at the
+    page boundary otherwise. Text before the first bookmark becomes a
+    section titled after the document. Without an outline, every page is a
+    section. Besides the sections themselves, only the outline, the reader
+    and up to TASKS_PER_WORKER page ranges per worker are held.
+
+    Returns:
+        (document title from the PDF metadata, number of pages, sections)
+    """
+    reader = _open_reader(path)
+    num_pages = len(reader.pages)
+    try:
+        title = (reader.metadata or {}).get("/Title")
+    except Exception:
+        title = None
+    title = " ".join(str(title).split()) if title else None
+    outline = read_outline(reader)
+    del reader
+    try:
+        return title, num_pages, _split(path, num_pages, title, outline, workers)
+    finally:
+        _release_reader()
+
+
+def _split(
+    path: str, num_pages: int, title: Optional[str], outline: List[Tuple[int, str, int]],
+    workers: Optional[int],
+) -> PdfSections:
+    """Sections of split_pdf_sections, consuming the page text as it comes"""
+    sections: PdfSections = []
+    if not outline:
+        for number, text in enumerate(iter_pages(path, num_pages, workers)):
+            if text:
+                sections.append((2, f"Page {number + 1}", number, number, text))
+        return sections
+
+    starting: Dict[int, List[Tuple[int, str]]] = {}
+    for level, heading, page in outline:
+        starting.setdefault(page, []).append((level, heading))
+
+    # The section being filled: level, title, first page, text parts
+    current: Tuple[int, str, int, List[str]] = (1, title or "", 0, [])
+
+    def close(last_page: int):
+        level, heading, first_page, parts = current
+        content = "\n\n".join(part for part in parts if part)
+        if content or (heading and heading != title):
+            sections.append((level, heading, first_page, last_page, content))
+
+    for number, text in enumerate(iter_pages(path, num_pages, workers)):
+        position = 0
+        for level, heading in starting.get(number, []):
+            span = _find_heading(text, heading, position)
+            cut, end = span if span else (position, position)
+            before = text[position:cut].strip()
+            current[3].append(before)
+            # The page counts towards the closed section only if it gave it text
+            close(number if before else max(number - 1, current[2]))
+            current = (level, heading, number, [])
+            position = end
+        current[3].append(text[position:].strip())
+    close(max(num_pages - 1, current[2]))
+    return sections
@@ -0,0 +1,255 @@
+"""
+Staged, concurrent ingestion pipeline: fetch -> parse -> write
+"""
+
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .models import Document
+from .http_cache import NotModified
+
+# Called once per source when it is finished: (source, document, error).
+# Both are None when the source was unchanged and skipped.
+ResultCallback = Callable[[str, Optional[Document], Optional[Exception]], None]
+
+# Called with (stage, seconds) as each fetch, parse and write completes
+StageCallback = Callable[[str, float], None]
+
+
+def _timed(fn: Callable, *args) -> Tuple[Any, float]:
+    """(fn(*args), seconds it took), module-level so parser processes can unpickle it"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def process_pool(max_workers: int) -> Executor:
+    """
+    A process pool whose workers never inherit another thread's locks
+
+    Forked workers copy every lock as it was at fork time; one held by a
+    fetch thread (or, in the API server, a search thread inside SQLite)
+    stays held forever in the child, which then hangs on it. Where
+    available, workers fork from a single-threaded forkserver instead.
+    """
+    # Imported here: multiprocessing is only needed once ingesting
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = None
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+class _InlineExecutor(Executor):
+    """Runs tasks synchronously, for small ingests where a pool isn't worth it"""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class IngestionPipeline:
+    """
+    Ingest many sources with bounded concurrency
+
+    Stages:
+        fetch   thread pool (network bound), at most `per_host` requests in
+                flight per host so a big crawl doesn't hammer one server
+        parse   process pool (CPU bound: BeautifulSoup, markdown)
+        write   the calling thread, the single writer; parsed documents are
+                written `batch_size` at a time, one transaction per batch
+
+    Backpressure: at most `max_pending` sources are between "pulled from the
+    input" and "written", so memory stays bounded and `sources` can be a
+    lazy generator of any length. A generator may yield None to say that no
+    source is ready yet (e.g. a crawler whose next URLs depend on pages still
+    being fetched); pulling then resumes after the next completed task.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Any],
+        parse: Callable[[str, Any], Document],
+        write: Callable[[List[Document]], None],
+        fetch_workers: int = 8,
+        parse_workers: Optional[int] = None,
+        per_host: int = 4,
+        batch_size: int = 25,
+        max_pending: Optional[int] = None,
+        observe: Optional[StageCallback] = None,
+        discard: Optional[Callable[[str, Any], None]] = None,
+    ):
+        """
+        Args:
+            fetch: source -> raw content, or anything else parse accepts
+                (called on worker threads)
+            parse: (source, fetched) -> Document, must be picklable
+            write: Persist a batch of documents (called on the caller's thread)
+            fetch_workers: Concurrent fetches overall
+            parse_workers: Parser processes, None = CPU count, 0 = parse inline
+            per_host: Concurrent fetches per host
+            batch_size: Documents per write transaction
+            max_pending: Sources in flight at once, default 4 x fetch_workers
+            observe: Told how long each fetch, parse (timed where it runs,
+                queueing excluded) and write took, on the caller's thread
+            discard: (source, fetched) for content whose parse failed or
+                never ran (the run ended first), so whatever it holds on
+                to (a downloaded file) can be released; caller's thread
+        """
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.fetch_workers = fetch_workers
+        if parse_workers is None:
+            parse_workers = os.cpu_count() or 1
+        self.parse_workers = parse_workers
+        self.per_host = per_host
+        self.batch_size = batch_size
+        self.max_pending = max_pending or fetch_workers * 4
+        self.observe = observe or (lambda stage, seconds: None)
+        self.discard = discard or (lambda source, fetched: None)
+
+    @staticmethod
+    def _host(source: str) -> str:
+        """Concurrency bucket for a source (local files share one)"""
+        return urlparse(source).netloc if source.startswith(('http://', 'https://')) else ""
+
+    def run(self, sources: Iterable[str], on_result: Optional[ResultCallback] = None) -> List[Document]:
+        """
+        Run all sources through the pipeline
+
+        Args:
+            sources: URLs or file paths (any iterable, consumed lazily;
+                None entries mean "nothing ready yet")
+            on_result: Progress callback, invoked on the caller's thread
+
+        Returns:
+            Successfully written documents, in input order
+        """
+        on_result = on_result or (lambda source, doc, error: None)
+        source_iter: Iterator[Tuple[int, Optional[str]]] = enumerate(sources)
+        exhausted = False
+
+        deferred: deque = deque()          # pulled, waiting for a host slot
+        host_load: Counter = Counter()     # fetches in flight per host
+        fetches: Dict[Future, Tuple[int, str]] = {}
+        parses: Dict[Future, Tuple[int, str, Any]] = {}
+        batch: List[Tuple[int, str, Document]] = []
+        written: List[Tuple[int, Document]] = []
+
+        def pending() -> int:
+            return len(deferred) + len(fetches) + len(parses) + len(batch)
+
+        def flush():
+            docs = [doc for _, _, doc in batch]
+            try:
+                _, seconds = _timed(self.write, docs)
+                self.observe("write", seconds)
+            except Exception as e:
+                for _, source, _ in batch:
+                    on_result(source, None, e)
+            else:
+                for index, source, doc in batch:
+                    written.append((index, doc))
+                    on_result(source, doc, None)
+            batch.clear()
+
+        if self.parse_workers > 0:
+            parse_pool: Executor = process_pool(self.parse_workers)
+        else:
+            parse_pool = _InlineExecutor()
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="fetch") as fetch_pool:
+            try:
+                while True:
+                    # Pull new sources while there is room (backpressure)
+                    while not exhausted and pending() < self.max_pending:
+                        try:
+                            index, source = next(source_iter)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        if source is None:
+                            break
+                        deferred.append((index, source))
+
+                    # Start fetches for sources whose host has a free slot
+                    for _ in range(len(deferred)):
+                        index, source = deferred.popleft()
+                        host = self._host(source)
+                        if host_load[host] < self.per_host and len(fetches) < self.fetch_workers:
+                            host_load[host] += 1
+                            fetches[fetch_pool.submit(_timed, self.fetch, source)] = (index, source)
+                        else:
+                            deferred.append((index, source))
+
+                    if not fetches and not parses:
+                        if batch:
+                            flush()
+                        if exhausted and not deferred:
+                            break
+                        continue
+
+                    done, _ = wait(list(fetches) + list(parses), return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        if future in fetches:
+                            index, source = fetches.pop(future)
+                            host_load[self._host(source)] -= 1
+                            try:
+                                content, seconds = future.result()
+                                self.observe("fetch", seconds)
+                            except NotModified:
+                                # Already indexed and unchanged: no parse, no write
+                                on_result(source, None, None)
+                                continue
+                            except Exception as e:
+                                on_result(source, None, e)
+                                continue
+                            try:
+                                parse = parse_pool.submit(_timed, self.parse, source, content)
+                            except BaseException:
+                                self.discard(source, content)
+                                raise
+                            parses[parse] = (index, source, content)
+                        else:
+                            index, source, content = parses.pop(future)
+                            try:
+                                doc, seconds = future.result()
+                                self.observe("parse", seconds)
+                                batch.append((index, source, doc))
+                            except Exception as e:
+                                self.discard(source, content)
+                                on_result(source, None, e)
+
+                    if len(batch) >= self.batch_size:
+                        flush()
+            finally:
+                fetch_pool.shutdown(wait=True)
+                parse_pool.shutdown(wait=True, cancel_futures=True)
+                # Cut short: fetched content that no parser will ever see
+                for future, (_, source) in fetches.items():
+                    if future.exception() is None:
+                        self.discard(source, future.result()[0])
+                for future, (_, source, content) in parses.items():
+                    if future.cancelled() or future.exception() is not None:
+                        self.discard(source, content)
+
+        written.sort(key=lambda item: item[0])
+        return [doc for _, doc in written]
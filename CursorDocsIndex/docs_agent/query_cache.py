@@ -0,0 +1,157 @@
+"""
+In-memory LRU + TTL cache of search results, invalidated by index writes
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from .models import ResultRow, SearchResult
+
+CacheKey = Tuple[str, int, str]
+
+GENERATION_KEY = "index_generation"
+
+# Layout of the file written by QueryCache.save(); others are ignored
+CACHE_FILE_VERSION = 1
+
+
+def read_generation(conn: sqlite3.Connection) -> int:
+    """Current index generation (0 for an index never written to)"""
+    row = conn.execute(
+        "SELECT value FROM index_metadata WHERE key = ?", (GENERATION_KEY,)
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def bump_generation(cursor: sqlite3.Cursor):
+    """Mark every cached result stale; call inside the writing transaction"""
+    cursor.execute("""
+        INSERT INTO index_metadata (key, value) VALUES (?, '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    """, (GENERATION_KEY,))
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace don't change what a query matches"""
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    """
+    Search results keyed on (normalized query, top_k, method)
+
+    Each entry remembers the index generation it was computed at. The
+    generation lives in metadata.db and is bumped by every write, so an
+    ingest from any process (the API's job queue, a CLI run) invalidates
+    the cache without having to reach it. Entries also expire after
+    `ttl_seconds`, and the least recently used are evicted beyond
+    `max_entries`.
+
+    With `path` set, `save()` writes the entries to disk as JSON and the
+    next QueryCache on the same path starts with them; entries whose
+    generation no longer matches are simply never served. The file may
+    come from an imported snapshot, so it holds plain values only.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300, path: Optional[Path] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = Path(path) if path else None
+        # key -> (generation, expires at (wall clock, survives restarts), results)
+        self._entries: "OrderedDict[CacheKey, Tuple[int, float, List[SearchResult]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None:
+            self._load()
+
+    @staticmethod
+    def key(query: str, top_k: int, method: str) -> CacheKey:
+        return normalize_query(query), top_k, method
+
+    def get(self, key: CacheKey, generation: int) -> Optional[List[SearchResult]]:
+        """Results for key if cached at this generation and not expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation or entry[1] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[2])
+
+    def put(self, key: CacheKey, generation: int, results: List[SearchResult]):
+        with self._lock:
+            self._entries[key] = (generation, time.time() + self.ttl_seconds, list(results))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Tuple[int, int]:
+        """(hits, misses) since the cache was created"""
+        with self._lock:
+            return self.hits, self.misses
+
+    def save(self):
+        """Write unexpired entries to `path` (no-op without one)"""
+        if self.path is None:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [(key, entry) for key, entry in self._entries.items() if entry[1] >= now]
+
+        encoded = [
+            [*key, generation, expires, [_encode_result(r) for r in results]]
+            for key, (generation, expires, results) in entries
+            # Results built from objects rather than rows aren't cached by search
+            if all(r.row is not None for r in results)
+        ]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"version": CACHE_FILE_VERSION, "entries": encoded}, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _load(self):
+        now = time.time()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data["version"] != CACHE_FILE_VERSION:
+                return
+            entries = [
+                (
+                    (str(query), int(top_k), str(method)),
+                    (int(generation), float(expires), [_decode_result(r) for r in results]),
+                )
+                for query, top_k, method, generation, expires, results in data["entries"][-self.max_entries:]
+            ]
+        except Exception:
+            # Missing, unreadable or from an incompatible version: start cold
+            return
+        for key, entry in entries:
+            if entry[1] >= now:
+                self._entries[key] = entry
+
+
+def _encode_result(result: SearchResult) -> List[Any]:
+    return [result.score, result.match_type, result.excerpt, list(result.row.values())]
+
+
+def _decode_result(data: List[Any]) -> SearchResult:
+    score, match_type, excerpt, row = data
+    return SearchResult(score=float(score), match_type=str(match_type), excerpt=str(excerpt), row=ResultRow(*row))
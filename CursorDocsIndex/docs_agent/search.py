@@ -2,15 +2,38 @@
 Semantic search module with hybrid search capabilities
 """
 
-import os
-import json
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable
 from collections import defaultdict
-import re
 
-from .models import Document, DocumentSection, SearchResult
+from .models import Document, ResultRow, SearchResult
+from .inverted_index import EXPANSION_BUDGET, InvertedIndex, tokenize, top_scored
+from .fts_index import FTSIndex
+from .embeddings import get_embedding_provider
+from .vector_store import VectorStore
+from .ann_index import create_ann_index
+from .database import Database, batched
+from .query_cache import bump_generation
+from .metrics import annotate, propagate, span
+
+# Above this many sections, keyword queries are answered by FTS5 (when
+# available) instead of the Python scorer
+FTS_AUTO_THRESHOLD = 50_000
+
+# Hybrid search: candidates pulled from each retriever per requested result,
+# the reciprocal-rank-fusion damping constant, and for "weighted" fusion the
+# share of the final score that comes from vector similarity
+HYBRID_CANDIDATES = 4
+RRF_K = 60
+SEMANTIC_WEIGHT = 0.5
+
+# ResultRow columns, in constructor order
+RESULT_COLUMNS = """
+    s.id, s.document_id, s.title, s.content, s.heading_level, s.keywords,
+    s.order_num, s.parent_section_id, d.source_url, d.title, d.doc_type, d.date_fetched
+"""
 
 
 class SemanticSearch:
@@ -18,26 +41,112 @@ class SemanticSearch:
     Hybrid semantic + keyword search engine
     """
     
-    def __init__(self, index_dir: Path, embedding_provider: str = "openrouter"):
+    def __init__(
+        self,
+        index_dir: Path,
+        embedding_provider: str = "openrouter",
+        fts_threshold: int = FTS_AUTO_THRESHOLD,
+        ann_backend: Optional[str] = "ivf",
+        ann_options: Optional[Dict[str, Any]] = None,
+        fusion: str = "rrf",
+        database: Optional[Database] = None,
+        expansion_budget: float = EXPANSION_BUDGET,
+    ):
         self.index_dir = Path(index_dir)
         self.embedding_provider = embedding_provider
         self.db_path = self.index_dir / "metadata.db"
+        self.db = database or Database(self.db_path)
+        self.inverted_index = InvertedIndex(expansion_budget)
+        self.fts_index = FTSIndex()
+        self.fts_threshold = fts_threshold
+        self.fusion = fusion
+        
+        # Lexical and vector retrievers of a hybrid query run side by side
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid")
         
         # Check if embeddings are available
-        self.embeddings_available = False
-        if embedding_provider == "openrouter":
-            self.embeddings_available = bool(os.getenv("OPENROUTER_API_KEY"))
-        elif embedding_provider == "openai":
-            self.embeddings_available = bool(os.getenv("OPENAI_API_KEY"))
+        self.embedder = get_embedding_provider(embedding_provider)
+        self.embeddings_available = self.embedder is not None
+        vectors_dir = self.index_dir / "vectors"
+        ann = None
+        if ann_backend:
+            ann = create_ann_index(ann_backend, vectors_dir / ann_backend, **(ann_options or {}))
+        self.vector_store = VectorStore(vectors_dir, ann=ann)
         
         if not self.embeddings_available:
             print("⚠️  No API keys found - using keyword search only")
     
     def index_document(self, doc: Document):
         """Index a document for search"""
-        # Currently just stores in DB via DocsAgent
-        # TODO: Add vector indexing when embeddings are available
-        pass
+        if not self.embeddings_available:
+            return
+        
+        rowids = [row[0] for row in self.db.reader().execute(
+            "SELECT rowid FROM sections WHERE document_id = ? AND num_chunks = 0 ORDER BY order_num",
+            (doc.id,),
+        )]
+        
+        self.index_sections(rowids)
+    
+    def index_sections(self, rowids: List[int]):
+        """Embed new or changed sections, all in one batch"""
+        # Postings are written by DocsAgent in the same transaction as the sections
+        if not self.embeddings_available or not rowids:
+            return
+        
+        conn = self.db.reader()
+        rows = []
+        for chunk in batched(rowids):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(conn.execute(f"""
+                SELECT rowid, title, content FROM sections
+                WHERE rowid IN ({placeholders})
+            """, chunk).fetchall())
+        
+        self._embed_rows(rows)
+    
+    def remove_sections(self, rowids: List[int]):
+        """Drop vectors of sections that were deleted or replaced"""
+        self.vector_store.remove(rowids)
+    
+    def rebuild_vectors(self, batch_size: int = 512) -> int:
+        """
+        Re-embed every section (after switching embedding provider)
+        
+        Returns:
+            Number of sections embedded
+        """
+        if not self.embeddings_available:
+            return 0
+        
+        self.vector_store.clear()
+        
+        cursor = self.db.reader().execute(
+            "SELECT rowid, title, content FROM sections WHERE num_chunks = 0 ORDER BY rowid"
+        )
+        total = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            self._embed_rows(rows)
+            total += len(rows)
+        cursor.close()
+        self.vector_store.flush()
+        
+        # Semantic rankings changed, cached results are stale
+        with self.db.transaction() as write_cursor:
+            bump_generation(write_cursor)
+        return total
+    
+    def _embed_rows(self, rows: List[tuple]):
+        """Embed (rowid, title, content) rows in batches and append them"""
+        if not rows:
+            return
+        
+        texts = [f"{title}\n\n{content}" for _, title, content in rows]
+        vectors = self.embedder.embed(texts)
+        self.vector_store.add(self.embedder.identity, [rowid for rowid, _, _ in rows], vectors)
     
     def search(self, query: str, top_k: int = 5, method: str = "hybrid") -> List[SearchResult]:
         """
@@ -46,120 +155,221 @@ class SemanticSearch:
         Args:
             query: Search query
             top_k: Number of results
-            method: "semantic", "keyword", or "hybrid"
+            method: "semantic", "keyword", "fts", or "hybrid"
             
         Returns:
             List of SearchResults sorted by relevance
         """
-        # For now, use keyword search
-        # TODO: Add semantic search when embeddings are ready
+        with span("resolve"):
+            method = self._resolve_method(method)
+        annotate(method=method)
         
-        if method == "semantic" and not self.embeddings_available:
-            method = "keyword"
-        
-        if method in ["keyword", "hybrid"]:
-            return self._keyword_search(query, top_k)
+        if method == "fts":
+            return self._fts_search(query, top_k)
+        elif method == "semantic":
+            return self._semantic_search(query, top_k)
+        elif method == "hybrid":
+            return self._hybrid_search(query, top_k)
         else:
-            # Semantic search placeholder
             return self._keyword_search(query, top_k)
     
+    def search_many(self, queries: List[str], top_k: int = 5, method: str = "hybrid") -> List[List[SearchResult]]:
+        """
+        Search several queries in one pass over the index
+        
+        Postings are read once for all query terms and scored with shared
+        per-term arrays, the queries are embedded in one call and matched
+        against the vector matrix in one matrix product, and result rows
+        are loaded in one query. Results match `search` per query.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results per query
+            method: "semantic", "keyword", "fts", or "hybrid"
+            
+        Returns:
+            One list of SearchResults per query, in order
+        """
+        if not queries:
+            return []
+        
+        with span("resolve"):
+            method = self._resolve_method(method)
+        annotate(method=method)
+        if method == "fts":
+            # FTS5 matches and ranks inside SQLite, one statement per query
+            return [self._fts_search(query, top_k) for query in queries]
+        
+        term_sets = [set(tokenize(query)) for query in queries]
+        
+        if method == "keyword":
+            ranked = self._keyword_candidates_many(queries, term_sets, top_k)
+        elif method == "semantic":
+            ranked = self._vector_candidates_many(queries, top_k)
+        else:
+            limit = top_k * HYBRID_CANDIDATES
+            keyword_future = self._executor.submit(
+                propagate(self._keyword_candidates_many), queries, term_sets, limit
+            )
+            vector_future = self._executor.submit(propagate(self._vector_candidates_many), queries, limit)
+            fuse = self._weighted_fusion if self.fusion == "weighted" else self._rrf_fusion
+            keyword_batches, vector_batches = keyword_future.result(), vector_future.result()
+            with span("fuse"):
+                ranked = [
+                    top_scored(fuse(keyword_ranked, vector_ranked), top_k)
+                    for keyword_ranked, vector_ranked in zip(keyword_batches, vector_batches)
+                ]
+        
+        cursor = self.db.reader().cursor()
+        with span("fetch_rows"):
+            rows = self._fetch_rows(cursor, {rowid for hits in ranked for rowid, _ in hits})
+        return [
+            self._load_results(cursor, hits, query_terms, method, rows=rows)
+            for hits, query_terms in zip(ranked, term_sets)
+        ]
+    
+    def _resolve_method(self, method: str) -> str:
+        """The method a request actually runs with, given what's available"""
+        if method in ["semantic", "hybrid"] and not self.embeddings_available:
+            method = "keyword"
+        
+        if method == "fts" and not self.fts_index.available:
+            method = "keyword"
+        
+        if method not in ("fts", "semantic", "hybrid"):
+            return "fts" if self._prefer_fts() else "keyword"
+        return method
+    
     def _keyword_search(self, query: str, top_k: int) -> List[SearchResult]:
         """
-        Keyword-based search using TF-IDF-like scoring
+        Keyword-based search using BM25 scoring over the inverted index
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.reader().cursor()
         
         # Extract query terms
-        query_terms = set(re.findall(r'\b\w{3,}\b', query.lower()))
-        
-        # Get all sections
-        cursor.execute("""
-            SELECT 
-                s.id, s.document_id, s.title, s.content, 
-                s.heading_level, s.keywords, s.order_num,
-                d.source_url, d.title as doc_title, d.doc_type
-            FROM sections s
-            JOIN documents d ON s.document_id = d.id
-        """)
+        query_terms = set(tokenize(query))
         
-        results = []
+        # Score only sections that have postings for the query terms
+        annotate(keyword="scorer")
+        ranked = self.inverted_index.top_many(cursor, [query], top_k, [query_terms])[0]
         
-        for row in cursor.fetchall():
-            section_id, doc_id, title, content, heading_level, keywords_json, order_num, source_url, doc_title, doc_type = row
-            
-            # Parse keywords
-            try:
-                keywords = json.loads(keywords_json)
-            except:
-                keywords = []
-            
-            # Calculate relevance score
-            score = 0.0
-            
-            # Title match (highest weight)
-            title_lower = title.lower()
-            for term in query_terms:
-                if term in title_lower:
-                    score += 5.0
-            
-            # Keyword match
-            keywords_lower = [k.lower() for k in keywords]
-            for term in query_terms:
-                if term in keywords_lower:
-                    score += 3.0
-            
-            # Content match
-            content_lower = content.lower()
-            for term in query_terms:
-                # Count occurrences with diminishing returns
-                count = content_lower.count(term)
-                if count > 0:
-                    score += min(count * 0.5, 2.0)  # Cap at 2.0 per term
-            
-            # Exact phrase bonus
-            if query.lower() in content_lower:
-                score += 10.0
-            
-            if score > 0:
-                # Create section and document objects
-                section = DocumentSection(
-                    id=section_id,
-                    document_id=doc_id,
-                    title=title,
-                    content=content,
-                    heading_level=heading_level,
-                    keywords=keywords,
-                    order=order_num,
-                )
-                
-                # Get full document (simplified)
-                document = Document(
-                    id=doc_id,
-                    source_url=source_url,
-                    title=doc_title,
-                    doc_type=doc_type,  # String, will need conversion if used
-                    date_fetched=None,  # Not loaded for search results
-                    sections=[],  # Don't load all sections
-                )
-                
-                # Create excerpt with highlighted terms
-                excerpt = self._create_excerpt(content, query_terms)
-                
-                result = SearchResult(
-                    section=section,
-                    document=document,
+        return self._load_results(cursor, ranked, query_terms, "keyword")
+    
+    def _fts_search(self, query: str, top_k: int) -> List[SearchResult]:
+        """
+        Full-text search with matching, BM25 ranking, top_k and snippets done in SQLite
+        """
+        cursor = self.db.reader().cursor()
+        
+        query_terms = set(tokenize(query))
+        hits = self._fts_hits(cursor, query_terms, top_k)
+        
+        ranked = [(rowid, score) for rowid, score, _ in hits]
+        snippets = {rowid: snippet for rowid, _, snippet in hits}
+        
+        return self._load_results(cursor, ranked, query_terms, "fts", snippets)
+    
+    def _prefer_fts(self) -> bool:
+        """Whether the index is large enough for FTS5 to beat the Python scorer"""
+        if not self.fts_index.available:
+            return False
+        
+        # MAX(rowid) is an O(log n) upper bound, COUNT(*) would scan the table
+        largest = self.db.reader().execute("SELECT MAX(rowid) FROM sections").fetchone()[0]
+        return (largest or 0) >= self.fts_threshold
+    
+    def _load_results(
+        self,
+        cursor: sqlite3.Cursor,
+        ranked: List[tuple],
+        query_terms: set,
+        match_type: str,
+        excerpts: Optional[Dict[int, str]] = None,
+        rows: Optional[Dict[int, ResultRow]] = None,
+    ) -> List[SearchResult]:
+        """
+        Load rows for the ranked (rowid, score) hits only
+        
+        Results keep the raw row and build their DocumentSection and
+        Document when first asked for. `rows` may hold rows already
+        fetched with `_fetch_rows`.
+        """
+        if not ranked:
+            return []
+        
+        if rows is None:
+            with span("fetch_rows"):
+                rows = self._fetch_rows(cursor, [rowid for rowid, _ in ranked])
+        
+        results = []
+        with span("excerpts"):
+            for rowid, score in ranked:
+                row = rows.get(rowid)
+                if row is None:
+                    continue
+                excerpt = excerpts.get(rowid) if excerpts else None
+                results.append(SearchResult(
                     score=score,
-                    match_type="keyword",
-                    excerpt=excerpt,
-                )
-                results.append(result)
+                    match_type=match_type,
+                    excerpt=excerpt or self._create_excerpt(row.content, query_terms),
+                    row=row,
+                ))
+        return results
+    
+    @staticmethod
+    def _fetch_rows(cursor: sqlite3.Cursor, rowids: Iterable[int]) -> Dict[int, ResultRow]:
+        """Section and document columns for result rows, keyed by rowid"""
+        rows = {}
+        for chunk in batched(list(rowids)):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                SELECT s.rowid, {RESULT_COLUMNS}
+                FROM sections s
+                JOIN documents d ON s.document_id = d.id
+                WHERE s.rowid IN ({placeholders})
+            """, chunk)
+            rows.update((row[0], ResultRow(*row[1:])) for row in cursor.fetchall())
+        return rows
+    
+    def expand(self, results: List[SearchResult]) -> List[SearchResult]:
+        """
+        Swap chunk hits for the sections they were cut from
         
-        conn.close()
+        Each parent appears once, at the rank of its best chunk, keeping
+        that chunk's score and excerpt. The inputs may be shared with the
+        query cache, so they are never modified: parents are new results.
+        """
+        parent_ids = list({r.parent_section_id for r in results if r.parent_section_id})
+        parents: Dict[str, ResultRow] = {}
+        cursor = self.db.reader().cursor()
+        for chunk in batched(parent_ids):
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(f"""
+                SELECT {RESULT_COLUMNS}
+                FROM sections s
+                JOIN documents d ON s.document_id = d.id
+                WHERE s.id IN ({placeholders})
+            """, chunk)
+            parents.update((row[0], ResultRow(*row)) for row in cursor.fetchall())
         
-        # Sort by score and return top_k
-        results.sort(key=lambda r: r.score, reverse=True)
-        return results[:top_k]
+        expanded = []
+        seen = set()
+        for result in results:
+            parent = parents.get(result.parent_section_id)
+            section_id = parent.section_id if parent else result.section_id
+            if section_id in seen:
+                continue
+            seen.add(section_id)
+            if parent is None:
+                expanded.append(result)
+                continue
+            expanded.append(SearchResult(
+                score=result.score,
+                match_type=result.match_type,
+                excerpt=result.excerpt,
+                row=parent,
+            ))
+        return expanded
     
     def _create_excerpt(self, content: str, query_terms: set, context_chars: int = 200) -> str:
         """
@@ -194,8 +404,114 @@ class SemanticSearch:
     
     def _semantic_search(self, query: str, top_k: int) -> List[SearchResult]:
         """
-        Semantic search using embeddings (placeholder for future)
+        Semantic search: cosine similarity against the section vector matrix
         """
-        # TODO: Implement when embeddings are ready
-        return self._keyword_search(query, top_k)
-
+        ranked = self._vector_candidates(query, top_k)
+        
+        return self._load_results(self.db.reader().cursor(), ranked, set(tokenize(query)), "semantic")
+    
+    def _hybrid_search(self, query: str, top_k: int) -> List[SearchResult]:
+        """
+        Hybrid search: run lexical and vector retrieval concurrently and fuse
+        the two candidate lists, loading rows for the fused top_k only
+        """
+        query_terms = set(tokenize(query))
+        limit = top_k * HYBRID_CANDIDATES
+        
+        keyword_future = self._executor.submit(propagate(self._keyword_candidates), query, query_terms, limit)
+        vector_future = self._executor.submit(propagate(self._vector_candidates), query, limit)
+        keyword_ranked = keyword_future.result()
+        vector_ranked = vector_future.result()
+        annotate(keyword_candidates=len(keyword_ranked), vector_candidates=len(vector_ranked))
+        
+        with span("fuse"):
+            if self.fusion == "weighted":
+                fused = self._weighted_fusion(keyword_ranked, vector_ranked)
+            else:
+                fused = self._rrf_fusion(keyword_ranked, vector_ranked)
+            ranked = top_scored(fused, top_k)
+        
+        return self._load_results(self.db.reader().cursor(), ranked, query_terms, "hybrid")
+    
+    def _keyword_candidates(self, query: str, query_terms: set, limit: int) -> List[tuple]:
+        """Best lexical (rowid, score) pairs, from FTS5 on large indexes"""
+        # Runs on a worker thread, which gets its own reader connection
+        cursor = self.db.reader().cursor()
+        
+        if self._prefer_fts():
+            ranked = [(rowid, score) for rowid, score, _ in self._fts_hits(cursor, query_terms, limit)]
+        else:
+            annotate(keyword="scorer")
+            ranked = self.inverted_index.top_many(cursor, [query], limit, [query_terms])[0]
+        
+        return ranked
+    
+    def _keyword_candidates_many(self, queries: List[str], term_sets: List[set], limit: int) -> List[List[tuple]]:
+        """`_keyword_candidates` for a batch, sharing one postings read"""
+        cursor = self.db.reader().cursor()
+        
+        if self._prefer_fts():
+            return [
+                [(rowid, score) for rowid, score, _ in self._fts_hits(cursor, terms, limit)]
+                for terms in term_sets
+            ]
+        
+        annotate(keyword="scorer")
+        return self.inverted_index.top_many(cursor, queries, limit, term_sets)
+    
+    def _fts_hits(self, cursor: sqlite3.Cursor, query_terms: set, limit: int) -> List[tuple]:
+        """FTS5 (rowid, score, snippet) hits, typo-tolerant like the scorer"""
+        with span("expand_terms"):
+            terms = self.inverted_index.match_terms(cursor, query_terms)
+        annotate(keyword="fts", match_terms=terms)
+        with span("fts"):
+            return self.fts_index.search(cursor, terms, limit)
+    
+    @staticmethod
+    def _rrf_fusion(*rankings: List[tuple]) -> Dict[int, float]:
+        """Reciprocal rank fusion: sum of 1 / (RRF_K + rank) over the lists"""
+        fused: Dict[int, float] = defaultdict(float)
+        for ranking in rankings:
+            for rank, (rowid, _) in enumerate(ranking, 1):
+                fused[rowid] += 1.0 / (RRF_K + rank)
+        return fused
+    
+    @staticmethod
+    def _weighted_fusion(keyword_ranked: List[tuple], vector_ranked: List[tuple]) -> Dict[int, float]:
+        """Blend max-normalized keyword scores with cosine similarity"""
+        fused: Dict[int, float] = defaultdict(float)
+        if keyword_ranked:
+            best = max(score for _, score in keyword_ranked) or 1.0
+            for rowid, score in keyword_ranked:
+                fused[rowid] += (1 - SEMANTIC_WEIGHT) * score / best
+        for rowid, similarity in vector_ranked:
+            fused[rowid] += SEMANTIC_WEIGHT * max(similarity, 0.0)
+        return fused
+    
+    def _vector_candidates(self, query: str, limit: int) -> List[tuple]:
+        """Nearest section rowids to the query embedding"""
+        # Vectors from another provider/model live in a different space
+        if not len(self.vector_store) or self.vector_store.identity != self.embedder.identity:
+            return []
+        
+        with span("embed"):
+            query_vector = self.embedder.embed([query])[0]
+        with span("vector_search"):
+            return self._related(self.vector_store.search(query_vector, limit))
+    
+    def _vector_candidates_many(self, queries: List[str], limit: int) -> List[List[tuple]]:
+        """`_vector_candidates` for a batch: one embedding call, one matrix product"""
+        if not len(self.vector_store) or self.vector_store.identity != self.embedder.identity:
+            return [[] for _ in queries]
+        
+        with span("embed"):
+            vectors = self.embedder.embed(queries)
+        with span("vector_search"):
+            return [self._related(hits) for hits in self.vector_store.search_many(vectors, limit)]
+    
+    def _related(self, hits: List[tuple]) -> List[tuple]:
+        """Vector hits similar enough to the query to count as matches"""
+        # The nearest sections to an unrelated query are noise; fused in,
+        # they'd fill every hybrid result list
+        floor = self.embedder.min_similarity
+        return [(rowid, similarity) for rowid, similarity in hits if similarity >= floor]
@@ -0,0 +1,345 @@
+"""
+Single-file snapshots of an index, for shipping it to fresh deployments
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, List, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # gzip from the standard library is the fallback
+    zstandard = None
+
+from .migrations import SCHEMA_VERSION
+
+# Bump when the artifact layout changes incompatibly
+SNAPSHOT_FORMAT = 1
+
+MANIFEST_NAME = "manifest.json"
+CHECKSUMS_NAME = "checksums.json"
+
+# Vectors dominate snapshots and barely compress, favour speed
+ZSTD_LEVEL = 3
+GZIP_LEVEL = 6
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+COPY_BUFFER = 1 << 20
+
+# SQLite side files (each database is exported through the backup API) and
+# temporary files never travel; neither does crawl state, it is per machine,
+# nor do downloaded PDFs, whose text is already in the index, or logs
+SKIPPED_SUFFIXES = (".db-wal", ".db-shm", ".db-journal", ".tmp")
+SKIPPED_DIRS = ("cache/crawl", "cache/pdf", "logs")
+STAGING_PREFIX = ".snapshot-"
+CACHE_DIR = "cache"
+
+Source = Union[str, Path, BinaryIO]
+
+
+class SnapshotError(Exception):
+    """A snapshot is corrupt, truncated, or can't be used here"""
+
+
+def snapshot_files(index_dir: Path, include_caches: bool = True) -> List[Tuple[str, Path]]:
+    """(archive path, file) of everything a snapshot of `index_dir` holds"""
+    index_dir = Path(index_dir)
+    files = []
+    for path in sorted(index_dir.rglob("*")):
+        name = path.relative_to(index_dir).as_posix()
+        if not path.is_file() or name.endswith(SKIPPED_SUFFIXES):
+            continue
+        if any(name.startswith(directory + "/") for directory in SKIPPED_DIRS):
+            continue
+        if any(part.startswith(STAGING_PREFIX) for part in PurePosixPath(name).parts):
+            continue
+        if not include_caches and name.startswith(CACHE_DIR + "/"):
+            continue
+        files.append((name, path))
+    return files
+
+
+def export_snapshot(
+    index_dir: Path,
+    destination: Path,
+    include_caches: bool = True,
+) -> Dict[str, Any]:
+    """
+    Write the index under `index_dir` to one compressed archive
+
+    The archive is a tar stream, zstd-compressed (gzip without the optional
+    `zstandard` package): a manifest first, so readers can reject it before
+    unpacking anything, then every file, then their sha256 checksums.
+    SQLite databases are copied with the backup API, which gives a
+    consistent copy even while the index is being read.
+
+    Writers should be paused while exporting (DocsAgent.export_snapshot
+    holds the write lock), or the vectors may not match the database.
+
+    Args:
+        index_dir: Index to export
+        destination: Archive to write; replaced only once complete
+        include_caches: Also ship the HTTP and query caches
+
+    Returns:
+        The manifest
+    """
+    index_dir = Path(index_dir)
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=destination.parent, prefix=STAGING_PREFIX) as staging:
+        files = []
+        schema_version = 0
+        for name, path in snapshot_files(index_dir, include_caches):
+            if path.suffix == ".db":
+                copy = Path(staging) / name
+                copy.parent.mkdir(parents=True, exist_ok=True)
+                _backup_database(path, copy)
+                path = copy
+                if name == "metadata.db":
+                    schema_version = _schema_version(copy)
+            files.append((name, path, path.stat().st_size))
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "schema_version": schema_version,
+            "created": datetime.now().isoformat(),
+            "compression": "zstd" if zstandard is not None else "gzip",
+            "files": [{"path": name, "size": size} for name, _, size in files],
+        }
+
+        fd, tmp = tempfile.mkstemp(dir=destination.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, ExitStack() as stack:
+                if zstandard is not None:
+                    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1)
+                    stream = stack.enter_context(compressor.stream_writer(out, closefd=False))
+                else:
+                    stream = stack.enter_context(
+                        gzip.GzipFile(fileobj=out, mode="wb", compresslevel=GZIP_LEVEL)
+                    )
+                tar = stack.enter_context(tarfile.open(fileobj=stream, mode="w|"))
+
+                _add_json(tar, MANIFEST_NAME, manifest)
+                checksums = {}
+                for name, path, size in files:
+                    info = tarfile.TarInfo(name)
+                    info.size = size
+                    info.mtime = int(time.time())
+                    with open(path, "rb") as f:
+                        hashing = _HashingReader(f)
+                        tar.addfile(info, hashing)
+                    checksums[name] = hashing.hexdigest()
+                _add_json(tar, CHECKSUMS_NAME, checksums)
+            os.replace(tmp, destination)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    return manifest
+
+
+def import_snapshot(source: Source, index_dir: Path, replace: bool = False) -> Dict[str, Any]:
+    """
+    Unpack a snapshot into `index_dir` in one streaming pass
+
+    Files are streamed into a staging directory inside `index_dir` and
+    checked against the manifest sizes and the trailing checksums; only a
+    complete, intact snapshot is moved into place. Nothing is loaded into
+    memory: the vector matrix is memory-mapped from disk when the index
+    opens, so a fresh deployment can answer queries right away.
+
+    Args:
+        source: Archive path, http(s) URL, or a readable binary stream
+        index_dir: Where the index goes
+        replace: Overwrite an existing index (otherwise an error)
+
+    Returns:
+        The snapshot's manifest
+
+    Raises:
+        SnapshotError: Corrupt, truncated or unsupported snapshot, or an
+            index already exists and `replace` is False
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    if any(index_dir.iterdir()):
+        if not (index_dir / "metadata.db").exists():
+            raise SnapshotError(f"{index_dir} is not empty and holds no index, refusing to overwrite it")
+        if not replace:
+            raise SnapshotError(f"{index_dir} already holds an index (use replace to overwrite it)")
+
+    # Staging inside the target keeps the final moves on one filesystem,
+    # mounted volumes included
+    staging = Path(tempfile.mkdtemp(dir=index_dir, prefix=STAGING_PREFIX))
+    try:
+        with ExitStack() as stack:
+            raw = _open_source(source, stack)
+            tar = stack.enter_context(tarfile.open(fileobj=_decompress(raw, stack), mode="r|"))
+            manifest = _read_manifest(tar)
+            expected = {entry["path"]: entry["size"] for entry in manifest["files"]}
+
+            digests: Dict[str, str] = {}
+            checksums = None
+            # Not `for member in tar`: that starts over at the manifest
+            for member in iter(tar.next, None):
+                if member.name == CHECKSUMS_NAME:
+                    checksums = json.load(tar.extractfile(member))
+                    continue
+                if not member.isfile() or member.name not in expected or member.name in digests:
+                    raise SnapshotError(f"Unexpected snapshot entry: {member.name}")
+                if member.size != expected[member.name]:
+                    raise SnapshotError(f"Size mismatch for {member.name}")
+                target = staging / member.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                digests[member.name] = _copy(tar.extractfile(member), target)
+    except BaseException as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Tar, decompression, JSON and I/O errors all mean the same here
+        if isinstance(e, Exception) and not isinstance(e, SnapshotError):
+            raise SnapshotError(f"Unreadable snapshot: {e}") from e
+        raise
+
+    try:
+        if checksums is None:
+            raise SnapshotError("Snapshot is truncated (no checksums)")
+        missing = set(expected) - set(digests)
+        if missing:
+            raise SnapshotError(f"Snapshot is missing {len(missing)} file(s), e.g. {min(missing)}")
+        corrupt = sorted(name for name, digest in digests.items() if checksums.get(name) != digest)
+        if corrupt:
+            raise SnapshotError(f"Checksum mismatch for {', '.join(corrupt)}")
+
+        for entry in index_dir.iterdir():
+            if entry == staging:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry)
+            else:
+                entry.unlink()
+        for entry in staging.iterdir():
+            os.replace(entry, index_dir / entry.name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    return manifest
+
+
+def _backup_database(path: Path, copy: Path):
+    """Consistent single-file copy of a live SQLite database"""
+    source = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+        # A WAL-mode copy would need its -wal file; the index re-enables WAL on open
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+        source.close()
+
+
+def _schema_version(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _add_json(tar: tarfile.TarFile, name: str, data: Any):
+    payload = json.dumps(data, indent=1).encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(payload)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(payload))
+
+
+def _read_manifest(tar: tarfile.TarFile) -> Dict[str, Any]:
+    """Read and validate the leading manifest"""
+    member = tar.next()
+    if member is None or member.name != MANIFEST_NAME:
+        raise SnapshotError("Not a docs index snapshot (no manifest)")
+    manifest = json.load(tar.extractfile(member))
+
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError(
+            f"Snapshot format {manifest.get('format')} is not supported (expected {SNAPSHOT_FORMAT})"
+        )
+    if manifest.get("schema_version", 0) > SCHEMA_VERSION:
+        raise SnapshotError(
+            f"Snapshot schema version {manifest['schema_version']} is newer than this release "
+            f"supports ({SCHEMA_VERSION})"
+        )
+    for entry in manifest.get("files", []):
+        path = PurePosixPath(entry["path"])
+        if path.is_absolute() or ".." in path.parts or entry["path"] in (MANIFEST_NAME, CHECKSUMS_NAME):
+            raise SnapshotError(f"Unsafe path in snapshot: {entry['path']}")
+    return manifest
+
+
+def _open_source(source: Source, stack: ExitStack) -> BinaryIO:
+    """A buffered binary stream over a path, URL or file object"""
+    if isinstance(source, (str, Path)) and str(source).startswith(("http://", "https://")):
+        import requests
+
+        response = stack.enter_context(requests.get(str(source), stream=True, timeout=60))
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return io.BufferedReader(response.raw, COPY_BUFFER)
+    if isinstance(source, (str, Path)):
+        return stack.enter_context(open(source, "rb", buffering=COPY_BUFFER))
+    return source if hasattr(source, "peek") else io.BufferedReader(source, COPY_BUFFER)
+
+
+def _decompress(raw: BinaryIO, stack: ExitStack) -> BinaryIO:
+    """Decompressing reader, picked from the stream's magic bytes"""
+    magic = raw.peek(4)[:4]
+    if magic == ZSTD_MAGIC:
+        if zstandard is None:
+            raise SnapshotError("Snapshot is zstd-compressed; install the zstandard package")
+        return stack.enter_context(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+    if magic[:2] == GZIP_MAGIC:
+        return stack.enter_context(gzip.GzipFile(fileobj=raw, mode="rb"))
+    raise SnapshotError("Not a docs index snapshot (unknown compression)")
+
+
+def _copy(source: BinaryIO, target: Path) -> str:
+    """Stream `source` to `target`, returning the sha256 of what was written"""
+    digest = hashlib.sha256()
+    with open(target, "wb") as out:
+        while True:
+            block = source.read(COPY_BUFFER)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+class _HashingReader:
+    """File wrapper hashing everything read through it"""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self._digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        block = self._f.read(size)
+        self._digest.update(block)
+        return block
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
@@ -0,0 +1,207 @@
+"""
+Trigram index over the term vocabulary: substring and typo-tolerant term lookup
+"""
+
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+# Query terms shorter than this are never fuzzy-matched (too many neighbours);
+# from LONG_TERM characters on, two edits are tolerated instead of one. Terms
+# past FUZZY_MAX_LENGTH were pasted rather than typed
+FUZZY_MIN_LENGTH = 4
+LONG_TERM = 8
+FUZZY_MAX_LENGTH = 64
+
+# Candidates pulled per fuzzy lookup (most shared trigrams first), and
+# similar terms kept per query term
+MAX_CANDIDATES = 200
+MAX_SIMILAR = 5
+
+# A trigram with at most this many terms is rare enough to check them all
+RARE_TRIGRAM = 64
+
+
+# Pads terms in the index, so their first and last letters get a trigram of
+# their own; never part of a term, which is all word characters
+BOUNDARY = " "
+
+
+def trigrams(term: str) -> Set[str]:
+    """Distinct three-character substrings of a term"""
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def indexed_trigrams(term: str) -> Set[str]:
+    """Trigrams a term is filed under: its own plus the two at its boundaries"""
+    return trigrams(f"{BOUNDARY}{term}{BOUNDARY}")
+
+
+def max_edits(term: str) -> int:
+    """Edits a query term may be away from the terms it is expanded to"""
+    if not FUZZY_MIN_LENGTH <= len(term) <= FUZZY_MAX_LENGTH:
+        return 0
+    return 1 if len(term) < LONG_TERM else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Levenshtein distance counting an adjacent transposition as one edit
+
+    Gives up early: any distance above `limit` is reported as limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TrigramIndex:
+    """
+    Trigram -> term postings for the `terms` vocabulary of the inverted index.
+
+    A term contains a fragment only if it contains all of the fragment's
+    trigrams, so substring lookups read a few index ranges instead of
+    testing every vocabulary term. A term within k edits of another shares
+    all but at most 4k of its trigrams (3k for Levenshtein edits, one more
+    per transposition), which bounds the candidates a fuzzy lookup has to
+    verify with the actual edit distance. Terms are filed under their
+    boundary trigrams too (see indexed_trigrams): a term of n letters has
+    n of them, so a typo in a term of 4 letters or more keeps at least one
+    in common with the intended term (short of swapping the middle two
+    letters of a 4 letter term).
+
+    Kept current by InvertedIndex as terms enter and leave the vocabulary.
+    """
+
+    VERSION = "2"
+
+    def create_schema(self, cursor: sqlite3.Cursor):
+        """Create the trigram table if it doesn't exist"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS term_trigrams (
+                trigram TEXT NOT NULL,
+                term TEXT NOT NULL,
+                PRIMARY KEY (trigram, term)
+            ) WITHOUT ROWID
+        """)
+
+    def ensure_built(self, cursor: sqlite3.Cursor):
+        """Index a vocabulary built before the trigram index existed"""
+        cursor.execute("SELECT value FROM index_metadata WHERE key = 'trigram_index_version'")
+        row = cursor.fetchone()
+        if row and row[0] == self.VERSION:
+            return
+
+        self.clear(cursor)
+        terms = [term for (term,) in cursor.execute("SELECT term FROM terms").fetchall()]
+        self.add_terms(cursor, terms)
+
+    def clear(self, cursor: sqlite3.Cursor):
+        """Empty the index, ahead of the vocabulary being rebuilt"""
+        cursor.execute("DELETE FROM term_trigrams")
+        # An empty index is current; from here on it is maintained incrementally
+        cursor.execute(
+            "INSERT OR REPLACE INTO index_metadata (key, value) VALUES (?, ?)",
+            ('trigram_index_version', self.VERSION),
+        )
+
+    def add_terms(self, cursor: sqlite3.Cursor, terms: Iterable[str]):
+        """Index terms that entered the vocabulary"""
+        cursor.executemany(
+            "INSERT OR IGNORE INTO term_trigrams (trigram, term) VALUES (?, ?)",
+            [(trigram, term) for term in terms for trigram in indexed_trigrams(term)],
+        )
+
+    def remove_terms(self, cursor: sqlite3.Cursor, terms: Iterable[str]):
+        """Drop terms that left the vocabulary"""
+        cursor.executemany(
+            "DELETE FROM term_trigrams WHERE trigram = ? AND term = ?",
+            [(trigram, term) for term in terms for trigram in indexed_trigrams(term)],
+        )
+
+    def containing(self, cursor: sqlite3.Cursor, fragment: str) -> List[str]:
+        """Vocabulary terms that contain `fragment` (at least 3 characters)"""
+        grams = sorted(trigrams(fragment))
+        if not grams:
+            return []
+
+        # Every containing term is filed under each of the fragment's
+        # trigrams: counting is a cheap index range scan, so check only the
+        # terms of the rarest one
+        rarest = None
+        for gram in grams:
+            count = cursor.execute(
+                "SELECT COUNT(*) FROM term_trigrams WHERE trigram = ?", (gram,)
+            ).fetchone()[0]
+            if rarest is None or count < rarest[0]:
+                rarest = (count, gram)
+            if count <= RARE_TRIGRAM:
+                break
+        cursor.execute(
+            "SELECT term FROM term_trigrams WHERE trigram = ? AND instr(term, ?) > 0",
+            (rarest[1], fragment),
+        )
+        return [term for (term,) in cursor.fetchall()]
+
+    def similar(
+        self, cursor: sqlite3.Cursor, term: str, deadline: Optional[float] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Vocabulary terms within max_edits(term) edits of `term`
+
+        Args:
+            cursor: Open cursor on metadata.db
+            term: Query term
+            deadline: time.monotonic() value after which no more candidates
+                are verified (what was found so far is returned)
+
+        Returns:
+            Up to MAX_SIMILAR (term, distance) pairs, all at the smallest
+            distance found, most shared trigrams first
+        """
+        limit = max_edits(term)
+        grams = sorted(indexed_trigrams(term))
+        if not limit or not grams:
+            return []
+
+        placeholders = ",".join("?" * len(grams))
+        cursor.execute(f"""
+            SELECT term, COUNT(*) AS shared FROM term_trigrams
+            WHERE trigram IN ({placeholders}) AND length(term) BETWEEN ? AND ?
+            GROUP BY term HAVING shared >= ?
+            ORDER BY shared DESC, term
+            LIMIT ?
+        """, [
+            *grams, len(term) - limit, len(term) + limit,
+            max(1, len(grams) - 4 * limit), MAX_CANDIDATES,
+        ])
+
+        matches = []
+        for candidate, _ in cursor.fetchall():
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            distance = edit_distance(term, candidate, limit)
+            if 0 < distance <= limit:
+                matches.append((candidate, distance))
+
+        if not matches:
+            return []
+        # Still in candidate order: most shared trigrams first
+        best = min(distance for _, distance in matches)
+        return [match for match in matches if match[1] == best][:MAX_SIMILAR]
@@ -0,0 +1,351 @@
+"""
+On-disk vector matrix for semantic search
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .ann_index import ANNIndex, EMPTY
+
+
+class _ReadWriteLock:
+    """
+    Any number of readers or one writer
+
+    Waiting writers hold off new readers, so a steady stream of searches
+    can't starve an ingest. The writer may re-enter (and read) while it
+    holds the lock.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writer: Optional[int] = None
+        self._depth = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        if self._writer == threading.get_ident():
+            yield
+            return
+        with self._condition:
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._writers_waiting -= 1
+                self._writer = me
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._depth -= 1
+                if not self._depth:
+                    self._writer = None
+                    self._condition.notify_all()
+
+
+class VectorStore:
+    """
+    Contiguous float32 matrix of section embeddings, memory-mapped from disk
+
+    Layout under `vectors_dir`:
+        matrix.npy   (capacity, dim) float32, rows L2-normalized
+        rowids.npy   (capacity,) int64, section rowid per row or EMPTY
+        meta.json    used row count, dimension and embedding identity
+
+    Rows are appended, capacity doubles when full so appends are amortized
+    O(1). Deleted rows are tombstoned and reclaimed by `compact()`.
+
+    An optional ANN backend is kept in step with every change and answers
+    queries once it is trained; otherwise search is an exact scan.
+
+    Searches may run on several threads while an ingest writes: changes to
+    the store and its ANN backend take the lock exclusively, searches share it.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, vectors_dir: Path, ann: Optional[ANNIndex] = None):
+        self.vectors_dir = Path(vectors_dir)
+        self.vectors_dir.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.vectors_dir / "matrix.npy"
+        self.rowids_path = self.vectors_dir / "rowids.npy"
+        self.meta_path = self.vectors_dir / "meta.json"
+
+        self.count = 0
+        self.deleted = 0
+        self.dim: Optional[int] = None
+        self.identity: Optional[str] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.rowids: Optional[np.ndarray] = None
+        self.ann = ann
+        self._lock = _ReadWriteLock()
+        self._load()
+
+    def _load(self):
+        """Open an existing store, if any"""
+        if not self.meta_path.exists():
+            return
+
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.deleted = meta.get("deleted", 0)
+        self.dim = meta["dim"]
+        self.identity = meta["identity"]
+        self.matrix = np.load(self.matrix_path, mmap_mode="r+")
+        self.rowids = np.load(self.rowids_path, mmap_mode="r+")
+
+    def _save_meta(self):
+        with open(self.meta_path, "w") as f:
+            json.dump({
+                "count": self.count,
+                "deleted": self.deleted,
+                "dim": self.dim,
+                "identity": self.identity,
+            }, f)
+
+    def __len__(self) -> int:
+        """Number of live vectors"""
+        return self.count - self.deleted
+
+    def clear(self):
+        """Delete all vectors and the backing files"""
+        with self._lock.write():
+            self.matrix = None
+            self.rowids = None
+            self.count = 0
+            self.deleted = 0
+            self.dim = None
+            self.identity = None
+            for path in (self.matrix_path, self.rowids_path, self.meta_path):
+                path.unlink(missing_ok=True)
+            if self.ann:
+                self.ann.reset()
+
+    def reset(self, identity: str, dim: int, capacity: int = INITIAL_CAPACITY):
+        """Drop all vectors and start a new matrix"""
+        with self._lock.write():
+            self.matrix = None
+            self.rowids = None
+            self.count = 0
+            self.deleted = 0
+            self.dim = dim
+            self.identity = identity
+            self._allocate(capacity)
+            self._save_meta()
+            if self.ann:
+                self.ann.reset()
+
+    def _allocate(self, capacity: int):
+        """(Re)allocate the backing files with room for `capacity` rows"""
+        matrix = np.lib.format.open_memmap(
+            self.vectors_dir / "matrix.tmp.npy", mode="w+",
+            dtype=np.float32, shape=(capacity, self.dim),
+        )
+        rowids = np.lib.format.open_memmap(
+            self.vectors_dir / "rowids.tmp.npy", mode="w+",
+            dtype=np.int64, shape=(capacity,),
+        )
+        rowids[:] = EMPTY
+        if self.matrix is not None and self.count:
+            matrix[:self.count] = self.matrix[:self.count]
+            rowids[:self.count] = self.rowids[:self.count]
+        matrix.flush()
+        rowids.flush()
+        del matrix, rowids
+        self.matrix = None
+        self.rowids = None
+
+        (self.vectors_dir / "matrix.tmp.npy").replace(self.matrix_path)
+        (self.vectors_dir / "rowids.tmp.npy").replace(self.rowids_path)
+        self.matrix = np.load(self.matrix_path, mmap_mode="r+")
+        self.rowids = np.load(self.rowids_path, mmap_mode="r+")
+
+    def add(self, identity: str, rowids: List[int], vectors: np.ndarray):
+        """
+        Append vectors for the given section rowids
+
+        Args:
+            identity: Embedding provider identity; a mismatch resets the store
+            rowids: Section rowids, one per vector
+            vectors: (n, dim) L2-normalized float32 matrix
+        """
+        with self._lock.write():
+            if not len(rowids):
+                return
+
+            dim = vectors.shape[1]
+            if self.matrix is None or identity != self.identity or dim != self.dim:
+                self.reset(identity, dim)
+
+            needed = self.count + len(rowids)
+            capacity = self.matrix.shape[0]
+            if needed > capacity:
+                while capacity < needed:
+                    capacity *= 2
+                self._allocate(capacity)
+
+            start = self.count
+            self.matrix[start:needed] = vectors
+            self.rowids[start:needed] = rowids
+            self.count = needed
+            self.matrix.flush()
+            self.rowids.flush()
+            self._save_meta()
+            if self.ann:
+                self.ann.add(self, start, needed)
+
+    def remove(self, rowids: List[int]):
+        """Tombstone the vectors of the given section rowids"""
+        with self._lock.write():
+            if self.matrix is None or not len(rowids):
+                return
+
+            live = self.rowids[:self.count]
+            slots = np.nonzero(np.isin(live, np.asarray(rowids, dtype=np.int64)))[0]
+            if not len(slots):
+                return
+
+            self.rowids[slots] = EMPTY
+            self.matrix[slots] = 0.0
+            self.deleted += len(slots)
+            if self.ann:
+                self.ann.remove(rowids)
+
+            # Reclaim space once more than half of the rows are dead
+            if self.deleted * 2 > self.count:
+                self.compact()
+            else:
+                self.matrix.flush()
+                self.rowids.flush()
+                self._save_meta()
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows"""
+        with self._lock.write():
+            if self.matrix is None:
+                return
+
+            keep = np.nonzero(self.rowids[:self.count] != EMPTY)[0]
+            matrix = np.array(self.matrix[keep])
+            rowids = np.array(self.rowids[keep])
+
+            capacity = self.INITIAL_CAPACITY
+            while capacity < len(keep):
+                capacity *= 2
+
+            self.matrix = None
+            self.rowids = None
+            self.count = 0
+            self.deleted = 0
+            self._allocate(capacity)
+            self.matrix[:len(keep)] = matrix
+            self.rowids[:len(keep)] = rowids
+            self.count = len(keep)
+            self.matrix.flush()
+            self.rowids.flush()
+            self._save_meta()
+            if self.ann:
+                self.ann.remap(keep)
+
+    def flush(self):
+        """Checkpoint the ANN backend's in-memory changes to disk"""
+        if self.ann:
+            with self._lock.write():
+                self.ann.flush()
+
+    def search(self, query: np.ndarray, top_k: int, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        Cosine search, approximate when an ANN backend is ready
+
+        Args:
+            query: (dim,) L2-normalized query vector
+            top_k: Number of results
+            exact: Skip the ANN backend and scan every row
+
+        Returns:
+            List of (section rowid, similarity), best first
+        """
+        with self._lock.read():
+            if self.matrix is None or not len(self) or query.shape[-1] != self.dim:
+                return []
+
+            query = query.astype(np.float32)
+            if self.ann and not exact:
+                hits = self.ann.search(self, query, top_k)
+                if hits is not None:
+                    return hits
+
+            # One BLAS matrix-vector product over the contiguous matrix
+            scores = self.matrix[:self.count] @ query
+            if self.deleted:
+                scores[self.rowids[:self.count] == EMPTY] = -np.inf
+
+            k = min(top_k, len(self))
+            # argpartition is O(n); only the k winners get sorted
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.rowids[i]), float(scores[i])) for i in top]
+
+    def search_many(self, queries: np.ndarray, top_k: int, exact: bool = False) -> List[List[Tuple[int, float]]]:
+        """
+        `search` for a batch of queries
+
+        Args:
+            queries: (m, dim) L2-normalized query vectors
+            top_k: Results per query
+            exact: Skip the ANN backend and scan every row
+
+        Returns:
+            One (section rowid, similarity) list per query, best first
+        """
+        with self._lock.read():
+            if self.matrix is None or not len(self) or not len(queries) or queries.shape[-1] != self.dim:
+                return [[] for _ in queries]
+
+            queries = queries.astype(np.float32)
+            if self.ann and not exact:
+                hits = self.ann.search_many(self, queries, top_k)
+                if hits is not None:
+                    return hits
+
+            # One matrix-matrix product reads the matrix once for all queries
+            scores = self.matrix[:self.count] @ queries.T
+            if self.deleted:
+                scores[self.rowids[:self.count] == EMPTY] = -np.inf
+
+            k = min(top_k, len(self))
+            top = np.argpartition(scores, -k, axis=0)[-k:]
+            results = []
+            for column in range(scores.shape[1]):
+                rows = top[:, column]
+                column_scores = scores[rows, column]
+                order = np.argsort(-column_scores)
+                results.append([
+                    (int(self.rowids[rows[i]]), float(column_scores[i])) for i in order
+                ])
+            return results
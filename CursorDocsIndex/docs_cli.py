@@ -4,52 +4,95 @@ Docs-Agent CLI - Command-line interface for documentation indexing and search
 
 Usage:
     ./docs_cli.py ingest <url_or_file> [<url_or_file>...]
+    ./docs_cli.py crawl <seed_url>
     ./docs_cli.py search <query>
     ./docs_cli.py lookup <query>
     ./docs_cli.py stats
+    ./docs_cli.py embed
+    ./docs_cli.py compact
+    ./docs_cli.py snapshot export <file>
+    ./docs_cli.py snapshot import <file_or_url>
+    ./docs_cli.py daemon start|stop|status
     ./docs_cli.py init
 """
 
 import sys
 import os
+import json
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
 import typer
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.markdown import Markdown
 
 # Add parent dir to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from docs_agent import DocsAgent
+# The engine, parsers and rich are imported by the commands that use them:
+# `lookup` answered by the daemon loads neither
+from docs_agent import daemon
+
+if TYPE_CHECKING:
+    from docs_agent import DocsAgent
 
 app = typer.Typer(help="📚 Docs-Agent CLI - Semantic Documentation Search")
-console = Console()
+snapshot_app = typer.Typer(help="Export or import the whole index as one archive")
+app.add_typer(snapshot_app, name="snapshot")
+daemon_app = typer.Typer(help="Keep the index open in a resident process for fast lookups")
+app.add_typer(daemon_app, name="daemon")
+
+
+class _LazyConsole:
+    """Stands in for rich's Console until the first output"""
+    
+    def __getattr__(self, name: str):
+        global console
+        from rich.console import Console
+        console = Console()
+        return getattr(console, name)
+
+
+console = _LazyConsole()
 
 # Default index directory
 INDEX_DIR = Path.home() / "CursorDocsIndex"
 
+# "openrouter", "openai", "local" (sentence-transformers) or "hash" (offline)
+EMBEDDING_PROVIDER = os.getenv("DOCS_EMBEDDING_PROVIDER", "openrouter")
+
 
-def get_agent() -> DocsAgent:
+def get_agent() -> "DocsAgent":
     """Get or create DocsAgent instance"""
     if not INDEX_DIR.exists():
         console.print(f"❌ Index not initialized. Run: docs_cli.py init", style="red")
         raise typer.Exit(1)
     
-    return DocsAgent(INDEX_DIR)
+    from docs_agent import DocsAgent
+    return DocsAgent(INDEX_DIR, embedding_provider=EMBEDDING_PROVIDER)
+
+
+def ask_daemon(op: str, in_process: Callable[[], Any], **args) -> Any:
+    """Answer from the daemon if one is running, else open the index here"""
+    try:
+        return daemon.call(daemon.socket_path(INDEX_DIR), op, **args)
+    except daemon.DaemonUnavailable:
+        return in_process()
+    except daemon.DaemonError as e:
+        console.print(f"❌ {e}", style="red")
+        raise typer.Exit(1)
 
 
 @app.command()
 def init():
     """Initialize the documentation index"""
+    from docs_agent import DocsAgent
+    from rich.panel import Panel
+    
     INDEX_DIR.mkdir(parents=True, exist_ok=True)
-    agent = DocsAgent(INDEX_DIR)
+    agent = DocsAgent(INDEX_DIR, embedding_provider=EMBEDDING_PROVIDER)
     
     console.print(Panel.fit(
         f"[green]✅ Documentation index initialized![/green]\n\n"
         f"📁 Location: {INDEX_DIR}\n"
-        f"🔧 Embedding provider: {agent.search.embedding_provider}\n"
+        f"🔧 Embedding provider: {agent.search_engine.embedding_provider}\n"
         f"📊 Ready to ingest documentation!",
         title="🎉 Docs-Agent Initialized",
         border_style="green"
@@ -73,13 +116,44 @@ def ingest(sources: list[str]):
 
 
 @app.command()
-def search(query: str, top_k: int = 5):
-    """Search the documentation index"""
+def crawl(
+    seed_url: str,
+    max_depth: int = 3,
+    max_pages: int = 500,
+    path_prefix: str = typer.Option(None, help="Only follow URLs under this path"),
+    sitemap: bool = typer.Option(True, help="Queue pages listed in sitemap.xml"),
+    robots: bool = typer.Option(True, help="Respect robots.txt"),
+    restart: bool = typer.Option(False, help="Discard an interrupted crawl of this seed"),
+):
+    """Crawl a documentation site from a seed URL and ingest its pages"""
     agent = get_agent()
     
-    console.print(f"\n🔍 Searching for: [cyan]{query}[/cyan]\n")
+    console.print(f"\n🕸️  Crawling {seed_url} (depth {max_depth}, up to {max_pages} pages)...\n", style="cyan bold")
+    
+    docs = agent.crawl(
+        seed_url,
+        max_depth=max_depth,
+        max_pages=max_pages,
+        path_prefix=path_prefix,
+        use_sitemap=sitemap,
+        respect_robots=robots,
+        restart=restart,
+    )
+    
+    console.print(f"\n✅ Successfully ingested {len(docs)} document(s)!", style="green bold")
+
+
+@app.command()
+def search(query: str, top_k: int = 5, method: str = "hybrid"):
+    """Search the documentation index"""
+    def in_process():
+        return [result.to_dict() for result in get_agent().search(query, top_k=top_k, method=method)]
     
-    results = agent.search(query, top_k=top_k)
+    results = ask_daemon("search", in_process, query=query, top_k=top_k, method=method)
+    
+    from rich.panel import Panel
+    
+    console.print(f"\n🔍 Searching for: [cyan]{query}[/cyan]\n")
     
     if not results:
         console.print("❌ No results found", style="red")
@@ -89,22 +163,29 @@ def search(query: str, top_k: int = 5):
     
     for i, result in enumerate(results, 1):
         console.print(Panel(
-            f"[bold]{result.section.title}[/bold]\n\n"
-            f"{result.excerpt}\n\n"
-            f"[dim]Source: {result.document.title}[/dim]\n"
-            f"[dim]URL: {result.document.source_url}[/dim]\n"
-            f"[dim]Score: {result.score:.2f} | Type: {result.match_type}[/dim]",
+            f"[bold]{result['section_title']}[/bold]\n\n"
+            f"{result['excerpt']}\n\n"
+            f"[dim]Source: {result['doc_title']}[/dim]\n"
+            f"[dim]URL: {result['source']}[/dim]\n"
+            f"[dim]Score: {result['score']:.2f} | Type: {result['match_type']}[/dim]",
             title=f"Result {i}",
             border_style="blue"
         ))
 
 
 @app.command()
-def lookup(query: str):
+def lookup(
+    query: str,
+    as_json: bool = typer.Option(False, "--json", help="Print the raw result as one JSON line"),
+):
     """Quick lookup (optimized for AI integration)"""
-    agent = get_agent()
+    result = ask_daemon("lookup", lambda: get_agent().lookup(query), query=query)
+    
+    if as_json:
+        print(json.dumps(result, default=float))
+        return
     
-    result = agent.lookup(query)
+    from rich.panel import Panel
     
     if not result['found']:
         console.print(f"❌ {result['message']}", style="red")
@@ -129,6 +210,8 @@ def stats():
     
     stats = agent.get_stats()
     
+    from rich.table import Table
+    
     table = Table(title="📊 Index Statistics", show_header=True)
     table.add_column("Metric", style="cyan")
     table.add_column("Value", style="green")
@@ -138,6 +221,7 @@ def stats():
     table.add_row("Embedding Model", stats.embedding_model)
     table.add_row("Index Version", stats.index_version)
     table.add_row("Last Updated", stats.last_updated.strftime("%Y-%m-%d %H:%M"))
+    table.add_row("HTTP Cache Hits / Misses", f"{stats.http_cache_hits} / {stats.http_cache_misses}")
     
     console.print(table)
     
@@ -147,9 +231,139 @@ def stats():
             console.print(f"  • {doc_type}: {count}")
 
 
+@app.command()
+def embed():
+    """Re-embed every indexed section with the current embedding provider"""
+    agent = get_agent()
+    
+    if not agent.search_engine.embeddings_available:
+        console.print(f"❌ Embedding provider '{EMBEDDING_PROVIDER}' is not available", style="red")
+        raise typer.Exit(1)
+    
+    with console.status("[cyan]Embedding sections..."):
+        total = agent.search_engine.rebuild_vectors()
+    
+    console.print(f"✅ Embedded {total} section(s) with {EMBEDDING_PROVIDER}", style="green bold")
+
+
+@app.command()
+def compact():
+    """Migrate the index to compact storage and report the space reclaimed"""
+    agent = get_agent()
+    
+    with console.status("[cyan]Compacting index..."):
+        report = agent.compact()
+    
+    from rich.table import Table
+    
+    def size(num_bytes: int) -> str:
+        return f"{num_bytes / 1024 / 1024:.1f} MB"
+    
+    table = Table(title="🗜️  Compaction", show_header=True)
+    table.add_column("Storage", style="cyan")
+    table.add_column("Before", style="yellow", justify="right")
+    table.add_column("After", style="green", justify="right")
+    
+    table.add_row("Parsed JSON", size(report["parsed_bytes_before"]), size(report["parsed_bytes_after"]))
+    table.add_row("Raw content blobs", size(report["blob_bytes_before"]), size(report["blob_bytes_after"]))
+    table.add_row("metadata.db", size(report["db_bytes_before"]), size(report["db_bytes_after"]))
+    
+    console.print(table)
+    console.print(
+        f"✅ Migrated {report['documents_migrated']} document(s), pruned {report['blobs_pruned']} "
+        f"unused blob(s), saved {size(report['bytes_saved'])}",
+        style="green bold",
+    )
+
+
+@snapshot_app.command("export")
+def snapshot_export(
+    destination: Path,
+    caches: bool = typer.Option(True, help="Include the HTTP and query caches"),
+):
+    """Write the index to a single compressed, checksummed archive"""
+    agent = get_agent()
+    
+    with console.status("[cyan]Exporting snapshot..."):
+        manifest = agent.export_snapshot(destination, include_caches=caches)
+    agent.close()
+    
+    total = sum(entry["size"] for entry in manifest["files"])
+    console.print(
+        f"✅ Exported {len(manifest['files'])} file(s), {total / 1024 / 1024:.1f} MB uncompressed, "
+        f"to {destination} ({destination.stat().st_size / 1024 / 1024:.1f} MB)",
+        style="green bold",
+    )
+
+
+@snapshot_app.command("import")
+def snapshot_import(
+    source: str,
+    replace: bool = typer.Option(False, help="Overwrite the existing index"),
+):
+    """Load an index from a snapshot archive (file path or URL)"""
+    from docs_agent.snapshot import SnapshotError, import_snapshot
+    
+    try:
+        with console.status("[cyan]Importing snapshot..."):
+            manifest = import_snapshot(source, INDEX_DIR, replace=replace)
+    except SnapshotError as e:
+        console.print(f"❌ {e}", style="red")
+        raise typer.Exit(1)
+    
+    console.print(
+        f"✅ Imported {len(manifest['files'])} file(s) from a snapshot created {manifest['created']}\n"
+        f"📁 Location: {INDEX_DIR}",
+        style="green bold",
+    )
+
+
+@daemon_app.command("start")
+def daemon_start():
+    """Serve lookups and searches from this process until stopped"""
+    path = daemon.socket_path(INDEX_DIR)
+    server = daemon.DocsDaemon(get_agent, path)
+    
+    console.print(f"🟢 Daemon listening on {path} (pid {os.getpid()}); Ctrl+C to stop", style="green")
+    try:
+        server.serve_forever()
+    except RuntimeError as e:
+        console.print(f"❌ {e}", style="red")
+        raise typer.Exit(1)
+    except KeyboardInterrupt:
+        pass
+    console.print("⏹️  Daemon stopped", style="dim")
+
+
+@daemon_app.command("stop")
+def daemon_stop():
+    """Stop a running daemon"""
+    try:
+        reply = daemon.call(daemon.socket_path(INDEX_DIR), "stop")
+    except daemon.DaemonUnavailable:
+        console.print("No daemon is running", style="yellow")
+        return
+    console.print(f"⏹️  Stopped daemon (pid {reply['pid']})", style="green")
+
+
+@daemon_app.command("status")
+def daemon_status():
+    """Report whether a daemon is serving this index"""
+    path = daemon.socket_path(INDEX_DIR)
+    try:
+        reply = daemon.call(path, "ping", timeout=1.0)
+    except daemon.DaemonUnavailable:
+        console.print("No daemon is running", style="yellow")
+        raise typer.Exit(1)
+    console.print(f"🟢 Daemon running (pid {reply['pid']}) on {path}", style="green")
+
+
 @app.command()
 def demo():
     """Run a demo with sample documentation"""
+    from docs_agent import DocsAgent
+    from rich.panel import Panel
+    
     console.print(Panel.fit(
         "[bold cyan]🎨 Docs-Agent Demo[/bold cyan]\n\n"
         "This will ingest sample documentation and run test searches.\n\n"
@@ -163,7 +377,7 @@ def demo():
     if not typer.confirm("Continue with demo?"):
         return
     
-    agent = get_agent() if INDEX_DIR.exists() else DocsAgent(INDEX_DIR)
+    agent = get_agent() if INDEX_DIR.exists() else DocsAgent(INDEX_DIR, embedding_provider=EMBEDDING_PROVIDER)
     
     # Sample sources
     sample_sources = [
@@ -172,8 +386,8 @@ def demo():
         "https://react.dev/learn",
     ]
     
-    console.print("\n📥 Ingesting sample documentation...\n", style="cyan")
-    docs = agent.ingest_sources(sample_sources[:1], show_progress=True)  # Start with just one
+    console.print("\n📥 Crawling sample documentation...\n", style="cyan")
+    docs = agent.crawl(sample_sources[0], max_depth=2, max_pages=50)  # Start with just one
     
     console.print("\n✅ Demo complete! Try searching:", style="green")
     console.print("  docs_cli.py search 'HTTP requests'")
@@ -0,0 +1,55 @@
+"""
+Shared fixtures: a keyword-only index in a temporary directory
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import pytest
+
+# Allow running `pytest` from the project root without installing it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docs_agent.core import DocsAgent
+from docs_agent.models import Document, DocumentSection, DocumentType
+
+
+def make_document(doc_id: str, sections: List[Tuple[str, str]]) -> Document:
+    """Document with one (title, content) pair per section"""
+    return Document(
+        id=doc_id,
+        source_url=f"https://example.com/{doc_id}",
+        title=doc_id,
+        doc_type=DocumentType.MARKDOWN,
+        date_fetched=datetime(2024, 1, 1),
+        sections=[
+            DocumentSection(
+                id=f"{doc_id}_{order}",
+                document_id=doc_id,
+                title=title,
+                content=content,
+                heading_level=2,
+                order=order,
+            )
+            for order, (title, content) in enumerate(sections)
+        ],
+    )
+
+
+@pytest.fixture
+def agent(tmp_path):
+    agent = DocsAgent(tmp_path / "index", embedding_provider=None, ann_backend=None)
+    yield agent
+    agent.close()
+
+
+@pytest.fixture
+def add_document(agent) -> Callable[..., Document]:
+    """Store a document built by make_document() in the agent's index"""
+    def add(doc_id: str, sections: List[Tuple[str, str]]) -> Document:
+        doc = make_document(doc_id, sections)
+        agent._save_document(doc)
+        return doc
+    return add
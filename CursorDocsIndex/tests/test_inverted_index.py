@@ -0,0 +1,91 @@
+"""
+BM25 ranking and the exact-phrase bonus of the inverted index
+"""
+
+import pytest
+
+from docs_agent.corpus_stats import idf
+from docs_agent.inverted_index import BM25_B, BM25_K1, PHRASE_BONUS
+
+FILLER = (
+    "lorem ipsum dolor amet consectetur adipiscing elit sed eiusmod tempor "
+    "incididunt labore dolore magna aliqua enim minim veniam quis nostrud"
+).split()
+
+
+def text(*terms: str, length: int) -> str:
+    """`terms` padded with filler words to `length` terms"""
+    padding = [FILLER[i % len(FILLER)] for i in range(length - len(terms))]
+    return " ".join([*terms, *padding])
+
+
+def scores(agent, query: str) -> dict:
+    """Section id -> keyword score"""
+    cursor = agent.db.reader().cursor()
+    ids = dict(cursor.execute("SELECT rowid, id FROM sections").fetchall())
+    return {
+        ids[rowid]: score
+        for rowid, score in agent.search_engine.inverted_index.score(cursor, query).items()
+    }
+
+
+def ranked(agent, query: str) -> list:
+    return [result.section_id for result in agent.search(query, top_k=10, method="keyword")]
+
+
+def test_term_frequency_and_length(agent, add_document):
+    add_document("doc", [
+        ("Often", text("cache", "cache", "cache", length=10)),
+        ("Once", text("cache", length=10)),
+        ("Once, at length", text("cache", length=30)),
+        ("Unrelated", text(length=10)),
+    ])
+
+    assert ranked(agent, "cache") == ["doc_0", "doc_1", "doc_2"]
+
+
+def test_bm25_score(agent, add_document):
+    lengths = [10, 30, 20, 20]
+    add_document("doc", [
+        ("First", text("cache", "cache", length=lengths[0])),
+        ("Second", text("cache", length=lengths[1])),
+        ("Third", text(length=lengths[2])),
+        ("Fourth", text(length=lengths[3])),
+    ])
+
+    average = sum(lengths) / len(lengths)
+    weight = idf(2, len(lengths))
+
+    def bm25(count, length):
+        saturation = BM25_K1 * (1 - BM25_B + BM25_B * length / average)
+        # A single-term query is its own phrase
+        return weight * count * (BM25_K1 + 1) / (count + saturation) + PHRASE_BONUS
+
+    assert scores(agent, "cache") == {
+        "doc_0": pytest.approx(bm25(2, lengths[0])),
+        "doc_1": pytest.approx(bm25(1, lengths[1])),
+    }
+
+
+def test_rare_term_outweighs_common_term(agent, add_document):
+    add_document("doc", [
+        ("Common", text("cache", length=10)),
+        ("Rare", text("pool", length=10)),
+        *[("Filler", text("cache", length=10)) for _ in range(4)],
+    ])
+
+    assert ranked(agent, "cache pool")[0] == "doc_1"
+
+
+def test_phrase_bonus(agent, add_document):
+    add_document("doc", [
+        ("Apart", text("pool", "lorem", "connection", length=12)),
+        ("Together", text("connection", "pool", length=12)),
+        ("Partial", text("connection", length=12)),
+    ])
+
+    found = scores(agent, "Connection Pool")
+    assert found["doc_1"] == pytest.approx(found["doc_0"] + PHRASE_BONUS)
+    assert found["doc_2"] < PHRASE_BONUS
+    assert ranked(agent, "connection pool")[0] == "doc_1"
+
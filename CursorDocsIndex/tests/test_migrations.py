@@ -0,0 +1,105 @@
+"""
+Upgrading a metadata.db written by the first release
+"""
+
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from docs_agent.core import DocsAgent
+from docs_agent.migrations import SCHEMA_VERSION, migrate
+from docs_agent.models import count_tokens, section_hash
+
+# The empty database the first release shipped with (user_version 0)
+BASELINE_DB = Path(__file__).resolve().parent.parent / "index" / "metadata.db"
+
+SECTIONS = [
+    ("Connection pooling", "Reuse database connections through a pool."),
+    ("Query cache", "Repeated searches are answered from the cache."),
+]
+
+
+@pytest.fixture
+def index_dir(tmp_path) -> Path:
+    """Index directory holding a copy of the baseline database with one document"""
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    shutil.copy(BASELINE_DB, index_dir / "metadata.db")
+
+    conn = sqlite3.connect(index_dir / "metadata.db")
+    with conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        conn.execute("""
+            INSERT INTO documents
+            (id, source_url, title, doc_type, date_fetched, num_sections, keywords, metadata)
+            VALUES ('guide', 'https://example.com/guide', 'Guide', 'markdown',
+                    '2024-01-01T00:00:00', ?, '[]', '{}')
+        """, (len(SECTIONS),))
+        conn.executemany("""
+            INSERT INTO sections (id, document_id, title, content, heading_level, keywords, order_num)
+            VALUES (?, 'guide', ?, ?, 2, ?, ?)
+        """, [
+            (f"guide_{order}", title, content, json.dumps([title.split()[0].lower()]), order)
+            for order, (title, content) in enumerate(SECTIONS)
+        ])
+    conn.close()
+    return index_dir
+
+
+@pytest.fixture
+def agent(index_dir):
+    agent = DocsAgent(index_dir, embedding_provider=None, ann_backend=None)
+    yield agent
+    agent.close()
+
+
+def test_upgrade_to_current_schema(agent):
+    conn = agent.db.reader()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(sections)")}
+    assert {"content_hash", "token_count", "metadata", "parent_section_id", "num_chunks"} <= columns
+    assert "raw_sha" in {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_sections_document", "idx_documents_listing"} <= indexes
+    assert "idx_documents_date_fetched" not in indexes
+
+
+def test_upgrade_backfills_existing_rows(agent):
+    rows = agent.db.reader().execute("""
+        SELECT title, content, content_hash, token_count, num_chunks FROM sections ORDER BY order_num
+    """).fetchall()
+    assert rows == [
+        (title, content, section_hash(title, content), count_tokens(title) + count_tokens(content), 0)
+        for title, content in SECTIONS
+    ]
+
+    stats = agent.get_stats()
+    assert stats.total_documents == 1
+    assert stats.total_sections == len(SECTIONS)
+    assert stats.total_tokens == sum(row[3] for row in rows)
+    assert stats.document_types == {"markdown": 1}
+
+
+def test_upgraded_index_is_searchable(agent):
+    results = agent.search("pool", method="keyword")
+    assert [result.section_id for result in results] == ["guide_0"]
+
+    doc = agent.get_document("guide")
+    assert [section.title for section in doc.sections] == [title for title, _ in SECTIONS]
+
+
+def test_upgrade_runs_once(index_dir):
+    DocsAgent(index_dir, embedding_provider=None, ann_backend=None).close()
+
+    conn = sqlite3.connect(index_dir / "metadata.db")
+    try:
+        assert migrate(conn.cursor()) == 0
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        with pytest.raises(RuntimeError):
+            migrate(conn.cursor())
+    finally:
+        conn.close()
@@ -0,0 +1,61 @@
+"""
+Fetched content that never gets parsed is handed back to `discard`
+"""
+
+import threading
+
+import pytest
+
+from docs_agent.pipeline import IngestionPipeline
+
+
+class Stop(Exception):
+    pass
+
+
+def fetch(source: str) -> str:
+    return f"fetched {source}"
+
+
+def pipeline(parse, discarded, fetch=fetch, **kwargs) -> IngestionPipeline:
+    return IngestionPipeline(
+        fetch=fetch,
+        parse=parse,
+        write=lambda docs: None,
+        parse_workers=0,
+        discard=lambda source, fetched: discarded.append((source, fetched)),
+        **kwargs,
+    )
+
+
+def test_failed_parse_is_discarded():
+    def parse(source, fetched):
+        raise ValueError(source)
+
+    discarded = []
+    errors = []
+    pipeline(parse, discarded).run(["a"], lambda source, doc, error: errors.append(error))
+
+    assert discarded == [("a", "fetched a")]
+    assert isinstance(errors[0], ValueError)
+
+
+def test_unparsed_content_is_discarded_when_the_run_stops():
+    first = threading.Event()
+
+    def fetch_then_wait(source):
+        # Later fetches finish only once the first document is written
+        if source != "a":
+            first.wait()
+        return fetch(source)
+
+    def stop(source, doc, error):
+        first.set()
+        raise Stop()
+
+    discarded = []
+    run = pipeline(lambda source, fetched: object(), discarded, fetch=fetch_then_wait, batch_size=1)
+    with pytest.raises(Stop):
+        run.run(["a", "b", "c"], stop)
+
+    assert sorted(discarded) == [("b", "fetched b"), ("c", "fetched c")]
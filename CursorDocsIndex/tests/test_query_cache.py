@@ -0,0 +1,93 @@
+"""
+Query cache entries are served only at the index generation they were computed at
+"""
+
+import sqlite3
+
+import pytest
+from conftest import make_document
+
+from docs_agent.core import DocsAgent
+from docs_agent.models import SearchResult
+from docs_agent.query_cache import QueryCache, bump_generation, read_generation
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE index_metadata (key TEXT PRIMARY KEY, value TEXT)")
+    yield conn
+    conn.close()
+
+
+def section_ids(results) -> list:
+    return sorted(result.section_id for result in results)
+
+
+def test_bump_generation(conn):
+    assert read_generation(conn) == 0
+    bump_generation(conn.cursor())
+    bump_generation(conn.cursor())
+    assert read_generation(conn) == 2
+
+
+def test_entries_expire_with_their_generation():
+    cache = QueryCache()
+    key = QueryCache.key("Connection  Pool", 5, "keyword")
+    doc = make_document("doc", [("Pooling", "Reuse connections through a pool.")])
+    results = [SearchResult(doc.sections[0], doc, score=1.0, match_type="keyword")]
+    cache.put(key, 3, results)
+
+    assert cache.get(QueryCache.key("connection pool", 5, "keyword"), 3) == results
+    assert cache.get(key, 4) is None
+    # A miss drops the stale entry
+    assert cache.get(key, 3) is None
+    assert cache.stats() == (1, 2)
+
+
+def test_ttl_and_lru_eviction():
+    expired = QueryCache(ttl_seconds=-1)
+    expired.put(("cache", 5, "keyword"), 0, [])
+    assert expired.get(("cache", 5, "keyword"), 0) is None
+
+    cache = QueryCache(max_entries=2)
+    for query in ("first", "second"):
+        cache.put((query, 5, "keyword"), 0, [])
+    cache.get(("first", 5, "keyword"), 0)
+    cache.put(("third", 5, "keyword"), 0, [])
+    assert cache.get(("second", 5, "keyword"), 0) is None
+    assert cache.get(("first", 5, "keyword"), 0) == []
+
+
+def test_ingest_invalidates_cached_searches(agent, add_document):
+    add_document("first", [("Pooling", "Reuse connections through a pool.")])
+    assert section_ids(agent.search("pool", method="keyword")) == ["first_0"]
+    generation = read_generation(agent.db.reader())
+
+    add_document("second", [("Pools", "Size the pool to the worker count.")])
+    assert read_generation(agent.db.reader()) > generation
+    assert section_ids(agent.search("pool", method="keyword")) == ["first_0", "second_0"]
+    assert agent.query_cache.stats() == (0, 2)
+
+    # Unchanged index: served from the cache
+    agent.search("pool", method="keyword")
+    assert agent.query_cache.stats() == (1, 2)
+
+
+def test_persisted_cache_is_dropped_after_a_write(tmp_path):
+    index_dir = tmp_path / "index"
+    agent = DocsAgent(index_dir, embedding_provider=None, ann_backend=None, persist_query_cache=True)
+    agent._save_document(make_document("first", [("Pooling", "Reuse connections through a pool.")]))
+    expected = agent.search("pool", method="keyword")
+    agent.close()
+
+    agent = DocsAgent(index_dir, embedding_provider=None, ann_backend=None, persist_query_cache=True)
+    try:
+        assert agent.search("pool", method="keyword") == expected
+        assert agent.query_cache.stats() == (1, 0)
+
+        agent._save_document(make_document("second", [("Pools", "Size the pool to the worker count.")]))
+        assert section_ids(agent.search("pool", method="keyword")) == ["first_0", "second_0"]
+        assert agent.query_cache.stats() == (1, 1)
+    finally:
+        agent.close()
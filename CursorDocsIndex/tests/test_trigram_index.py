@@ -0,0 +1,91 @@
+"""
+Substring and typo expansion of query terms against the vocabulary
+"""
+
+import pytest
+
+from docs_agent.inverted_index import InvertedIndex
+from docs_agent.trigram_index import edit_distance, max_edits
+
+VOCABULARY = "authentication connection configuration session pool cache"
+
+
+@pytest.fixture
+def cursor(agent, add_document):
+    add_document("doc", [("Vocabulary", VOCABULARY)])
+    return agent.db.reader().cursor()
+
+
+def similar(agent, cursor, term: str) -> list:
+    return [match for match, _ in agent.search_engine.inverted_index.trigrams.similar(cursor, term)]
+
+
+@pytest.mark.parametrize("term, edits", [
+    ("poo", 0),
+    ("pool", 1),
+    ("session", 1),
+    ("sessions", 2),
+    ("authentication", 2),
+    ("x" * 64, 2),
+    ("x" * 65, 0),
+])
+def test_max_edits(term, edits):
+    assert max_edits(term) == edits
+
+
+def test_edit_distance():
+    assert edit_distance("cache", "cache", 2) == 0
+    assert edit_distance("cache", "cahce", 2) == 1  # transposition
+    assert edit_distance("cache", "cach", 2) == 1
+    assert edit_distance("cache", "kashe", 2) == 2
+    # Anything past the limit is reported as limit + 1
+    assert edit_distance("cache", "session", 1) == 2
+
+
+def test_substring_expansion(agent, cursor):
+    trigrams = agent.search_engine.inverted_index.trigrams
+    assert trigrams.containing(cursor, "config") == ["configuration"]
+    assert sorted(trigrams.containing(cursor, "tion")) == ["authentication", "configuration", "connection"]
+    assert trigrams.containing(cursor, "xyz") == []
+
+
+def test_short_terms_allow_one_edit(agent, cursor):
+    assert similar(agent, cursor, "poel") == ["pool"]
+    assert similar(agent, cursor, "cahce") == ["cache"]
+    assert similar(agent, cursor, "sesion") == ["session"]
+    assert similar(agent, cursor, "pxel") == []
+    assert similar(agent, cursor, "sesxixn") == []
+
+
+def test_long_terms_allow_two_edits(agent, cursor):
+    assert similar(agent, cursor, "conection") == ["connection"]
+    assert similar(agent, cursor, "conecton") == ["connection"]
+    assert similar(agent, cursor, "authentcaton") == ["authentication"]
+    assert similar(agent, cursor, "athentcaton") == []
+
+
+def test_terms_below_four_characters_are_not_fuzzy(agent, cursor):
+    assert similar(agent, cursor, "pol") == []
+
+
+def test_typo_matches_score_less_than_exact_matches(agent, add_document):
+    add_document("doc", [
+        ("Pooling", "pool " * 3),
+        ("Caching", "cache " * 3),
+    ])
+    cursor = agent.db.reader().cursor()
+    index = agent.search_engine.inverted_index
+
+    exact = index.score(cursor, "cache")
+    typo = index.score(cursor, "cahce")
+    assert set(typo) == set(exact)
+    assert all(typo[rowid] < exact[rowid] for rowid in exact)
+
+
+def test_expansion_budget_disables_typo_tolerance(agent, cursor):
+    expansions, similar_terms = InvertedIndex(expansion_budget=0)._expand(cursor, ["cahce", "config"])
+    assert expansions == {"configuration": ["config"]}
+    assert similar_terms == {}
+
+    expansions, similar_terms = InvertedIndex()._expand(cursor, ["cahce", "config"])
+    assert similar_terms == {"cahce": ["cache"]}